@@ -1,6 +1,8 @@
 import os
+import threading
 
-from typing import List, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Union
 
 from api.language_api.script_representations import (
     RepresentationType,
@@ -8,12 +10,28 @@ from api.language_api.script_representations import (
     ScriptObjectIssues,
     get_script_object,
 )
-from language.parsing.ast.trees import ScriptTree
+from language.parsing.ast.trees import ScriptStream, ScriptTree
 from language.parsing.parser import Parser
 from logging import Logger
 
 DEBUG_LOG_DIR = os.environ["DEBUG_LOGS"]
+# Opt-in: parse the action blocks of large scripts across a process pool (see Parser.parse_parallel).
+PARALLEL_PARSING = os.environ.get("SIFT_PARALLEL_PARSING", "").lower() in ("1", "true", "yes")
+PARALLEL_WORKERS = int(os.environ.get("SIFT_PARALLEL_WORKERS", os.cpu_count() or 1))
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
 processor_logger: Logger = Logger("ScriptProcessor")
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """ The process pool shared by every parallel parse; created on first use, so that the worker processes
+    are started once per process rather than once per script. """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS)
+        return _parse_pool
+
 ################################################
 # #! Main API For Parsing SiftScripts
 ################################################
@@ -40,11 +58,27 @@ class ScriptProcessor:
             return False
         return True
 
-    def parse(self) -> ScriptTree:
+    def parse(self, previous: Optional[ScriptTree] = None) -> ScriptTree:
+        """ Parses the script into its AST.
+
+        Args:
+            previous (ScriptTree, optional): The AST of a previous version of the script; when given,
+                only the action blocks which changed since are parsed again (see Parser.reparse).
+        """
         if not self.is_valid_script:
             # Then we can safely assume that the Script object is actually of type ScriptObjectIssue, which has a describe method
             assert(isinstance(self.script, ScriptObjectIssues), "If self.is_valid_script is False, it must be true that self.script is a ScriptObjectIssues object.")
             return self.script.get_issues()
+        if previous is not None:
+            return Parser.reparse(previous, self.script.get_content())
+        if PARALLEL_PARSING:
+            return Parser.parse_parallel(self.script.get_content(), executor=get_parse_pool(), max_workers=PARALLEL_WORKERS)
         ast = Parser(self.script.get_content()).parse_content_to_tree()
 
         return ast
+
+    def stream(self) -> ScriptStream:
+        """ Parses the script lazily: its ActionBlocks are parsed one at a time, as they are consumed (see ScriptStream). """
+        if not self.is_valid_script:
+            raise ValueError(f"Cannot stream an invalid script: {self.script.get_issues()}")
+        return Parser.stream(self.script.get_content())
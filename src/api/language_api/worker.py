@@ -1,24 +1,26 @@
 
 from typing import Any, Dict, List, Union
 
-from api.language_api.script_processor import ScriptProcessor
 from api.language_api.script_representations import (
     RepresentationType,
     ScriptObject,
     get_script_object,
 )
+from language.compiler.compiler import CompiledScript, Compiler
 
 
 class Worker:
     """Worker class that handles parsing individual scripts."""
 
     @staticmethod
-    def parse(script: Union[str, Dict], rtype: RepresentationType = RepresentationType.MESSAGE) -> List[Dict[str, Any]]:
+    def parse(script: Union[str, Dict], rtype: RepresentationType = RepresentationType.MESSAGE, lookup_cache: bool = True) -> List[Dict[str, Any]]:
         """
         Parse a script file and prepare messages for the appropriate recipients.
 
         Args:
             script: Path to the script or a ScriptObject
+            lookup_cache: Whether the compiler should consult the in-memory compile cache before parsing (the
+                artifact store is consulted either way)
 
         Returns:
             List of message dictionaries ready to be sent to various services
@@ -28,28 +30,41 @@ class Worker:
         if not script_obj:
             return []
 
-        return Worker._process_script_object(script_obj)
+        return Worker._process_script_object(script_obj, lookup_cache=lookup_cache)
 
 
     @staticmethod
-    def _process_script_object(script_obj: ScriptObject) -> List[Dict[str, Any]]:
+    def _process_script_object(script_obj: ScriptObject, lookup_cache: bool = True) -> List[Dict[str, Any]]:
         """
         Process a script object and generate messages for different services.
 
         Args:
             script_obj: The ScriptObject to process
+            lookup_cache: Whether the compiler should consult the in-memory compile cache before parsing (the
+                artifact store is consulted either way)
 
         Returns:
             List of message dictionaries ready to be sent to various services
         """
         # Process the script
-        proc = ScriptProcessor(script_obj)
-        ast, ir = proc.parse()
+        compiled = Compiler(script_obj).compile(lookup=lookup_cache)
+        return Worker.make_messages(compiled)
 
+    @staticmethod
+    def make_messages(compiled: CompiledScript) -> List[Dict[str, Any]]:
+        """
+        Generate messages for different services from a compiled script.
+
+        Args:
+            compiled: The compiled script (possibly served from the compile cache)
+
+        Returns:
+            List of message dictionaries ready to be sent to various services
+        """
         # Prepare messages for different services
         messages = []
 
         # Get messages for the Request Manager
-        #request_messages = proc.make_message(ir, recipient=Recipients.REQUEST_MANAGER, correlation_id=script_obj.get_id())
+        #request_messages = proc.make_message(compiled.IR, recipient=Recipients.REQUEST_MANAGER, correlation_id=script_obj.get_id())
         #messages.extend(request_messages)
         return messages
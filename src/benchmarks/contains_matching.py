@@ -0,0 +1,101 @@
+""" `contains` needles: one search per instruction vs. one Aho-Corasick scan per string (see matcher.py).
+
+Run from src/:
+
+    python -m benchmarks.contains_matching --needles 8 16 32 64 128 256 --per-statement 1 8 --elements 20000
+
+Each Program has `text contains [...]` statements of --per-statement needles each, --needles in all, and
+every statement is evaluated against every element of a synthetic page (as the executor does, sharing the
+per-element cache); both modes are checked to select the same elements.
+"""
+import argparse
+import random
+import time
+
+from functools import partial
+
+from language.compiler.bytecode import (
+    AHO_CORASICK_MIN_NEEDLES,
+    Interpreter,
+    ProgramBytecode,
+)
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    ElementType,
+    ExtractStatement,
+    Program,
+)
+from language.executor.document import Node
+
+WORDS = ["price", "sale", "new", "limited", "offer", "free shipping", "sponsored", "weather", "news", "item", "card",
+         "deal", "discount", "special", "best", "top", "review", "star", "rating", "stock", "lorem", "ipsum"]
+
+
+def needles(count: int, seed: int = 1) -> list:
+    generator = random.Random(seed)
+    found = set()
+    while len(found) < count:
+        found.add(generator.choice(WORDS) + generator.choice(["", " ", "s", "er", ":"]) + generator.choice(["", "1", "2", "x"]))
+    return sorted(found)
+
+
+def program(count: int, per_statement: int) -> Program:
+    text = NODES.selector(ElementType.TEXT)
+    found = needles(count)
+    return Program(statements=[
+        ExtractStatement(source="Page", destination=f"d{start}", condition=NODES.conditional(
+            text, NODES.literal(tuple(found[start:start + per_statement])), ComparisonOperator.CONTAINS))
+        for start in range(0, count, per_statement)
+    ])
+
+
+def synthetic_elements(count: int, seed: int = 2) -> list:
+    generator = random.Random(seed)
+    return [Node(index, "div", {}, " ".join(generator.choice(WORDS) for _ in range(generator.randint(3, 25))))
+            for index in range(count)]
+
+
+def run(interpreter: Interpreter, statements: int, elements: list) -> list:
+    evaluate = interpreter.evaluate
+    selected = []
+    for element in elements:
+        cache = {}
+        selected.append([index for index in range(statements) if evaluate(index, element, cache)])
+    return selected
+
+
+def best_of(repeat: int, call) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--needles", type=int, nargs="+", default=[8, 16, 32, 64, 128, 256])
+    parser.add_argument("--per-statement", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--elements", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    elements = synthetic_elements(args.elements)
+    print(f"elements={args.elements} (the automaton is used by default from {AHO_CORASICK_MIN_NEEDLES} needles on)")
+    print(f"{'needles':>8} {'per statement':>14} {'per search s':>13} {'automaton s':>12} {'speedup':>8}")
+    for per_statement in args.per_statement:
+        for count in args.needles:
+            bytecode = ProgramBytecode.compile(program(count, per_statement))
+            statements = len(bytecode.statements)
+            searches, automaton = Interpreter(bytecode, multi_pattern=False), Interpreter(bytecode, multi_pattern=True)
+            same = run(searches, statements, elements) == run(automaton, statements, elements)
+            per_search = best_of(args.repeat, partial(run, searches, statements, elements))
+            scanned = best_of(args.repeat, partial(run, automaton, statements, elements))
+            print(f"{count:>8} {per_statement:>14} {per_search:>13.3f} {scanned:>12.3f} {per_search / scanned:>7.2f}x"
+                  f"{'' if same else '  MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
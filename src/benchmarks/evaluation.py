@@ -0,0 +1,109 @@
+""" Per-element vs. indexed vs. vectorized evaluation of a Program over synthetic listing pages.
+
+Run from src/ (with DEBUG_LOGS set, as for the compiler):
+
+    python -m benchmarks.evaluation --elements 10000 100000 1000000
+
+Each page is a Document of --elements elements (item cards: a div holding a link, a price and a badge),
+built directly rather than parsed, so only evaluation is timed. The index and the element table are built
+once per page, outside of the timings (their build times are reported apart); every mode is checked to
+select the same elements as the per-element Executor.
+"""
+import argparse
+import time
+
+from functools import partial
+
+from language.compiler.cse import eliminate_common_subexpressions
+from language.compiler.optimizer import optimize_program
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    ElementType,
+    ExtractStatement,
+    LogicalOperator,
+    Program,
+    Target,
+)
+from language.executor.bitset import BitsetExecutor, ElementTable, numpy
+from language.executor.document import Document, Node
+from language.executor.executor import Executor
+from language.executor.index import DocumentIndex, IndexedExecutor
+
+
+def synthetic_page(elements: int) -> Document:
+    nodes = []
+    while len(nodes) < elements:
+        item = len(nodes) // 4
+        card = len(nodes)
+        classes = "item card sponsored" if item % 25 == 0 else "item card"
+        nodes.append(Node(card, "div", {"class": classes, "data-id": str(item)}, f"Item {item} price {item % 100} New", None))
+        nodes.append(Node(card + 1, "a", {"href": f"/p/{item}"}, f"Item {item}", card))
+        nodes.append(Node(card + 2, "span", {"class": "price"}, f"price {item % 100}", card))
+        nodes.append(Node(card + 3, "span", {"class": "badge"}, "New", card))
+    return Document(elements=nodes[:elements])
+
+
+def comparison(element_type: ElementType, values, operator=ComparisonOperator.EQUALS, name=None):
+    return NODES.conditional(NODES.selector(element_type, name), NODES.literal(tuple(values)), operator)
+
+
+def program() -> Program:
+    tag = partial(comparison, ElementType.TAG)
+    text = partial(comparison, ElementType.TEXT)
+    AND, OR, NOT = LogicalOperator.AND, LogicalOperator.OR, LogicalOperator.NOT  # noqa: N806
+    cards = NODES.logical(AND, [tag(["div"]), comparison(ElementType.ATTRIBUTE, ["item card"], name="class")])
+    statements = [
+        ("items", None, cards),
+        ("prices", None, NODES.logical(AND, [tag(["span"]), text(["price 1"], ComparisonOperator.CONTAINS)])),
+        ("links", None, comparison(ElementType.ATTRIBUTE, ["/p/1"], ComparisonOperator.CONTAINS, name="href")),
+        ("organic", None, NODES.logical(AND, [tag(["a", "span"]), NODES.logical(NOT, [
+            comparison(ElementType.ATTRIBUTE, ["badge"], name="class")])])),
+        ("ads", None, NODES.logical(OR, [text(["Sponsored"], ComparisonOperator.CONTAINS),
+                                         comparison(ElementType.ATTRIBUTE, ["sponsored"], ComparisonOperator.CONTAINS, name="class")])),
+        ("sevens", "items", text(["7"], ComparisonOperator.CONTAINS)),
+    ]
+    ir = Program(targets=[Target(name="Page", references="https://example.com")], statements=[
+        ExtractStatement(source="Page", condition=condition, destination=destination, from_alias=alias)
+        for destination, alias, condition in statements
+    ])
+    return eliminate_common_subexpressions(optimize_program(ir))
+
+
+def best_of(repeat: int, call) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elements", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ir = program()
+    modes = {"per-element": Executor(ir), "indexed": IndexedExecutor(ir), "bitset/int": BitsetExecutor(ir, use_numpy=False)}
+    if numpy is not None:
+        modes["bitset/numpy"] = BitsetExecutor(ir, use_numpy=True)
+    print(f"{'elements':>9} {'build index s':>14} {'build table s':>14} " + " ".join(f"{mode + ' s':>15}" for mode in modes))
+    for elements in args.elements:
+        page = synthetic_page(elements)
+        build_index = best_of(1, partial(DocumentIndex.build, page))
+        build_table = best_of(1, partial(ElementTable.build, page))
+        expected = {name: [node.index for node in nodes] for name, nodes in modes["per-element"].run({"Page": page}).items()}
+        timings, mismatches = [], []
+        for mode, executor in modes.items():
+            run = partial(executor.run, {"Page": page})
+            if {name: [node.index for node in nodes] for name, nodes in run().items()} != expected:
+                mismatches.append(mode)
+            timings.append(best_of(args.repeat, run))
+        print(f"{elements:>9} {build_index:>14.3f} {build_table:>14.3f} " + " ".join(f"{timing:>15.3f}" for timing in timings) +
+              (f"  MISMATCH: {', '.join(mismatches)}" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
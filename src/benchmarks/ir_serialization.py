@@ -0,0 +1,78 @@
+""" IR serialization: the to_dict + json.dumps path vs. the orjson fast path (see IRNode.to_json_bytes).
+
+Run from src/ (with DEBUG_LOGS set, as for the compiler):
+
+    python -m benchmarks.ir_serialization --script ../siftscripts/sifty.sift --scale 1 100
+
+The Program compiled from --script is serialized as is, then with its statements repeated --scale times.
+The baseline is the dict-building to_dict and json.dumps(indent=2) the IR was dumped with before; every
+fast-path output is checked to decode to the same value.
+"""
+import argparse
+import json
+import time
+
+from dataclasses import fields
+from enum import Enum
+from functools import partial
+
+from language.compiler.compiler import Compiler
+from language.compiler.types import IRJSONEncoder, IRNode, Program
+
+
+def legacy_to_dict(node: IRNode) -> dict:
+    result = {"type": node.__class__.__name__}
+    for node_field in fields(node):
+        key, value = node_field.name, getattr(node, node_field.name)
+        if isinstance(value, IRNode):
+            result[key] = legacy_to_dict(value)
+        elif isinstance(value, (list, tuple)) and value and isinstance(value[0], IRNode):
+            result[key] = [legacy_to_dict(item) for item in value]
+        elif isinstance(value, Enum):
+            result[key] = value.value
+        else:
+            result[key] = value
+    return result
+
+
+def legacy_to_json(node: IRNode) -> str:
+    return json.dumps(legacy_to_dict(node), indent=2, cls=IRJSONEncoder)
+
+
+def scaled(program: Program, scale: int) -> Program:
+    return Program(targets=program.targets, statements=program.statements * scale, predicates=program.predicates)
+
+
+def best_of(repeat: int, call) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default="../siftscripts/sifty.sift")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    program = Compiler(args.script).compile(lookup=False).IR
+    print(f"{'scale':>6} {'statements':>11} {'legacy s':>10} {'compact s':>10} {'pretty s':>10} "
+          f"{'speedup':>8} {'legacy KB':>10} {'compact KB':>11}")
+    for scale in args.scale:
+        ir = scaled(program, scale)
+        expected = json.loads(legacy_to_json(ir))
+        same = json.loads(ir.to_json_bytes()) == expected and json.loads(ir.to_json_bytes(pretty=True)) == expected
+        legacy = best_of(args.repeat, partial(legacy_to_json, ir))
+        compact = best_of(args.repeat, ir.to_json_bytes)
+        pretty = best_of(args.repeat, partial(ir.to_json_bytes, pretty=True))
+        print(f"{scale:>6} {len(ir.statements):>11} {legacy:>10.4f} {compact:>10.4f} {pretty:>10.4f} "
+              f"{legacy / compact:>7.1f}x {len(legacy_to_json(ir).encode()) / 1024:>10.1f} "
+              f"{len(ir.to_json_bytes()) / 1024:>11.1f}{'' if same else '  MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
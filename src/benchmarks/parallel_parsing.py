@@ -0,0 +1,65 @@
+""" Serial vs. process-pool parsing of action blocks (see Parser.parse_parallel).
+
+Run from src/:
+
+    python -m benchmarks.parallel_parsing --blocks 16 64 256 1024 --workers 4
+
+Each script has --statements extract statements per block. The pool is created once, outside of the
+timings, as a long-running service would; the parallel result is checked against the serial one.
+"""
+import argparse
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from language.parsing.parser import Parser
+
+
+def synthetic_script(blocks: int, statements: int) -> str:
+    targets = ", ".join(f'T{i}: "https://example.com/{i}"' for i in range(8))
+    body = []
+    for block in range(blocks):
+        lines = "\n".join(
+            f'    extract where (tag ["div", "span"] and attribute "class": contains ["item{block}", "card"]) '
+            f'or text contains "entry {statement}" -> out_{block}_{statement};'
+            for statement in range(statements)
+        )
+        body.append(f"T{block % 8}: {{\n{lines}\n}}")
+    return f"targets = [ {targets} ]\n\n" + "\n\n".join(body) + "\n"
+
+
+def best_of(repeat: int, call) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, nargs="+", default=[16, 64, 256, 1024])
+    parser.add_argument("--statements", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} statements/block={args.statements} (cpu_count={os.cpu_count()})")
+    print(f"{'blocks':>8} {'serial s':>10} {'parallel s':>11} {'speedup':>8}")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Warm the workers up (imports, parser tables) before timing anything.
+        Parser.parse_parallel(synthetic_script(args.workers, 1), executor=pool, max_workers=args.workers, min_blocks=1)
+        for blocks in args.blocks:
+            script = synthetic_script(blocks, args.statements)
+            serial = best_of(args.repeat, lambda script=script: Parser(script).parse_content_to_tree())
+            parallel = best_of(args.repeat, lambda script=script: Parser.parse_parallel(
+                script, executor=pool, max_workers=args.workers, min_blocks=1))
+            same = str(Parser(script).parse_content_to_tree()) == str(
+                Parser.parse_parallel(script, executor=pool, max_workers=args.workers, min_blocks=1))
+            print(f"{blocks:>8} {serial:>10.3f} {parallel:>11.3f} {serial / parallel:>7.2f}x{'' if same else '  MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
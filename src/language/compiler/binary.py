@@ -0,0 +1,292 @@
+""" A versioned binary encoding of Program, readable lazily from a memoryview or an mmap.
+
+`IRNode.to_json` walks the whole Program through to_dict and json.dumps, and so does reading it back.
+The binary encoding is laid out so that a reader only decodes what it touches:
+
+    header        magic, version, then the count and the offset of every section below
+    strings       a table of (offset, length) records into a blob of UTF-8 data
+    ops, spans    the conditions of every statement and predicate, as one flat tree (see flat.py):
+                  a u8 opcode and a u32 operand index per node, each condition known by the index of its root
+    literals      fixed-width records of the leaves of the flat tree (see _LITERAL)
+    lists         u32 string indices, for the values of the literals
+    targets       (name, references) string indices
+    statements    (source, condition, destination, from_alias) fixed-width records
+    predicates    (name, source, condition) fixed-width records
+
+Every section holds fixed-width little-endian records, so record `i` is read with a single unpack at a
+computed offset, and ops and spans are read in place. Identical leaves and identical subexpressions are
+stored once (see FlatCondition); decoded nodes are interned through NODES again, so
+`load_program(dump_program(program)) == program`.
+"""
+import mmap
+import struct
+import sys
+
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from language.compiler.flat import FlatCondition, FlatOp, LeafPayload, LiteralTable
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    ElementType,
+    Expression,
+    ExtractStatement,
+    Literal,
+    Predicate,
+    PredicateRef,
+    Program,
+    Target,
+)
+
+BINARY_IR_VERSION = 2
+_MAGIC = b"SIFTIR"
+_NONE = 0xFFFFFFFF
+""" The index standing for None (no attribute name, no 'from' alias). """
+
+_HEADER = struct.Struct("<6sH15I")
+_STRING = struct.Struct("<II")
+_LITERAL = struct.Struct("<BBBBIII")
+""" The leaf opcode, the element type, the comparison operator and the value kind, two u32 fields whose meaning
+depends on the value kind, then the string index of the selector's name (or of a PredicateRef's). """
+_TARGET = struct.Struct("<II")
+_STATEMENT = struct.Struct("<IIII")
+_PREDICATE = struct.Struct("<III")
+_INDEX = struct.Struct("<I")
+
+
+class _Value(IntEnum):
+    BOOL = 0     # the bool
+    STRINGS = 1  # a tuple of strings: first list index, count
+    STRING = 2   # a string index
+    NONE = 3
+
+
+_ELEMENT_TYPES = list(ElementType)
+_COMPARISONS = list(ComparisonOperator)
+
+
+class _Writer:
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.conditions = FlatCondition()
+        self.lists: List[int] = []
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def _value(self, value: Any) -> Tuple[_Value, int, int]:
+        if isinstance(value, bool):
+            return _Value.BOOL, int(value), 0
+        if value is None:
+            return _Value.NONE, 0, 0
+        if isinstance(value, str):
+            return _Value.STRING, self.string(value), 0
+        if isinstance(value, tuple) and all(isinstance(item, str) for item in value):
+            start = len(self.lists)
+            self.lists.extend(self.string(item) for item in value)
+            return _Value.STRINGS, start, len(value)
+        raise TypeError(f"Cannot encode the literal {value!r}")
+
+    def literal(self, payload: Union[LeafPayload, PredicateRef, Literal]) -> bytes:
+        if isinstance(payload, PredicateRef):
+            return _LITERAL.pack(FlatOp.REF, 0, 0, _Value.NONE, 0, 0, self.string(payload.name))
+        if isinstance(payload, Literal):
+            return _LITERAL.pack(FlatOp.CONSTANT, 0, 0, *self._value(payload.value), _NONE)
+        element_type, name, operator, value = payload
+        return _LITERAL.pack(FlatOp.LEAF, _ELEMENT_TYPES.index(element_type), _COMPARISONS.index(operator),
+                             *self._value(value), self.string(name))
+
+
+def dump_program(program: Program) -> bytes:
+    """ Encodes a Program (see the module docstring). """
+    writer = _Writer()
+    targets = b"".join(_TARGET.pack(writer.string(target.name), writer.string(target.references)) for target in program.targets)
+    statements = bytearray()
+    for statement in program.statements:
+        if not isinstance(statement, ExtractStatement):
+            raise TypeError(f"Unexpected statement type: {type(statement).__name__}")
+        statements += _STATEMENT.pack(writer.string(statement.source), writer.conditions.append(statement.condition),
+                                      writer.string(statement.destination), writer.string(statement.from_alias))
+    predicates = b"".join(
+        _PREDICATE.pack(writer.string(predicate.name), writer.string(predicate.source), writer.conditions.append(predicate.condition))
+        for predicate in program.predicates
+    )
+
+    # Encoding the literals interns the strings they hold, so they come before the string table.
+    literals = b"".join(writer.literal(payload) for payload in writer.conditions.literals.values)
+    spans = array("I", writer.conditions.spans)
+    if sys.byteorder == "big":
+        spans.byteswap()
+
+    string_records, string_data = bytearray(), bytearray()
+    for value in writer.strings:
+        encoded = value.encode()
+        string_records += _STRING.pack(len(string_data), len(encoded))
+        string_data += encoded
+    lists = struct.pack(f"<{len(writer.lists)}I", *writer.lists)
+
+    sections = [string_records, string_data, writer.conditions.ops.tobytes(), spans.tobytes(), literals, lists,
+                targets, statements, predicates]
+    counts = [len(writer.strings), len(writer.conditions), len(writer.conditions.literals), len(program.targets),
+              len(program.statements), len(program.predicates)]
+    offsets, position = [], _HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+    header = _HEADER.pack(_MAGIC, BINARY_IR_VERSION, *counts, *offsets)
+    return b"".join([header, *sections])
+
+
+class _Records(Sequence):
+    """ A lazily decoded, read-only sequence of the records of one section. """
+    def __init__(self, count: int, decode):
+        self._count = count
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._decode(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self._decode(index) for index in range(self._count))
+
+
+class ProgramReader:
+    """ Reads an encoded Program lazily: a condition or a string is only decoded when it is first reached.
+
+    `targets`, `statements` and `predicates` are sequences which decode their items on access.
+    The buffer (bytes, a memoryview, an mmap...) must stay open for as long as the reader is used; a reader
+    used as a context manager releases its view of the buffer on exit, so that an mmap can then be closed.
+    """
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        magic, version, *fields = _HEADER.unpack_from(self._view, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a Sift binary IR")
+        if version != BINARY_IR_VERSION:
+            raise ValueError(f"Unsupported binary IR version {version} (expected {BINARY_IR_VERSION})")
+        strings, nodes, literals, targets, statements, predicates = fields[:6]
+        (self._strings_at, self._data_at, ops_at, spans_at, self._literals_at, self._lists_at,
+         self._targets_at, self._statements_at, self._predicates_at) = fields[6:]
+        self._string_cache: Dict[int, str] = {}
+        self._literal_cache: Dict[int, Any] = {}
+        self._condition_cache: Dict[int, Expression] = {}
+        self.node_count = nodes
+        self.string_count = strings
+        # The flat tree is read in place; only a big-endian host has to copy (and swap) the spans.
+        ops = self._view[ops_at:ops_at + nodes]
+        if sys.byteorder == "little":
+            spans = self._view[spans_at:spans_at + nodes * _INDEX.size].cast("I")
+        else:
+            spans = array("I", self._view[spans_at:spans_at + nodes * _INDEX.size])
+            spans.byteswap()
+        self._conditions = FlatCondition(LiteralTable(_Records(literals, self._literal)), ops=ops, spans=spans)
+        self.targets: Sequence[Target] = _Records(targets, self._target)
+        self.statements: Sequence[ExtractStatement] = _Records(statements, self._statement)
+        self.predicates: Sequence[Predicate] = _Records(predicates, self._predicate)
+
+    @classmethod
+    def open(cls, path: str) -> "ProgramReader":
+        """ Maps an encoded Program file into memory (read-only) and reads it from there. """
+        with open(path, "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __enter__(self) -> "ProgramReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """ Releases the view of the buffer. Items decoded so far stay usable; nothing else can be read. """
+        for view in (self._conditions.ops, self._conditions.spans):
+            if isinstance(view, memoryview):
+                view.release()
+        self._view.release()
+
+    def string(self, index: int) -> Optional[str]:
+        if index == _NONE:
+            return None
+        value = self._string_cache.get(index)
+        if value is None:
+            offset, length = _STRING.unpack_from(self._view, self._strings_at + index * _STRING.size)
+            start = self._data_at + offset
+            value = self._string_cache[index] = str(self._view[start:start + length], "utf-8")
+        return value
+
+    def _list(self, start: int, count: int) -> Tuple[int, ...]:
+        return struct.unpack_from(f"<{count}I", self._view, self._lists_at + start * _INDEX.size)
+
+    def _literal(self, index: int) -> Union[LeafPayload, PredicateRef, Literal]:
+        literal = self._literal_cache.get(index)
+        if literal is not None:
+            return literal
+        op, element_type, operator, kind, first, second, name = _LITERAL.unpack_from(
+            self._view, self._literals_at + index * _LITERAL.size)
+        if op == FlatOp.REF:
+            literal = NODES.predicate_ref(self.string(name))
+        elif op == FlatOp.CONSTANT:
+            literal = NODES.literal(self._value(kind, first, second))
+        elif op == FlatOp.LEAF:
+            literal = (_ELEMENT_TYPES[element_type], self.string(name), _COMPARISONS[operator], self._value(kind, first, second))
+        else:
+            raise ValueError(f"Unknown literal opcode {op} at literal {index}")
+        self._literal_cache[index] = literal
+        return literal
+
+    def _value(self, kind: int, first: int, second: int) -> Any:
+        if kind == _Value.STRINGS:
+            return tuple(self.string(item) for item in self._list(first, second))
+        if kind == _Value.STRING:
+            return self.string(first)
+        if kind == _Value.BOOL:
+            return bool(first)
+        if kind == _Value.NONE:
+            return None
+        raise ValueError(f"Unknown literal value kind {kind}")
+
+    def condition(self, index: int) -> Expression:
+        """ The condition whose root is node index of the flat tree. """
+        return self._conditions.to_condition(index, self._condition_cache)
+
+    def _target(self, index: int) -> Target:
+        name, references = _TARGET.unpack_from(self._view, self._targets_at + index * _TARGET.size)
+        return Target(name=self.string(name), references=self.string(references))
+
+    def _statement(self, index: int) -> ExtractStatement:
+        source, condition, destination, from_alias = _STATEMENT.unpack_from(self._view, self._statements_at + index * _STATEMENT.size)
+        return ExtractStatement(source=self.string(source), condition=self.condition(condition),
+                                destination=self.string(destination), from_alias=self.string(from_alias))
+
+    def _predicate(self, index: int) -> Predicate:
+        name, source, condition = _PREDICATE.unpack_from(self._view, self._predicates_at + index * _PREDICATE.size)
+        return Predicate(name=self.string(name), source=self.string(source), condition=self.condition(condition))
+
+    def to_program(self) -> Program:
+        return Program(targets=list(self.targets), statements=list(self.statements), predicates=list(self.predicates))
+
+
+def load_program(buffer) -> Program:
+    """ Decodes a whole Program encoded by dump_program. """
+    return ProgramReader(buffer).to_program()
+
+
+def write_program(path: str, program: Program) -> None:
+    """ Encodes a Program into a file, which ProgramReader.open can then map. """
+    with open(path, "wb") as file:
+        file.write(dump_program(program))
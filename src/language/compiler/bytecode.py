@@ -0,0 +1,456 @@
+""" The bytecode backend: compact instructions for the conditions of a Program, and their interpreter.
+
+Every condition (of a statement or of a hoisted Predicate) compiles to a run of 32-bit instructions in a
+single code array: an 8-bit OpCode and a 24-bit argument, which is either an index into the constant
+pool or a jump target. Constants (accepted values, attribute names, needles...) are interned once per
+Program.
+
+Conditions are evaluated for one element at a time, and every subexpression leaves exactly one value,
+so the machine only needs a single value register instead of an operand stack: a test sets it, and
+LOGICAL_AND / LOGICAL_OR short-circuit by jumping past the remaining operands when it already decides
+the result. `a and (b or c)` compiles to:
+
+    0  CHECK_TAG          a
+    1  LOGICAL_AND        5     -> leave False if a does not hold
+    2  CHECK_ATTRIBUTE    b
+    3  LOGICAL_OR         5     -> leave True if b holds
+    4  CONTAINS_TEXT      c
+    5  ...
+
+A PredicateRef compiles to a CALL of the predicate's code, whose result the Interpreter caches per element.
+When a Program has many `contains` needles, the compiler also builds one Aho-Corasick automaton over all of
+them (see matcher.py) and attaches it to the bytecode. The Interpreter then scans each string of an element
+once, and each CONTAINS instruction checks whether one of its needles was among the hits.
+ProgramBytecode.to_bytes / from_bytes convert a whole Program's bytecode to and from a flat buffer.
+"""
+import re
+import struct
+import sys
+
+from array import array
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Mapping, Optional, Protocol, Set, Tuple
+
+from language.compiler.matcher import AhoCorasick
+from language.compiler.types import (
+    ComparisonOperator,
+    Conditional,
+    ElementType,
+    Expression,
+    ExtractStatement,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    PredicateRef,
+    Program,
+)
+
+BYTECODE_VERSION = 1
+AHO_CORASICK_MIN_NEEDLES = 48
+""" The number of distinct needles from which the compiler builds the automaton. With several needles per
+instruction (each searched with a regular expression), the single scan wins from 32-48 needles on (see
+benchmarks/contains_matching.py); single-needle instructions (`in`, in C) lose about 10% to it up to ~224. """
+
+_MAGIC = b"SIFTBC"
+_ARG_BITS = 24
+_ARG_MASK = (1 << _ARG_BITS) - 1
+
+
+class OpCode(IntEnum):
+    PUSH_LITERAL = 0        # value = constants[arg] (a bool)
+    CHECK_TAG = 1           # value = the tag is one of constants[arg] (any tag, if there are none)
+    CHECK_ATTRIBUTE = 2     # constants[arg] = (name, values); name None for any attribute, no values for any value
+    CHECK_TEXT = 3          # value = the text is one of constants[arg]
+    CONTAINS_TAG = 4        # value = the tag contains one of the needles constants[arg]
+    CONTAINS_ATTRIBUTE = 5  # constants[arg] = (name, needles)
+    CONTAINS_TEXT = 6       # value = the text contains one of the needles constants[arg]
+    LOGICAL_NOT = 7         # value = not value
+    LOGICAL_AND = 8         # if not value: jump to arg
+    LOGICAL_OR = 9          # if value: jump to arg
+    CALL = 10               # value = predicate arg, evaluated at most once per element
+
+
+_TESTS: Dict[Tuple[ElementType, ComparisonOperator], OpCode] = {
+    (ElementType.TAG, ComparisonOperator.EQUALS): OpCode.CHECK_TAG,
+    (ElementType.ATTRIBUTE, ComparisonOperator.EQUALS): OpCode.CHECK_ATTRIBUTE,
+    (ElementType.TEXT, ComparisonOperator.EQUALS): OpCode.CHECK_TEXT,
+    (ElementType.TAG, ComparisonOperator.CONTAINS): OpCode.CONTAINS_TAG,
+    (ElementType.ATTRIBUTE, ComparisonOperator.CONTAINS): OpCode.CONTAINS_ATTRIBUTE,
+    (ElementType.TEXT, ComparisonOperator.CONTAINS): OpCode.CONTAINS_TEXT,
+}
+
+
+class Element(Protocol):
+    """ What the interpreter needs to know about an element. """
+    tag: str
+    attributes: Mapping[str, str]
+    text: str
+
+
+@dataclass(frozen=True)
+class CodeRange:
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class StatementCode:
+    source: str
+    from_alias: Optional[str]
+    destination: str
+    code: CodeRange
+
+
+@dataclass(frozen=True)
+class PredicateCode:
+    name: str
+    source: str
+    code: CodeRange
+
+
+@dataclass
+class ProgramBytecode:
+    """ The bytecode of a Program: its constant pool, its code, and the code range of each condition. """
+    constants: List[Any] = field(default_factory=list)
+    code: array = field(default_factory=lambda: array("I"))
+    predicates: List[PredicateCode] = field(default_factory=list)
+    statements: List[StatementCode] = field(default_factory=list)
+    matcher: Optional[AhoCorasick] = field(default=None, compare=False, repr=False)
+    """ The automaton of needles(), built along with the code when there are at least AHO_CORASICK_MIN_NEEDLES. """
+
+    @classmethod
+    def compile(cls, program: Program) -> "ProgramBytecode":
+        bytecode = _Assembler(program).bytecode
+        bytecode._build_matcher()
+        return bytecode
+
+    def _build_matcher(self) -> None:
+        needles = self.needles()
+        self.matcher = AhoCorasick(needles) if len(needles) >= AHO_CORASICK_MIN_NEEDLES else None
+
+    def needles(self) -> Tuple[str, ...]:
+        """ The distinct needles of the CONTAINS instructions, in order of first use. """
+        found: Dict[str, None] = {}
+        for word in self.code:
+            op = word >> _ARG_BITS
+            if op in (OpCode.CONTAINS_TAG, OpCode.CONTAINS_TEXT):
+                found.update(dict.fromkeys(self.constants[word & _ARG_MASK]))
+            elif op == OpCode.CONTAINS_ATTRIBUTE:
+                found.update(dict.fromkeys(self.constants[word & _ARG_MASK][1]))
+        return tuple(found)
+
+    def disassemble(self) -> str:
+        lines = []
+        for label, code in [(f"predicate {each.name}", each.code) for each in self.predicates] + \
+                           [(f"{each.source} -> {each.destination}", each.code) for each in self.statements]:
+            lines.append(f"{label}:")
+            for pc in range(code.start, code.end):
+                op, arg = OpCode(self.code[pc] >> _ARG_BITS), self.code[pc] & _ARG_MASK
+                operand = arg if op in (OpCode.LOGICAL_AND, OpCode.LOGICAL_OR, OpCode.CALL) else repr(self.constants[arg])
+                lines.append(f"  {pc:>6}  {op.name:<20}{'' if op == OpCode.LOGICAL_NOT else operand}".rstrip())
+        return "\n".join(lines)
+
+    def to_bytes(self) -> bytes:
+        """ Encodes the bytecode: a header, the constant pool, the predicate and statement tables, then the code. """
+        out = bytearray(_MAGIC)
+        out += struct.pack("<HIIII", BYTECODE_VERSION, len(self.constants), len(self.predicates), len(self.statements), len(self.code))
+        for constant in self.constants:
+            _encode_constant(constant, out)
+        index = {(type(constant), constant): position for position, constant in enumerate(self.constants)}
+        for predicate in self.predicates:
+            out += struct.pack("<IIII", index[str, predicate.name], index[str, predicate.source], predicate.code.start, predicate.code.end)
+        for statement in self.statements:
+            out += struct.pack("<IIIII", index[str, statement.source], index[type(statement.from_alias), statement.from_alias],
+                               index[str, statement.destination], statement.code.start, statement.code.end)
+        code = array("I", self.code)
+        if sys.byteorder == "big":
+            code.byteswap()
+        out += code.tobytes()
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ProgramBytecode":
+        view = memoryview(data)
+        if bytes(view[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError("Not Sift bytecode")
+        version, constants, predicates, statements, code = struct.unpack_from("<HIIII", view, len(_MAGIC))
+        if version != BYTECODE_VERSION:
+            raise ValueError(f"Unsupported bytecode version {version} (expected {BYTECODE_VERSION})")
+        offset = len(_MAGIC) + struct.calcsize("<HIIII")
+        bytecode = cls()
+        for _ in range(constants):
+            constant, offset = _decode_constant(view, offset)
+            bytecode.constants.append(constant)
+        pool = bytecode.constants
+        for name, source, start, end in struct.iter_unpack("<IIII", view[offset:offset + 16 * predicates]):
+            bytecode.predicates.append(PredicateCode(name=pool[name], source=pool[source], code=CodeRange(start, end)))
+        offset += 16 * predicates
+        for source, from_alias, destination, start, end in struct.iter_unpack("<IIIII", view[offset:offset + 20 * statements]):
+            bytecode.statements.append(StatementCode(source=pool[source], from_alias=pool[from_alias],
+                                                     destination=pool[destination], code=CodeRange(start, end)))
+        offset += 20 * statements
+        bytecode.code.frombytes(view[offset:offset + 4 * code])
+        if sys.byteorder == "big":
+            bytecode.code.byteswap()
+        # The automaton is not encoded: it is rebuilt once, as the bytecode is loaded.
+        bytecode._build_matcher()
+        return bytecode
+
+
+# Constants are None, bools, str, or tuples of constants.
+_NONE, _FALSE, _TRUE, _STR, _TUPLE = range(5)
+
+
+def _encode_constant(constant: Any, out: bytearray) -> None:
+    if constant is None:
+        out.append(_NONE)
+    elif isinstance(constant, bool):
+        out.append(_TRUE if constant else _FALSE)
+    elif isinstance(constant, str):
+        encoded = constant.encode()
+        out.append(_STR)
+        out += struct.pack("<I", len(encoded)) + encoded
+    elif isinstance(constant, tuple):
+        out.append(_TUPLE)
+        out += struct.pack("<I", len(constant))
+        for item in constant:
+            _encode_constant(item, out)
+    else:
+        raise TypeError(f"Cannot encode the constant {constant!r}")
+
+
+def _decode_constant(view: memoryview, offset: int) -> Tuple[Any, int]:
+    kind = view[offset]
+    offset += 1
+    if kind == _NONE:
+        return None, offset
+    if kind in (_FALSE, _TRUE):
+        return kind == _TRUE, offset
+    (length,) = struct.unpack_from("<I", view, offset)
+    offset += 4
+    if kind == _STR:
+        return str(view[offset:offset + length], "utf-8"), offset + length
+    items = []
+    for _ in range(length):
+        item, offset = _decode_constant(view, offset)
+        items.append(item)
+    return tuple(items), offset
+
+
+class _Assembler:
+    def __init__(self, program: Program):
+        self.bytecode = ProgramBytecode()
+        self._constants: Dict[Tuple[type, Any], int] = {}
+        self._predicates: Dict[str, int] = {}
+        for predicate in program.predicates:
+            self._const(predicate.name)
+            self._const(predicate.source)
+            self._predicates[predicate.name] = len(self.bytecode.predicates)
+            self.bytecode.predicates.append(PredicateCode(
+                name=predicate.name, source=predicate.source, code=self._assemble(predicate.condition)
+            ))
+        for statement in program.statements:
+            if not isinstance(statement, ExtractStatement):
+                raise TypeError(f"Unexpected statement type: {type(statement).__name__}")
+            for name in (statement.source, statement.from_alias, statement.destination):
+                self._const(name)
+            self.bytecode.statements.append(StatementCode(
+                source=statement.source, from_alias=statement.from_alias, destination=statement.destination,
+                code=self._assemble(statement.condition)
+            ))
+
+    def _const(self, value: Any) -> int:
+        # bools are keyed apart from the ints they compare equal to.
+        key = (type(value), value)
+        index = self._constants.get(key)
+        if index is None:
+            index = self._constants[key] = len(self.bytecode.constants)
+            self.bytecode.constants.append(value)
+        return index
+
+    def _emit(self, op: OpCode, arg: int = 0) -> int:
+        if arg > _ARG_MASK:
+            raise OverflowError(f"The argument of {op.name} does not fit in {_ARG_BITS} bits")
+        self.bytecode.code.append(op << _ARG_BITS | arg)
+        return len(self.bytecode.code) - 1
+
+    def _patch(self, pc: int, target: int) -> None:
+        self.bytecode.code[pc] = (self.bytecode.code[pc] & ~_ARG_MASK) | target
+
+    def _assemble(self, condition: Expression) -> CodeRange:
+        start = len(self.bytecode.code)
+        self._condition(condition)
+        return CodeRange(start, len(self.bytecode.code))
+
+    def _condition(self, condition: Expression) -> None:
+        if isinstance(condition, Literal):
+            self._emit(OpCode.PUSH_LITERAL, self._const(bool(condition.value)))
+        elif isinstance(condition, PredicateRef):
+            self._emit(OpCode.CALL, self._predicates[condition.name])
+        elif isinstance(condition, Conditional):
+            op = _TESTS.get((condition.lhs.element_type, condition.operator))
+            if op is None:
+                raise TypeError(f"No instruction for {condition.lhs.element_type.value} {condition.operator.value}")
+            values = tuple(condition.rhs.value)
+            if condition.lhs.element_type == ElementType.ATTRIBUTE:
+                self._emit(op, self._const((condition.lhs.name, values)))
+            else:
+                self._emit(op, self._const(values))
+        elif isinstance(condition, LogicalExpression):
+            if condition.operator == LogicalOperator.NOT:
+                self._junction(OpCode.LOGICAL_AND, condition.expressions)
+                self._emit(OpCode.LOGICAL_NOT)
+            else:
+                self._junction(OpCode.LOGICAL_AND if condition.operator == LogicalOperator.AND else OpCode.LOGICAL_OR,
+                               condition.expressions)
+        else:
+            raise TypeError(f"Cannot compile the IR node: {condition}")
+
+    def _junction(self, op: OpCode, operands) -> None:
+        jumps = []
+        for position, operand in enumerate(operands):
+            self._condition(operand)
+            if position < len(operands) - 1:
+                jumps.append(self._emit(op))
+        for jump in jumps:
+            self._patch(jump, len(self.bytecode.code))
+
+
+def _searcher(needles: Tuple[str, ...]) -> Callable[[str], bool]:
+    """ A test of whether a string contains any of the needles, prepared once. """
+    if not needles:
+        return lambda value: False
+    if len(needles) == 1:
+        needle = needles[0]
+        return lambda value: needle in value
+    pattern = re.compile("|".join(re.escape(needle) for needle in needles))
+    return lambda value: pattern.search(value) is not None
+
+
+# Keys of the needle hits of an element's strings in the per-element cache (predicates are keyed by their index).
+_TAG_HITS, _TEXT_HITS, _ATTRIBUTES_HITS = "#tag", "#text", "#attributes"
+
+
+class Interpreter:
+    """ Evaluates the conditions of a ProgramBytecode against elements.
+
+    The arguments of the instructions are prepared once: accepted values become frozensets, and needles
+    become a single search (a regular expression alternation, for more than one), or the set of their
+    indices in the automaton of all the needles.
+
+    Args:
+        multi_pattern (bool, optional): Whether to search needles with one automaton (see the module docstring);
+            by default, when the compiler attached one to the bytecode.
+    """
+    def __init__(self, bytecode: ProgramBytecode, multi_pattern: Optional[bool] = None):
+        self.bytecode = bytecode
+        needles = bytecode.needles()
+        if multi_pattern is None:
+            self.matcher = bytecode.matcher
+        else:
+            self.matcher = (bytecode.matcher or AhoCorasick(needles)) if multi_pattern else None
+        self._needle_indices = {needle: index for index, needle in enumerate(needles)}
+        self._ops = bytes(word >> _ARG_BITS for word in bytecode.code)
+        self._args = [self._prepare(word >> _ARG_BITS, word & _ARG_MASK) for word in bytecode.code]
+        self._predicates = [(each.code.start, each.code.end) for each in bytecode.predicates]
+
+    def _prepare(self, op: int, arg: int) -> Any:
+        if op in (OpCode.LOGICAL_AND, OpCode.LOGICAL_OR, OpCode.CALL, OpCode.LOGICAL_NOT):
+            return arg
+        constant = self.bytecode.constants[arg]
+        if op == OpCode.PUSH_LITERAL:
+            return constant
+        if op in (OpCode.CHECK_TAG, OpCode.CHECK_TEXT):
+            return frozenset(constant) or None
+        if op == OpCode.CHECK_ATTRIBUTE:
+            return constant[0], frozenset(constant[1]) or None
+        if self.matcher is not None:
+            if op == OpCode.CONTAINS_ATTRIBUTE:
+                return constant[0], frozenset(self._needle_indices[needle] for needle in constant[1])
+            return frozenset(self._needle_indices[needle] for needle in constant)
+        if op == OpCode.CONTAINS_ATTRIBUTE:
+            return constant[0], _searcher(constant[1])
+        return _searcher(constant)
+
+    def _hits(self, key: Any, strings, cache: Dict) -> Set[int]:
+        """ The needles found in an element's strings, scanned once per element. """
+        hits = cache.get(key)
+        if hits is None:
+            search = self.matcher.search
+            hits = cache[key] = set().union(*[search(string) for string in strings])
+        return hits
+
+    def evaluate(self, statement: int, element: Element, cache: Optional[Dict[int, bool]] = None) -> bool:
+        """ Whether an element satisfies the condition of a statement (by index).
+
+        Args:
+            cache (Dict[int, bool], optional): The results of the predicates already evaluated for this element;
+                pass the same dict for every statement evaluated against the element. It also keeps the needles
+                found in the element's strings, when they are searched with the automaton.
+        """
+        code = self.bytecode.statements[statement].code
+        return self._run(code.start, code.end, element, {} if cache is None else cache)
+
+    def _run(self, pc: int, end: int, element: Element, cache: Dict) -> bool:  # noqa: C901
+        ops, args, matcher = self._ops, self._args, self.matcher
+        value = False
+        while pc < end:
+            op = ops[pc]
+            arg = args[pc]
+            pc += 1
+            if op == 8:    # LOGICAL_AND
+                if not value:
+                    pc = arg
+            elif op == 9:  # LOGICAL_OR
+                if value:
+                    pc = arg
+            elif op == 1:  # CHECK_TAG
+                value = arg is None or element.tag in arg
+            elif op == 2:  # CHECK_ATTRIBUTE
+                name, accepted = arg
+                attributes = element.attributes
+                if name is None:
+                    value = bool(attributes) if accepted is None else not accepted.isdisjoint(attributes.values())
+                else:
+                    found = attributes.get(name)
+                    value = found is not None and (accepted is None or found in accepted)
+            elif op == 3:  # CHECK_TEXT
+                value = arg is None or element.text in arg
+            elif op == 6:  # CONTAINS_TEXT
+                if matcher is None:
+                    value = arg(element.text)
+                else:
+                    hits = cache.get(_TEXT_HITS)
+                    if hits is None:
+                        hits = cache[_TEXT_HITS] = matcher.search(element.text)
+                    value = not arg.isdisjoint(hits)
+            elif op == 5:  # CONTAINS_ATTRIBUTE
+                name, search = arg
+                if matcher is not None:
+                    if name is None:
+                        value = not search.isdisjoint(self._hits(_ATTRIBUTES_HITS, element.attributes.values(), cache))
+                    else:
+                        found = element.attributes.get(name)
+                        value = found is not None and not search.isdisjoint(self._hits((_ATTRIBUTES_HITS, name), (found,), cache))
+                elif name is None:
+                    value = any(search(found) for found in element.attributes.values())
+                else:
+                    found = element.attributes.get(name)
+                    value = found is not None and search(found)
+            elif op == 7:  # LOGICAL_NOT
+                value = not value
+            elif op == 10:  # CALL
+                cached = cache.get(arg)
+                if cached is None:
+                    start, stop = self._predicates[arg]
+                    cached = cache[arg] = self._run(start, stop, element, cache)
+                value = cached
+            elif op == 4:  # CONTAINS_TAG
+                if matcher is None:
+                    value = arg(element.tag)
+                else:
+                    value = not arg.isdisjoint(self._hits(_TAG_HITS, (element.tag,), cache))
+            else:          # PUSH_LITERAL
+                value = arg
+        return value
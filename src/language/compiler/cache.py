@@ -0,0 +1,57 @@
+""" Content-addressed cache of compiled scripts.
+
+Upstream services resubmit the same scripts over and over; re-parsing and re-lowering them each time is wasted work.
+Compiled scripts are stored under a hash of the script content, the compiler version and the SIFT grammar hash,
+so a change to either the lowering or the grammar can never serve a stale result.
+Entries are charged their ``nbytes``, the encoded size of their binary IR and bytecode, against a byte budget
+(``SIFT_COMPILE_CACHE_BYTES``, default 64 MiB) and evicted least-recently-used first. Cached objects are shared between callers and must be treated as read-only.
+"""
+import hashlib
+import logging
+import os
+
+from typing import Any, Optional
+
+from language.parsing.grammars import SIFT
+from language.parsing.utils import grammar_hash
+from shared.utils.lru import CacheStats, LRUCache
+
+COMPILER_VERSION = "5"
+""" Bump whenever lowering changes the Program produced for the same ScriptTree. """
+DEFAULT_COMPILE_CACHE_BYTES = 64 * 1024 * 1024
+
+cache_logger = logging.getLogger(__name__)
+
+
+def _estimated_size(compiled: Any) -> int:
+    # Pickling the whole CompiledScript, AST included, cost as much as a tenth of the compile it caches.
+    return compiled.nbytes
+
+
+class CompileCache:
+    def __init__(self, max_bytes: int = DEFAULT_COMPILE_CACHE_BYTES, version: str = COMPILER_VERSION):
+        self._salt = f"{version}\0{grammar_hash(SIFT.key())}\0".encode()
+        self._entries: LRUCache[Any] = LRUCache(budget=max_bytes, cost=_estimated_size)
+
+    def key(self, content: str, variant: str = "") -> str:
+        return hashlib.sha256(self._salt + f"{variant}\0".encode() + content.encode()).hexdigest()
+
+    def get(self, content: str, variant: str = "") -> Optional[Any]:
+        """ Return the CompiledScript previously stored for ``content``, or None.
+
+        ``variant`` tells apart the results of compiling the same content with different options.
+        """
+        return self._entries.get(self.key(content, variant))
+
+    def put(self, content: str, compiled: Any, variant: str = "") -> None:
+        if not self._entries.put(self.key(content, variant), compiled):
+            cache_logger.info("Compiled script exceeds the compile cache budget of %d bytes; not caching it.", self._entries.budget)
+
+    def stats(self) -> CacheStats:
+        return self._entries.stats()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+COMPILE_CACHE = CompileCache(max_bytes=int(os.environ.get("SIFT_COMPILE_CACHE_BYTES", DEFAULT_COMPILE_CACHE_BYTES)))
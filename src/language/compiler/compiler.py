@@ -1,110 +1,255 @@
 from dataclasses import dataclass
-from typing import Any, Callable, Dict
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import language.compiler.compiler_exceptions as cmpe
 
 from api.language_api.script_processor import ScriptProcessor
+from language.compiler.binary import dump_program
+from language.compiler.bytecode import ProgramBytecode
+from language.compiler.cache import COMPILE_CACHE
+from language.compiler.cse import eliminate_common_subexpressions, inline_predicates
+from language.compiler.dag import DependencyGraph, Schedule
+from language.compiler.fusion import fuse_chains
+from language.compiler.optimizer import optimize_program, optimize_statement
+from language.compiler.store import ARTIFACT_STORE
 from language.compiler.types import (
+    NODES,
     ComparisonOperator,
+    Conditional,
+    ElementSelector,
     ElementType,
+    Expression,
     ExtractStatement,
-    Literal,
-    LogicalExpression,
     LogicalOperator,
     Program,
+    Statement,
     Target,
 )
-from language.parsing.ast.actions.action_plugins.filter.filter import Filter
+from language.parsing.ast.actions.action_block import ActionBlock
+from language.parsing.ast.actions.action_plugins.filter.filter import (
+    FILTER_MEMO,
+    Filter,
+    normalize_filter,
+)
 from language.parsing.ast.trees import ScriptTree
-import language.compiler.compiler_exceptions as cmpe
+
 
 # Each IR node is going to be an ActionBlock.
 @dataclass
 class CompiledScript:
     IR: Program = None
     BYTECODE: Any = None
+    AST: ScriptTree = None
+    SCHEDULE: Schedule = None
+
+    @cached_property
+    def nbytes(self) -> int:
+        """ The size charged against the compile cache: the encoded sizes of the binary IR and of the bytecode. """
+        return len(dump_program(self.IR)) + len(self.BYTECODE.to_bytes())
+
+@dataclass
+class ProgramStream:
+    """ The Program of a script, whose statements are lowered lazily, one action block at a time. """
+    targets: List[Target]
+    statements: Iterator[Statement]
 
 class Compiler:
     def __init__(self, script: Any):  # noqa: N803
         self.STATES = {
             "AST": None,
             "IR": None,
-            "BYTECODE": None
+            "BYTECODE": None,
+            "SCHEDULE": None
         }
         self.script = script
         self.processor = ScriptProcessor(self.script)
-        #! FailPoint !# 
+        #! FailPoint !#
         # Ensure that the processor was able to initialize the script (i.e., that it was a valid object that can be interpreted.)'
         if not self.processor.is_valid_script:
-            # Then we can raise a CompilerException. This one expects the description of the 
+            # Then we can raise a CompilerException. This one expects the description of the
             raise cmpe.UnparsableScriptException(self.processor.script.get_issues())
         self.id = self.processor.id
+        # The result of compiling a previous version of the script, whose unchanged parts are reused.
+        self.previous: Optional[CompiledScript] = None
+        # The destinations requested by the caller; None when all of them are.
+        self.outputs: Optional[List[str]] = None
 
         pass
 
     def parse_to_ast(self) -> ScriptTree:
-        return self.processor.parse()
+        return self.processor.parse(previous=self.previous.AST if self.previous else None)
 
     def lower_to_ir(self):
         """Convert AST to IR in a straightforward manner"""
         program = Program()
 
         ast: ScriptTree = self.STATES["AST"]
+        # ActionBlocks reused from the previous version of the script keep their lowered statements too.
+        reusable = self._statements_by_block(self.previous) if self.previous else {}
         # Process targets
-        for target_name, url in ast.targets.items():
-            program.targets.append(Target(name=target_name, url=url))
+        program.targets.extend(self.lower_targets(ast.targets))
         # Process action blocks
         for block in ast.action_blocks:
-            target_name = block.target
-            # Process each action in the block
-            for action in block.actions:
-                match action.action_type:
-                    case 'filter':
-                        # Handle extract where actions
-                        condition = self.lower_filter_to_condition(action)
-                        output_var = action.metadata["assignment"].replace(';', "")
-
-                        extract_stmt = ExtractStatement(
-                            source=target_name,
-                            condition=condition,
-                            destination=output_var
-                        )
-                        program.statements.append(extract_stmt)
-                    case _:
-                        raise TypeError(f"Unexpected action type: {action.action_type}")
-                # Easy to add support for other action types here
-        print(program)
+            if id(block) in reusable:
+                program.statements.extend(reusable[id(block)])
+                continue
+            program.statements.extend(self.lower_block(block))
         return program
 
-    def lower_filter_to_condition(self, filter_action: Filter):
+    @staticmethod
+    def lower_targets(targets: Dict[str, str]) -> List[Target]:
+        return [Target(name=target_name, references=url) for target_name, url in targets.items()]
+
+    def lower_block(self, block: ActionBlock) -> List[Statement]:
+        """Lower every action of an ActionBlock to its statement"""
+        statements: List[Statement] = []
+        target_name = block.target
+        # Process each action in the block
+        for action in block.actions:
+            match action.action_type:
+                case 'filter':
+                    # Handle extract where actions
+                    condition = self.lower_statement_filter(action)
+                    output_var = action.metadata["assignment"].replace(';', "")
+
+                    extract_stmt = ExtractStatement(
+                        source=target_name,
+                        condition=condition,
+                        destination=output_var,
+                        from_alias=action.metadata["from_alias"] or None
+                    )
+                    statements.append(extract_stmt)
+                case _:
+                    raise TypeError(f"Unexpected action type: {action.action_type}")
+            # Easy to add support for other action types here
+        return statements
+
+    def stream(self) -> ProgramStream:
+        """ Lower the script block by block, as it is parsed, without building the whole AST or Program.
+
+        The compile cache is neither consulted nor filled, as no complete Program is ever built; for the same
+        reason, shared subexpressions are not hoisted into predicates (see cse.py), and 'extract from'
+        aliases are not resolved (see dag.py).
+        """
+        script = self.processor.stream()
+        statements = (optimize_statement(statement) for block in script.action_blocks for statement in self.lower_block(block))
+        return ProgramStream(targets=self.lower_targets(script.targets), statements=statements)
+
+    @staticmethod
+    def _statements_by_block(previous: "CompiledScript") -> Dict[int, List[Statement]]:
+        """Split a previous Program back into the statements lowered from each of its ActionBlocks"""
+        # Every action lowers to exactly one statement, in source order. Hoisted predicates are inlined back,
+        # as the Program is built (and its shared predicates found) again.
+        statements = inline_predicates(previous.IR)
+        if len(statements) != sum(len(block.actions) for block in previous.AST.action_blocks):
+            # Chains were fused: the statements no longer map back to the actions.
+            return {}
+        by_block: Dict[int, List[Statement]] = {}
+        offset = 0
+        for block in previous.AST.action_blocks:
+            by_block[id(block)] = statements[offset:offset + len(block.actions)]
+            offset += len(block.actions)
+        return by_block
+
+    def lower_statement_filter(self, filter_action: Filter) -> Expression:
+        """Lower the filter of an extract statement, reusing the IR of an identical filter lowered before"""
+        raw_filter = filter_action.metadata.get("raw_filter")
+        memoized = FILTER_MEMO.get(normalize_filter(raw_filter)) if raw_filter else None
+        # The memo entry only applies if it still holds the tree this statement was built from.
+        if memoized is None or memoized.filter.operands is not filter_action.operands or memoized.filter.value is not filter_action.value:
+            return self.lower_filter_to_condition(filter_action)
+        if memoized.lowered is None:
+            memoized.lowered = self.lower_filter_to_condition(filter_action)
+        return memoized.lowered
+
+    def lower_filter_to_condition(self, filter_action: Filter) -> Expression:
         """Convert a filter action to an IR condition"""
         # If it has an operator, it's a logical expression
-        print(filter_action)
         if filter_action.operator:
             expressions = [self.lower_filter_to_condition(op) for op in filter_action.operands]
-            return LogicalExpression(
+            return NODES.logical(
                 operator=LogicalOperator(filter_action.operator.value.lower()),
                 expressions=expressions
             )
 
-        # Otherwise, it's a leaf filter (comparison)
+        # Otherwise, it's a leaf filter (one or more comparisons)
         element_type = ElementType(filter_action.filter_type.value.lower())
+        if element_type == ElementType.ATTRIBUTE:
+            # Every key/value pair of an attribute filter must hold.
+            conditions = [
+                self._lower_comparison(NODES.selector(element_type, name=None if name == "any" else _unquote(name)), spec)
+                for name, spec in filter_action.value.items()
+            ]
+            if len(conditions) == 1:
+                return conditions[0]
+            return NODES.logical(operator=LogicalOperator.AND, expressions=conditions)
+        # Tag and text values are a list holding either the accepted options or a single contains clause.
+        spec = filter_action.value[0] if len(filter_action.value) == 1 else filter_action.value
+        return self._lower_comparison(NODES.selector(element_type), spec)
 
-        # Create appropriate selector based on element type
+    @staticmethod
+    def _lower_comparison(selector: ElementSelector, spec: Union[str, List, Dict]) -> Conditional:
+        """ The rhs of a comparison is a tuple of accepted values (any one may match); an empty tuple accepts anything. """
+        operator = ComparisonOperator.EQUALS
+        if isinstance(spec, dict):
+            operator = ComparisonOperator.CONTAINS
+            spec = spec["contains"]
+        if isinstance(spec, str):
+            spec = [spec]
+        return NODES.conditional(lhs=selector, rhs=NODES.literal(tuple(_unquote(value) for value in spec)), operator=operator)
 
-        selector = ElementSelector(element_type=element_type, select=filter_action.value)
+    def fuse(self, program: Program) -> Program:
+        """Fuse the chains of statements through intermediate destinations nobody requested (see fusion.py)"""
+        return program if self.outputs is None else fuse_chains(program, self.outputs)
 
-        # Handle the comparison operation
-        if isinstance(filter_action.value, dict) and "contains" in filter_action.value:
-            op = ComparisonOperator.CONTAINS
-            value = Literal(filter_action.value["contains"])
-        else:
-            op = ComparisonOperator.EQUALS
-            value = Literal(filter_action.value)
+    @staticmethod
+    def schedule(program: Program) -> Schedule:
+        """Resolve the 'extract from' dependencies between statements, and group them into stages (see dag.py)"""
+        return DependencyGraph.build(program).schedule()
+
+    @staticmethod
+    def optimize(program: Program) -> Program:
+        """Normalize every condition and order its operands by evaluation cost (see optimizer.py)"""
+        return optimize_program(program)
+
+    def compile(self, lookup: bool = True, previous: Optional[CompiledScript] = None,
+                outputs: Optional[Iterable[str]] = None, store: bool = True) -> CompiledScript:
+        """ Compile the script, reusing a cached result for identical content when one exists.
+
+        Args:
+            lookup (bool): Consult the in-memory compile cache before parsing. Callers that already missed it
+                pass False.
+            previous (CompiledScript, optional): The result of compiling an earlier version of the same script.
+                Only the action blocks edited since are parsed and lowered again.
+            outputs (Iterable[str], optional): The destinations the caller wants. Intermediate destinations which
+                are not requested, and which a single statement extracts from, are fused into it (see fusion.py).
+                By default every destination is an output, and nothing is fused.
+            store (bool): Consult the artifact store (see store.py) before parsing, when one is configured.
+                It outlives the process, so a miss in the compile cache can still be served from it.
+        """
+        self.previous = previous if previous is not None and previous.AST is not None else None
+        self.outputs = None if outputs is None else sorted(set(outputs))
+        variant = "" if self.outputs is None else "outputs=" + ",".join(self.outputs)
+        content = self.processor.script.get_content()
+        compiled = COMPILE_CACHE.get(content, variant) if lookup else None
+        if compiled is None and store and ARTIFACT_STORE is not None:
+            compiled = self._load_stored(COMPILE_CACHE.key(content, variant))
+            if compiled is not None:
+                COMPILE_CACHE.put(content, compiled, variant)
+        if compiled is not None:
+            self.STATES["AST"], self.STATES["IR"], self.STATES["BYTECODE"] = compiled.AST, compiled.IR, compiled.BYTECODE
+            self.STATES["SCHEDULE"] = compiled.SCHEDULE
+            return compiled
 
-        return Comparison(lhs=selector, rhs=value, operator=op)
-    def compile(self) -> CompiledScript:
         PASSES: Dict[str, Callable] = {  # noqa: N806
             "parse": self.parse_to_ast,
-            "lower_to_ir": self.lower_to_ir
+            "lower_to_ir": self.lower_to_ir,
+            "fuse": self.fuse,
+            "schedule": self.schedule,
+            "optimize": self.optimize,
+            "eliminate_common_subexpressions": eliminate_common_subexpressions,
+            "bytecode": ProgramBytecode.compile
         }
         for pass_name, call in PASSES.items():
             match pass_name:
@@ -112,5 +257,31 @@ class Compiler:
                     self.STATES['AST'] = call()
                 case 'lower_to_ir':
                     self.STATES['IR'] = call()
+                case 'schedule':
+                    self.STATES['SCHEDULE'] = call(self.STATES['IR'])
+                case 'fuse' | 'optimize' | 'eliminate_common_subexpressions':
+                    self.STATES['IR'] = call(self.STATES['IR'])
+                case 'bytecode':
+                    self.STATES['BYTECODE'] = call(self.STATES['IR'])
+        compiled = CompiledScript(IR=self.STATES["IR"], BYTECODE=self.STATES["BYTECODE"], AST=self.STATES["AST"],
+                                  SCHEDULE=self.STATES["SCHEDULE"])
+        COMPILE_CACHE.put(content, compiled, variant)
+        if ARTIFACT_STORE is not None:
+            ARTIFACT_STORE.put(COMPILE_CACHE.key(content, variant), compiled.IR, compiled.BYTECODE)
+        return compiled
+
+    def _load_stored(self, key: str) -> Optional[CompiledScript]:
+        """ The compiled script kept in the artifact store under key, if any. The store keeps no AST. """
+        stored = ARTIFACT_STORE.get(key)
+        if stored is None:
+            return None
+        program, bytecode = stored
+        # Fusion happens before scheduling, and the later passes keep every statement's source and destination.
+        return CompiledScript(IR=program, BYTECODE=bytecode, AST=None, SCHEDULE=self.schedule(program))
 
 
+def _unquote(value: str) -> str:
+    """ Strip the quotes a script string literal keeps through parsing. """
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
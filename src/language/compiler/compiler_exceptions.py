@@ -1,5 +1,8 @@
 from typing import List
+
 from api.language_api.script_representations import Issue
+
+
 class BaseCompilerException(Exception):
     def __init__(self) -> None:
         ...
@@ -11,6 +14,40 @@ class UnparsableScriptException(BaseCompilerException):
         for reason in reasons:
             self.reasons += (str(reason) + " \n")
         super().__init__()
-        
+
+    def __str__(self) -> str:
+        return f"Cannot parse provided sift script: {self.reasons}"
+
+class UndefinedAliasException(BaseCompilerException):
+    def __init__(self, alias: str, destination: str) -> None:
+        self.alias = alias
+        self.destination = destination
+        super().__init__()
+
+    def __str__(self) -> str:
+        return f"'{self.destination}' extracts from '{self.alias}', which is neither a target nor the destination of a statement"
+
+class DuplicateDestinationException(BaseCompilerException):
+    def __init__(self, destination: str) -> None:
+        self.destination = destination
+        super().__init__()
+
+    def __str__(self) -> str:
+        return f"'{self.destination}' is the destination of more than one statement"
+
+class UndefinedOutputException(BaseCompilerException):
+    def __init__(self, output: str) -> None:
+        self.output = output
+        super().__init__()
+
+    def __str__(self) -> str:
+        return f"'{self.output}' is requested as an output, but is not the destination of any statement"
+
+class CyclicDependencyException(BaseCompilerException):
+    def __init__(self, cycle: List[str]) -> None:
+        # The destinations along the cycle, each extracting from the next (and the last from the first).
+        self.cycle = cycle
+        super().__init__()
+
     def __str__(self) -> str:
-        return f"Cannot parse provided sift script: {self.reasons}"
\ No newline at end of file
+        return f"Statements extract from each other in a cycle: {' <- '.join(self.cycle + self.cycle[:1])}"
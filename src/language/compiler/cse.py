@@ -0,0 +1,166 @@
+""" Common-subexpression elimination across the statements of a source.
+
+The statements extracting from the same target are evaluated against the same elements, and often share
+predicates (`tag "li" and attribute "class": "item"`, with different trailing conditions). Each
+subexpression which occurs more than once among them is hoisted into a Predicate of the Program, and
+its occurrences are replaced by a PredicateRef: an evaluator computes a Predicate at most once per element.
+
+Expressions are interned (see NodeFactory), so occurrences are found by identity. A subexpression is only
+counted once per occurrence of an enclosing subexpression which is shared itself: the parts of a hoisted
+predicate are only evaluated within it, and are not hoisted unless they occur elsewhere too.
+
+The optimizer flattens `and` / `or` chains, so a shared group of operands is usually not a node of its
+own: `tag "li" and attribute "class": "item" and text contains "x"` is a single `and`. Operands are
+ordered by cost, so such a group is a common prefix of the operands; the longest prefix shared with
+another node is split out into a node of its own first, which leaves the evaluation order unchanged.
+"""
+from collections import Counter
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+from language.compiler.optimizer import cost
+from language.compiler.types import (
+    NODES,
+    Conditional,
+    Expression,
+    ExtractStatement,
+    LogicalExpression,
+    LogicalOperator,
+    Predicate,
+    PredicateRef,
+    Program,
+    Statement,
+)
+
+MIN_HOISTED_COST = 2
+""" Predicates cheaper than this (a tag check) are cheaper to evaluate again than to look up. """
+
+
+def eliminate_common_subexpressions(program: Program) -> Program:
+    """ Returns the Program with the subexpressions shared by the statements of each source hoisted into Predicates. """
+    by_source: Dict[str, List[ExtractStatement]] = {}
+    for statement in program.statements:
+        if isinstance(statement, ExtractStatement):
+            by_source.setdefault(statement.source, []).append(statement)
+
+    predicates: List[Predicate] = list(program.predicates)
+    rewritten: Dict[int, Statement] = {}
+    for source, statements in by_source.items():
+        hoister = _Hoister(source, statements, predicates)
+        for statement in statements:
+            rewritten[id(statement)] = replace(statement, condition=hoister.rewrite(statement.condition))
+    return Program(
+        targets=program.targets,
+        statements=[rewritten.get(id(statement), statement) for statement in program.statements],
+        predicates=predicates,
+    )
+
+
+def inline_predicates(program: Program) -> List[Statement]:
+    """ The statements of a Program with every PredicateRef replaced by the condition it refers to. """
+    conditions: Dict[str, Expression] = {}
+    for predicate in program.predicates:
+        conditions[predicate.name] = _inline(predicate.condition, conditions)
+    return [
+        replace(statement, condition=_inline(statement.condition, conditions)) if isinstance(statement, ExtractStatement) else statement
+        for statement in program.statements
+    ]
+
+
+def _inline(condition: Expression, conditions: Dict[str, Expression]) -> Expression:
+    if isinstance(condition, PredicateRef):
+        return conditions[condition.name]
+    if not isinstance(condition, LogicalExpression):
+        return condition
+    operands: List[Expression] = []
+    for operand in condition.expressions:
+        operand = _inline(operand, conditions)
+        # Undo the splitting of shared prefixes: the conditions were flat to begin with.
+        if condition.operator != LogicalOperator.NOT and isinstance(operand, LogicalExpression) and operand.operator == condition.operator:
+            operands.extend(operand.expressions)
+        else:
+            operands.append(operand)
+    return NODES.logical(condition.operator, operands)
+
+
+def _rebuilt(condition: LogicalExpression, operands: Tuple[Expression, ...]) -> LogicalExpression:
+    if len(operands) == len(condition.expressions) and all(new is old for new, old in zip(operands, condition.expressions, strict=True)):
+        return condition
+    return NODES.logical(condition.operator, operands)
+
+
+def _hoistable(condition: Expression) -> bool:
+    if isinstance(condition, LogicalExpression):
+        # The negation of a predicate costs nothing once the predicate is known: hoist its operand instead.
+        return condition.operator != LogicalOperator.NOT
+    return isinstance(condition, Conditional) and cost(condition) >= MIN_HOISTED_COST
+
+
+class _Hoister:
+    """ Hoists the subexpressions shared by the statements of one source. """
+    def __init__(self, source: str, statements: List[ExtractStatement], predicates: List[Predicate]):
+        self.source = source
+        self.predicates = predicates
+        self.refs: Dict[Expression, PredicateRef] = {}
+        self.prefixes = self._shared_prefixes(statement.condition for statement in statements)
+        self.factored: Dict[Expression, Expression] = {}
+        self.counts: Counter = Counter()
+        for statement in statements:
+            self._count(self._factor(statement.condition))
+
+    @staticmethod
+    def _shared_prefixes(conditions) -> Counter:
+        """ Counts, for each proper prefix of the operands of an 'and' / 'or', how many distinct nodes start with it. """
+        prefixes: Counter = Counter()
+        seen = set()
+        pending = list(conditions)
+        while pending:
+            condition = pending.pop()
+            if condition in seen or not isinstance(condition, LogicalExpression):
+                continue
+            seen.add(condition)
+            pending.extend(condition.expressions)
+            if condition.operator != LogicalOperator.NOT:
+                for length in range(2, len(condition.expressions) + 1):
+                    prefixes[(condition.operator, condition.expressions[:length])] += 1
+        return prefixes
+
+    def _factor(self, condition: Expression) -> Expression:
+        """ Splits the longest shared prefix of the operands of every 'and' / 'or' out into a node of its own. """
+        if not isinstance(condition, LogicalExpression):
+            return condition
+        factored = self.factored.get(condition)
+        if factored is not None:
+            return factored
+        operands: Tuple[Expression, ...] = tuple(self._factor(operand) for operand in condition.expressions)
+        if condition.operator != LogicalOperator.NOT:
+            for length in range(len(operands) - 1, 1, -1):
+                if self.prefixes[(condition.operator, condition.expressions[:length])] >= 2:
+                    operands = (NODES.logical(condition.operator, operands[:length]), *operands[length:])
+                    break
+        factored = self.factored[condition] = _rebuilt(condition, operands)
+        return factored
+
+    def _count(self, condition: Expression) -> None:
+        self.counts[condition] += 1
+        # A repeated subexpression is evaluated once: its operands are only counted the first time.
+        if self.counts[condition] == 1 and isinstance(condition, LogicalExpression):
+            for operand in condition.expressions:
+                self._count(operand)
+
+    def rewrite(self, condition: Expression) -> Expression:
+        return self._rewrite(self._factor(condition))
+
+    def _rewrite(self, condition: Expression) -> Expression:
+        ref = self.refs.get(condition)
+        if ref is not None:
+            return ref
+        rewritten = condition
+        if isinstance(condition, LogicalExpression):
+            rewritten = _rebuilt(condition, tuple(self._rewrite(operand) for operand in condition.expressions))
+        if self.counts[condition] < 2 or not _hoistable(condition):
+            return rewritten
+        # The operands are hoisted first, so that a Predicate only ever refers to earlier ones.
+        ref = self.refs[condition] = NODES.predicate_ref(f"{self.source}#{len(self.predicates)}")
+        self.predicates.append(Predicate(name=ref.name, source=self.source, condition=rewritten))
+        return ref
@@ -0,0 +1,125 @@
+""" Dependencies between the statements of a Program, and a parallel schedule for them.
+
+`extract from a where ...` reads the elements extracted into `a`, so it depends on the statement whose
+destination is `a`. A `from` alias which is a target name (or no alias at all) reads the target itself.
+Aliases resolve regardless of the order of the statements, so a script can define a destination after
+its first use; a destination defined twice, an alias which resolves to nothing, and statements which
+(transitively) extract from themselves are errors.
+
+The schedule groups the statements into stages: the statements of a stage only depend on statements of
+earlier stages, so they can run concurrently. Each stage also lists the destinations which are not read
+by any later stage, which an executor can release (or hand over as results) as soon as the stage is done.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import language.compiler.compiler_exceptions as cmpe
+
+from language.compiler.types import ExtractStatement, Program
+
+
+@dataclass(frozen=True)
+class Stage:
+    statements: Tuple[int, ...]
+    """ Indices (in DependencyGraph.statements) of the statements which can run concurrently. """
+    released: Tuple[str, ...]
+    """ The destinations no later stage reads from. """
+
+
+@dataclass(frozen=True)
+class Schedule:
+    stages: List[Stage] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class DependencyGraph:
+    """ The statements of a Program (by index), each pointing to the statement it extracts from, if any. """
+    statements: List[ExtractStatement]
+    """ The ExtractStatements of the Program, in order. """
+    producers: Dict[str, int]
+    """ The index of the statement producing each destination. """
+    dependencies: Dict[int, Optional[int]]
+    """ The index of the statement each statement extracts from; None for the ones reading a target. """
+    consumers: Dict[int, Tuple[int, ...]]
+    """ The indices of the statements extracting from each statement. """
+
+    @classmethod
+    def build(cls, program: Program) -> "DependencyGraph":
+        """ Resolves the 'from' aliases of a Program's statements.
+
+        Raises:
+            DuplicateDestinationException: Two statements have the same destination.
+            UndefinedAliasException: An alias is neither a destination nor a target.
+            CyclicDependencyException: Statements extract from each other in a cycle.
+        """
+        statements = [statement for statement in program.statements if isinstance(statement, ExtractStatement)]
+        targets = {target.name for target in program.targets}
+        producers: Dict[str, int] = {}
+        for index, statement in enumerate(statements):
+            if statement.destination in producers:
+                raise cmpe.DuplicateDestinationException(statement.destination)
+            producers[statement.destination] = index
+
+        dependencies: Dict[int, Optional[int]] = {}
+        consumers: Dict[int, List[int]] = {index: [] for index in range(len(statements))}
+        for index, statement in enumerate(statements):
+            alias = statement.from_alias
+            if not alias or (alias in targets and alias not in producers):
+                dependencies[index] = None
+                continue
+            if alias not in producers:
+                raise cmpe.UndefinedAliasException(alias, statement.destination)
+            dependencies[index] = producers[alias]
+            consumers[producers[alias]].append(index)
+
+        graph = cls(
+            statements=statements,
+            producers=producers,
+            dependencies=dependencies,
+            consumers={index: tuple(indices) for index, indices in consumers.items()},
+        )
+        graph._check_acyclic()
+        return graph
+
+    def _check_acyclic(self) -> None:
+        # Every statement depends on at most one other: following the dependencies from any statement
+        # either reaches a statement reading a target, or goes around a cycle.
+        done = set()
+        for start in self.dependencies:
+            path: List[int] = []
+            on_path = set()
+            index: Optional[int] = start
+            while index is not None and index not in done:
+                if index in on_path:
+                    cycle = path[path.index(index):]
+                    raise cmpe.CyclicDependencyException([self.statements[each].destination for each in cycle])
+                path.append(index)
+                on_path.add(index)
+                index = self.dependencies[index]
+            done.update(path)
+
+    def schedule(self) -> Schedule:
+        """ Groups the statements into stages of independent statements, in dependency order. """
+        levels: Dict[int, int] = {}
+        for start in self.dependencies:
+            path: List[int] = []
+            index: Optional[int] = start
+            while index is not None and index not in levels:
+                path.append(index)
+                index = self.dependencies[index]
+            level = levels[index] if index is not None else -1
+            for each in reversed(path):
+                level += 1
+                levels[each] = level
+
+        by_level: List[List[int]] = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+        for index in sorted(levels):
+            by_level[levels[index]].append(index)
+        # A destination is released after the stage of its last consumer (or its own, if it has none).
+        released: List[List[str]] = [[] for _ in by_level]
+        for index, statement in enumerate(self.statements):
+            last_use = max((levels[consumer] for consumer in self.consumers[index]), default=levels[index])
+            released[last_use].append(statement.destination)
+        return Schedule(stages=[
+            Stage(statements=tuple(indices), released=tuple(names)) for indices, names in zip(by_level, released, strict=True)
+        ])
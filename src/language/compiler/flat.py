@@ -0,0 +1,230 @@
+""" Flat, array-backed encodings of filter trees and IR conditions.
+
+A `Filter` tree or an IR condition is a web of dataclass instances: every node carries its own
+dict, its operand list and its enum references. Programs with tens of thousands of predicates pay
+for that in memory and in pointer chasing. A FlatTree stores the same tree in prefix order, in two
+machine arrays and a shared table of interned leaf payloads:
+
+    ops[i]    - the opcode of node i (AND, OR, NOT, or one of the leaf opcodes LEAF, REF, CONSTANT and SHARED)
+    spans[i]  - for an AND / OR / NOT node, the index just past its subtree (its operands are the
+                subtrees which follow it, up to there); for a SHARED node, the index of an identical
+                subtree encoded earlier; for any other leaf, its index in the literal table
+
+Identical leaves (the same `tag "div"`, the same attribute comparison...) are stored once in the
+LiteralTable, which can be shared by every tree of a Program. Several trees can also be appended to
+the same arrays; each is then known by the index of its root. The binary IR (see binary.py) stores the
+conditions of a Program this way.
+"""
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, Hashable, Iterator, Optional, Sequence, Tuple
+
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    Conditional,
+    ElementSelector,
+    ElementType,
+    Expression,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    PredicateRef,
+)
+from language.parsing.ast.actions.action_plugins.filter.filter import Filter
+from language.parsing.ast.enums import LogicalOperatorType
+
+
+class FlatOp(IntEnum):
+    AND = 0
+    OR = 1
+    NOT = 2
+    LEAF = 3
+    REF = 4       # A PredicateRef; its literal is the node itself.
+    CONSTANT = 5  # A bare Literal (the optimizer's TRUE and FALSE); its literal is the node itself.
+    SHARED = 6    # A repeated IR subtree, stored once: its span is the index of the first occurrence.
+
+
+_IR_OPERATORS = {LogicalOperator.AND: FlatOp.AND, LogicalOperator.OR: FlatOp.OR, LogicalOperator.NOT: FlatOp.NOT}
+_FILTER_OPERATORS = {LogicalOperatorType.AND: FlatOp.AND, LogicalOperatorType.OR: FlatOp.OR, LogicalOperatorType.NOT: FlatOp.NOT}
+_IR_OPERATORS_BY_OP = {op: operator for operator, op in _IR_OPERATORS.items()}
+_FILTER_OPERATORS_BY_OP = {op: operator for operator, op in _FILTER_OPERATORS.items()}
+
+LeafPayload = Tuple[ElementType, Optional[str], ComparisonOperator, Any]
+""" The payload of a condition LEAF: the element type and name of its selector, its operator and its values. """
+
+
+class LiteralTable:
+    """ Interned leaf payloads: each distinct payload is stored once and referred to by its index.
+
+    A table read back from an encoding may hold any sequence of values; only a list can be interned into.
+    """
+    __slots__ = ("values", "_index")
+
+    def __init__(self, values: Optional[Sequence[Any]] = None):
+        self.values: Sequence[Any] = values if values is not None else []
+        self._index: Dict[Hashable, int] = {}
+
+    def intern(self, key: Hashable, payload: Any) -> int:
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.values)
+            self.values.append(payload)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class FlatTree:
+    """ A tree of AND / OR / NOT nodes over leaves, in prefix order (see the module docstring).
+
+    ops and spans default to empty arrays; any indexable sequences of ints (e.g. memoryviews over an
+    encoded Program) can be read instead.
+    """
+    __slots__ = ("ops", "spans", "literals")
+
+    def __init__(self, literals: Optional[LiteralTable] = None, ops: Optional[Sequence[int]] = None,
+                 spans: Optional[Sequence[int]] = None):
+        self.ops = ops if ops is not None else array("B")
+        self.spans = spans if spans is not None else array("I")
+        self.literals = literals if literals is not None else LiteralTable()
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def end(self, index: int) -> int:
+        """ The index just past the subtree rooted at index. """
+        return index + 1 if self.ops[index] >= FlatOp.LEAF else self.spans[index]
+
+    def children(self, index: int) -> Iterator[int]:
+        """ The indices of the operands of the node at index. """
+        child, end = index + 1, self.end(index)
+        while child < end:
+            yield child
+            child = self.end(child)
+
+    def leaf(self, index: int) -> Any:
+        """ The payload of the leaf at index. """
+        return self.literals.values[self.spans[index]]
+
+    def _open(self, op: FlatOp) -> int:
+        self.ops.append(op)
+        self.spans.append(0)
+        return len(self.ops) - 1
+
+    def _close(self, index: int) -> None:
+        self.spans[index] = len(self.ops)
+
+    def _leaf(self, key: Hashable, payload: Any, op: FlatOp = FlatOp.LEAF) -> None:
+        self.ops.append(op)
+        self.spans.append(self.literals.intern(key, payload))
+
+
+def _freeze(value: Any) -> Hashable:
+    """ A hashable key for a Filter value (lists of options, attribute dicts, 'contains' clauses). """
+    if isinstance(value, dict):
+        return (type(value), tuple((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(item) for item in value))
+    return value
+
+
+class FlatFilter(FlatTree):
+    """ A `Filter` tree; each leaf payload is `(filter_type, value)`. Statement metadata is not part of the tree. """
+    __slots__ = ()
+
+    @classmethod
+    def from_filter(cls, root: Filter, literals: Optional[LiteralTable] = None) -> "FlatFilter":
+        flat = cls(literals)
+        flat._encode(root)
+        return flat
+
+    def _encode(self, node: Filter) -> None:
+        if node.operator:
+            index = self._open(_FILTER_OPERATORS[node.operator])
+            for operand in node.operands:
+                self._encode(operand)
+            self._close(index)
+            return
+        self._leaf((node.filter_type, _freeze(node.value)), (node.filter_type, node.value))
+
+    def to_filter(self, index: int = 0) -> Filter:
+        """ Rebuilds the Filter tree rooted at index. Leaf values are shared with the literal table. """
+        op = self.ops[index]
+        if op == FlatOp.LEAF:
+            filter_type, value = self.leaf(index)
+            return Filter(filter_type=filter_type, value=value)
+        return Filter(operator=_FILTER_OPERATORS_BY_OP[op], operands=[self.to_filter(child) for child in self.children(index)])
+
+
+class FlatCondition(FlatTree):
+    """ IR conditions; a LEAF payload is a LeafPayload, and a REF or CONSTANT payload its node.
+
+    A logical subtree which occurs again (in the same condition, or in a later one appended to the same arrays)
+    is encoded as a single SHARED node.
+    """
+    __slots__ = ("_subtrees",)
+
+    def __init__(self, literals: Optional[LiteralTable] = None, ops: Optional[Sequence[int]] = None,
+                 spans: Optional[Sequence[int]] = None):
+        super().__init__(literals, ops, spans)
+        self._subtrees: Dict[Expression, int] = {}
+
+    @classmethod
+    def from_condition(cls, root: Expression, literals: Optional[LiteralTable] = None) -> "FlatCondition":
+        flat = cls(literals)
+        flat.append(root)
+        return flat
+
+    def append(self, root: Expression) -> int:
+        """ Appends the condition rooted at root after the trees already held; returns the index of its root. """
+        if (shared := self._subtrees.get(root)) is not None:
+            return shared
+        start = len(self.ops)
+        self._encode(root)
+        return start
+
+    def _encode(self, node: Expression) -> None:
+        if isinstance(node, LogicalExpression):
+            if (shared := self._subtrees.get(node)) is not None:
+                self.ops.append(FlatOp.SHARED)
+                self.spans.append(shared)
+                return
+            index = self._open(_IR_OPERATORS[node.operator])
+            for operand in node.expressions:
+                self._encode(operand)
+            self._close(index)
+            self._subtrees[node] = index
+            return
+        if isinstance(node, (PredicateRef, Literal)):
+            self._leaf(node, node, FlatOp.REF if isinstance(node, PredicateRef) else FlatOp.CONSTANT)
+            return
+        if not isinstance(node, Conditional) or not isinstance(node.lhs, ElementSelector) or not isinstance(node.rhs, Literal):
+            raise TypeError(f"Cannot flatten the IR node: {node}")
+        payload: LeafPayload = (node.lhs.element_type, node.lhs.name, node.operator, node.rhs.value)
+        self._leaf(payload, payload)
+
+    def to_condition(self, index: int = 0, decoded: Optional[Dict[int, Expression]] = None) -> Expression:
+        """ Rebuilds the IR condition rooted at index, interned through NODES.
+
+        decoded maps the indices already rebuilt to their nodes; pass the same dict to rebuild several
+        conditions of the same arrays, so that each shared subtree is rebuilt once.
+        """
+        if decoded is None:
+            decoded = {}
+        node = decoded.get(index)
+        if node is not None:
+            return node
+        op = self.ops[index]
+        if op == FlatOp.LEAF:
+            element_type, name, operator, values = self.leaf(index)
+            node = NODES.conditional(lhs=NODES.selector(element_type, name), rhs=NODES.literal(values), operator=operator)
+        elif op == FlatOp.SHARED:
+            node = self.to_condition(self.spans[index], decoded)
+        elif op in (FlatOp.REF, FlatOp.CONSTANT):
+            node = NODES.intern(self.leaf(index))
+        else:
+            node = NODES.logical(_IR_OPERATORS_BY_OP[op], [self.to_condition(child, decoded) for child in self.children(index)])
+        decoded[index] = node
+        return node
@@ -0,0 +1,66 @@
+""" Fusion of chained extract statements.
+
+    extract where C1 -> a;
+    extract from a where C2 -> b;
+
+materializes all of `a` only for `b` to filter it again. When `a` is read by that one statement and
+is not one of the requested outputs, the chain is fused into a single statement over the original
+target:
+
+    extract where C1 and C2 -> b;
+
+Longer chains collapse the same way. Which destinations are outputs is declared by the caller (see
+Compiler.compile); a destination which is requested is always kept, whoever reads from it.
+"""
+from dataclasses import replace
+from typing import Dict, Iterable, List
+
+import language.compiler.compiler_exceptions as cmpe
+
+from language.compiler.dag import DependencyGraph
+from language.compiler.types import NODES, ExtractStatement, LogicalOperator, Program
+
+
+def fuse_chains(program: Program, outputs: Iterable[str]) -> Program:
+    """ Returns the Program with every single-consumer intermediate which is not an output fused into its consumer.
+
+    Raises:
+        UndefinedOutputException: An output is not the destination of any statement.
+        (and the exceptions of DependencyGraph.build)
+    """
+    graph = DependencyGraph.build(program)
+    outputs = set(outputs)
+    for output in outputs:
+        if output not in graph.producers:
+            raise cmpe.UndefinedOutputException(output)
+
+    def fusible(index: int) -> bool:
+        return graph.statements[index].destination not in outputs and len(graph.consumers[index]) == 1
+
+    fused: Dict[int, ExtractStatement] = {}
+
+    def fuse(index: int) -> ExtractStatement:
+        if index not in fused:
+            statement = graph.statements[index]
+            producer = graph.dependencies[index]
+            if producer is not None and fusible(producer):
+                upstream = fuse(producer)
+                statement = replace(
+                    statement,
+                    source=upstream.source,
+                    from_alias=upstream.from_alias,
+                    condition=NODES.logical(LogicalOperator.AND, (upstream.condition, statement.condition)),
+                )
+            fused[index] = statement
+        return fused[index]
+
+    statements: List = []
+    index = 0
+    for statement in program.statements:
+        if not isinstance(statement, ExtractStatement):
+            statements.append(statement)
+            continue
+        if not fusible(index):
+            statements.append(fuse(index))
+        index += 1
+    return Program(targets=program.targets, statements=statements, predicates=program.predicates)
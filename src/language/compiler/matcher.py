@@ -0,0 +1,61 @@
+""" Multi-pattern substring search: an Aho-Corasick automaton over every `contains` needle of a Program.
+
+Searching a string for each needle in turn costs a pass over the string per needle. The automaton finds
+the occurrences of all the needles in a single pass: its states are the prefixes of the needles, and each
+character moves to the state of the longest needle prefix ending there. Every state knows which needles
+end at it (including the needles which are suffixes of its prefix), so the needles found in a string are
+collected as it is scanned.
+
+The transitions are completed into a deterministic automaton when it is built (a character without a
+transition of its own follows the failure link of its state), so scanning costs a dict lookup per
+character, whatever the number of needles.
+"""
+from collections import deque
+from typing import Dict, FrozenSet, List, Sequence, Set
+
+
+class AhoCorasick:
+    def __init__(self, needles: Sequence[str]):
+        """
+        Args:
+            needles: The strings to find; `search` reports them by their position in this sequence.
+        """
+        self.needles = tuple(needles)
+        transitions: List[Dict[str, int]] = [{}]
+        outputs: List[Set[int]] = [set()]
+        for index, needle in enumerate(self.needles):
+            state = 0
+            for character in needle:
+                following = transitions[state].get(character)
+                if following is None:
+                    following = transitions[state][character] = len(transitions)
+                    transitions.append({})
+                    outputs.append(set())
+                state = following
+            outputs[state].add(index)
+
+        # Breadth first, so that the failure link of a state (a shorter prefix) is complete before the state.
+        failures = [0] * len(transitions)
+        complete: List[Dict[str, int]] = [dict(transitions[0])] + [{} for _ in transitions[1:]]
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            failure = failures[state]
+            complete[state] = {**complete[failure], **transitions[state]}
+            outputs[state] |= outputs[failure]
+            for character, following in transitions[state].items():
+                failures[following] = complete[failure].get(character, 0) if state else 0
+                queue.append(following)
+        self._transitions = complete
+        self._outputs: List[FrozenSet[int]] = [frozenset(found) for found in outputs]
+
+    def search(self, text: str) -> Set[int]:
+        """ The indices of the needles occurring in text. """
+        transitions, outputs = self._transitions, self._outputs
+        found = set(outputs[0])  # The empty needle, if any, occurs everywhere.
+        state = 0
+        for character in text:
+            state = transitions[state].get(character, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
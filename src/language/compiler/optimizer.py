@@ -0,0 +1,198 @@
+""" Boolean normalization and predicate ordering of IR conditions.
+
+The conditions lowered from filters mirror the parse: left-recursive binary `and` / `or` chains, `not`
+wrapped around whole groups, repeated predicates. `optimize_condition` rewrites a condition into an
+equivalent, canonical form which an evaluator can short-circuit as early as possible:
+
+    - associative `and` / `or` chains are flattened into a single n-ary node,
+    - `not` is pushed inward (De Morgan), so it only ever wraps a single comparison,
+    - duplicate operands are removed, and `x and not x` / `x or not x` are folded,
+    - wildcards are folded: `tag` / `text` accepting any value is always true, an attribute wildcard is
+      dropped next to a more specific comparison on the same attribute in an `and`, and absorbs it in an `or`,
+    - comparisons of the same selector are merged: their accepted values are united under `or`, and
+      intersected under `and` (an empty intersection can never match),
+    - operands are ordered by estimated evaluation cost: tag checks, then attribute checks, then text checks.
+
+Conditions which are always (or never) true fold into the constants TRUE and FALSE, boolean Literals.
+All nodes are built through NODES, so the result is interned like the rest of the IR.
+"""
+from dataclasses import replace
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    Conditional,
+    ElementSelector,
+    ElementType,
+    Expression,
+    ExtractStatement,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    Program,
+    Statement,
+)
+
+TRUE = NODES.literal(True)
+""" A condition every element satisfies. """
+FALSE = NODES.literal(False)
+""" A condition no element satisfies. """
+
+_LEAF_COST: Dict[Tuple[ElementType, ComparisonOperator], int] = {
+    (ElementType.TAG, ComparisonOperator.EQUALS): 1,
+    (ElementType.TAG, ComparisonOperator.CONTAINS): 2,
+    (ElementType.ATTRIBUTE, ComparisonOperator.EQUALS): 3,
+    (ElementType.ATTRIBUTE, ComparisonOperator.CONTAINS): 4,
+    (ElementType.TEXT, ComparisonOperator.EQUALS): 5,
+    (ElementType.TEXT, ComparisonOperator.CONTAINS): 6,
+}
+_DEFAULT_LEAF_COST = 6
+
+_DUAL = {LogicalOperator.AND: LogicalOperator.OR, LogicalOperator.OR: LogicalOperator.AND}
+
+
+def optimize_program(program: Program) -> Program:
+    return Program(targets=program.targets, statements=[optimize_statement(statement) for statement in program.statements])
+
+
+def optimize_statement(statement: Statement) -> Statement:
+    if isinstance(statement, ExtractStatement):
+        return replace(statement, condition=optimize_condition(statement.condition))
+    return statement
+
+
+@lru_cache(maxsize=4096)
+def optimize_condition(condition: Expression) -> Expression:
+    """ Returns the canonical, cost-ordered equivalent of an IR condition (see the module docstring). """
+    return _normalize(condition, negate=False)
+
+
+def cost(condition: Expression) -> int:
+    """ The estimated cost of evaluating a condition against one element. """
+    if isinstance(condition, Literal):
+        return 0
+    if isinstance(condition, Conditional):
+        return _LEAF_COST.get((condition.lhs.element_type, condition.operator), _DEFAULT_LEAF_COST)
+    return sum(cost(operand) for operand in condition.expressions)
+
+
+def _negated(condition: Expression) -> Expression:
+    if condition is TRUE:
+        return FALSE
+    if condition is FALSE:
+        return TRUE
+    return NODES.logical(LogicalOperator.NOT, (condition,))
+
+
+def _is_negation(condition: Expression) -> bool:
+    return isinstance(condition, LogicalExpression) and condition.operator == LogicalOperator.NOT
+
+
+def _accepts_anything(condition: Conditional) -> bool:
+    return condition.rhs.value == () and condition.operator == ComparisonOperator.EQUALS
+
+
+def _normalize(condition: Expression, negate: bool) -> Expression:
+    if isinstance(condition, Literal):
+        return _negated(condition) if negate else condition
+    if isinstance(condition, Conditional):
+        # Every element has a tag and a text, so a wildcard over either holds for every element.
+        if _accepts_anything(condition) and condition.lhs.element_type in (ElementType.TAG, ElementType.TEXT):
+            condition = TRUE
+        return _negated(condition) if negate else condition
+    if condition.operator == LogicalOperator.NOT:
+        if len(condition.expressions) == 1:
+            return _normalize(condition.expressions[0], not negate)
+        # A multi-operand 'not' negates the conjunction of its operands.
+        return _normalize(NODES.logical(LogicalOperator.AND, condition.expressions), not negate)
+    operator = _DUAL[condition.operator] if negate else condition.operator
+    return _combine(operator, [_normalize(operand, negate) for operand in condition.expressions])
+
+
+def _combine(operator: LogicalOperator, operands: List[Expression]) -> Expression:
+    identity, absorbing = (TRUE, FALSE) if operator == LogicalOperator.AND else (FALSE, TRUE)
+    flattened: Dict[Expression, None] = {}
+    for operand in operands:
+        nested = operand.expressions if isinstance(operand, LogicalExpression) and operand.operator == operator else (operand,)
+        for item in nested:
+            if item is absorbing:
+                return absorbing
+            if item is not identity:
+                flattened[item] = None
+    negated = [operand.expressions[0] for operand in flattened if _is_negation(operand)]
+    if any(operand in flattened for operand in negated):
+        # x and not x / x or not x
+        return absorbing
+    merged = _merge_comparisons(operator, list(flattened))
+    if merged is absorbing or not merged:
+        return merged or identity
+    if len(merged) < len(flattened):
+        # A merged comparison may now cancel out (or duplicate) one of its siblings.
+        return _combine(operator, merged)
+    if len(merged) == 1:
+        return merged[0]
+    return NODES.logical(operator, sorted(merged, key=cost))
+
+
+def _is_single_valued(selector: ElementSelector) -> bool:
+    # A tag, a text or a named attribute has one value; 'any attribute' does not.
+    return selector.element_type != ElementType.ATTRIBUTE or selector.name is not None
+
+
+def _merge_comparisons(operator: LogicalOperator, operands: List[Expression]):
+    """ Merges the comparisons of the same selector, and folds attribute wildcards (see the module docstring). """
+    groups: Dict[Tuple[ElementSelector, ComparisonOperator], List[Conditional]] = {}
+    for operand in operands:
+        if isinstance(operand, Conditional):
+            groups.setdefault((operand.lhs, operand.operator), []).append(operand)
+
+    replacements: Dict[Expression, Expression] = {}
+    for (selector, comparison), comparisons in groups.items():
+        if len(comparisons) < 2:
+            continue
+        if operator == LogicalOperator.OR:
+            # Accepting any value of either comparison; a wildcard accepts them all.
+            if any(_accepts_anything(each) for each in comparisons):
+                values = ()
+            else:
+                values = tuple(dict.fromkeys(value for each in comparisons for value in each.rhs.value))
+        elif comparison == ComparisonOperator.EQUALS and _is_single_valued(selector):
+            # A single value has to be accepted by every comparison; wildcards accept everything.
+            accepted = [each.rhs.value for each in comparisons if not _accepts_anything(each)]
+            if not accepted:
+                values = ()
+            else:
+                values = tuple(value for value in accepted[0] if all(value in other for other in accepted[1:]))
+                if not values:
+                    return FALSE
+        else:
+            continue
+        merged = NODES.conditional(lhs=selector, rhs=NODES.literal(values), operator=comparison)
+        for each in comparisons:
+            replacements[each] = merged
+
+    result = list(dict.fromkeys(replacements.get(operand, operand) for operand in operands))
+    attribute_wildcards = [
+        operand for operand in result
+        if isinstance(operand, Conditional) and operand.lhs.element_type == ElementType.ATTRIBUTE and _accepts_anything(operand)
+    ]
+    for wildcard in attribute_wildcards:
+        if wildcard not in result:
+            continue
+        covered = [
+            operand for operand in result
+            if operand is not wildcard and isinstance(operand, Conditional)
+            and operand.lhs.element_type == ElementType.ATTRIBUTE
+            and (wildcard.lhs.name is None or operand.lhs.name == wildcard.lhs.name)
+        ]
+        if not covered:
+            continue
+        if operator == LogicalOperator.AND:
+            # Any comparison on the attribute already requires it to be present.
+            result.remove(wildcard)
+        else:
+            # The attribute being present is implied by any comparison on it.
+            result = [operand for operand in result if operand not in covered]
+    return result
@@ -0,0 +1,165 @@
+""" A persistent, content-addressed store of compiled artifacts.
+
+COMPILE_CACHE lives in memory, so every restarted (or newly added) worker compiles every script from scratch.
+When ``SIFT_ARTIFACT_STORE`` names a directory, the compiler also keeps each compiled script there, in a file
+named by its compile cache key (the script content, the compiler version, the grammar hash and the compile
+options), holding the Program (see binary.py) followed by its bytecode (see ProgramBytecode.to_bytes).
+Workers sharing the directory get warm hits for anything any of them has compiled.
+
+Entries are written to a temporary file in the same directory and renamed into place, so a reader never sees a
+partial entry; they are read through a read-only mmap. The store is capped at ``SIFT_ARTIFACT_STORE_BYTES``
+(default 256 MiB): a hit refreshes the modification time of its entry, and writing past the cap deletes the
+least recently used entries. Entries which cannot be decoded (truncated, or written by other encoding versions)
+are deleted and count as misses. The AST is not stored: a script loaded from the store has none.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+from typing import List, Optional, Tuple
+
+from language.compiler.binary import ProgramReader, dump_program
+from language.compiler.bytecode import ProgramBytecode
+from language.compiler.types import Program
+
+ARTIFACT_STORE_VERSION = 1
+DEFAULT_ARTIFACT_STORE_BYTES = 256 * 1024 * 1024
+_MAGIC = b"SIFTAS"
+_HEADER = struct.Struct("<6sHQQ")
+""" magic, version, then the sizes of the encoded Program and of the bytecode which follow it. """
+_SUFFIX = ".sca"
+
+store_logger = logging.getLogger(__name__)
+
+
+def _encode(program: Program, bytecode: ProgramBytecode) -> bytes:
+    encoded_program, encoded_bytecode = dump_program(program), bytecode.to_bytes()
+    header = _HEADER.pack(_MAGIC, ARTIFACT_STORE_VERSION, len(encoded_program), len(encoded_bytecode))
+    return b"".join([header, encoded_program, encoded_bytecode])
+
+
+def _decode(buffer) -> Tuple[Program, ProgramBytecode]:
+    with memoryview(buffer) as view:
+        if len(view) < _HEADER.size:
+            raise ValueError("Truncated artifact")
+        magic, version, program_size, bytecode_size = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a Sift artifact")
+        if version != ARTIFACT_STORE_VERSION:
+            raise ValueError(f"Unsupported artifact version {version} (expected {ARTIFACT_STORE_VERSION})")
+        if _HEADER.size + program_size + bytecode_size != len(view):
+            raise ValueError("Truncated artifact")
+        bytecode_at = _HEADER.size + program_size
+        with view[_HEADER.size:bytecode_at] as encoded_program, ProgramReader(encoded_program) as reader:
+            program = reader.to_program()
+        with view[bytecode_at:] as encoded_bytecode:
+            bytecode = ProgramBytecode.from_bytes(encoded_bytecode)
+    return program, bytecode
+
+
+class ArtifactStore:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_ARTIFACT_STORE_BYTES):
+        if max_bytes < 0:
+            raise ValueError(f"Expected a non-negative artifact store size, instead got: {max_bytes}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key: str) -> Optional[Tuple[Program, ProgramBytecode]]:
+        """ Return the Program and bytecode stored under ``key`` (a CompileCache key), or None. """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                artifacts = _decode(mapped)
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error) as error:
+            store_logger.warning("Discarding the unreadable artifact %s: %s", path, error)
+            self._remove(path)
+            return None
+        except OSError as error:
+            store_logger.warning("Could not read the artifact %s: %s", path, error)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Evicted by another worker in the meantime.
+        return artifacts
+
+    def put(self, key: str, program: Program, bytecode: ProgramBytecode) -> bool:
+        """ Store the artifacts of a compiled script; returns False when they were not stored. """
+        data = _encode(program, bytecode)
+        if len(data) > self.max_bytes:
+            store_logger.info("Compiled artifacts exceed the artifact store size of %d bytes; not storing them.", self.max_bytes)
+            return False
+        try:
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+            try:
+                os.chmod(temporary, 0o644)  # mkstemp creates it private to this user; other workers read it too.
+                with os.fdopen(descriptor, "wb") as file:
+                    file.write(data)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                self._remove(temporary)
+                raise
+        except OSError as error:
+            store_logger.warning("Could not store the artifacts of %s: %s", key, error)
+            return False
+        self._evict()
+        return True
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """ (last use, size, path) of every entry. """
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                try:
+                    status = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def size(self) -> int:
+        """ The total size in bytes of the stored entries. """
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            self._remove(path)
+
+
+def _configured_store() -> Optional[ArtifactStore]:
+    directory = os.environ.get("SIFT_ARTIFACT_STORE")
+    if not directory:
+        return None
+    return ArtifactStore(directory, max_bytes=int(os.environ.get("SIFT_ARTIFACT_STORE_BYTES", DEFAULT_ARTIFACT_STORE_BYTES)))
+
+
+ARTIFACT_STORE: Optional[ArtifactStore] = _configured_store()
+""" The store shared by the compiler; None unless SIFT_ARTIFACT_STORE is set. """
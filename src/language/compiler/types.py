@@ -1,9 +1,14 @@
 import json
+import threading
+import weakref
 
 from abc import ABC, abstractmethod
-from dataclasses import asdict, dataclass, field, is_dataclass
+from dataclasses import asdict, dataclass, field, fields, is_dataclass
 from enum import Enum
-from typing import Any, Dict, Generic, List, Protocol, TypeVar, Union
+from functools import lru_cache
+from typing import Any, Dict, Generic, List, Optional, Protocol, Tuple, TypeVar, Union
+
+import orjson
 
 
 class SupportsToDict(Protocol):
@@ -49,22 +54,87 @@ class IRNode:
     """Base class for all IR nodes"""
 
     def to_dict(self) -> Dict:
-        result = {"type": self.__class__.__name__}
-        for key, value in self.__dict__.items():
-            if isinstance(value, IRNode):
-                result[key] = value.to_dict()
-            elif isinstance(value, list) and value and isinstance(value[0], IRNode):
-                result[key] = [item.to_dict() for item in value]
-            elif isinstance(value, Enum):
-                result[key] = value.value
-            else:
-                result[key] = value
+        type_name, field_names = _layout(self.__class__)
+        result = {"type": type_name}
+        for key in field_names:
+            result[key] = _plain(getattr(self, key))
         return result
 
     def to_json(self, indent=2) -> str:
         """Convert IR node to a JSON string"""
+        if indent in (None, 2):
+            return self.to_json_bytes(pretty=indent is not None).decode()
         return json.dumps(self.to_dict(), indent=indent, cls=IRJSONEncoder)
 
+    def to_json_bytes(self, pretty: bool = False) -> bytes:
+        """Convert IR node to compact JSON bytes (indented if pretty), without building the intermediate dicts"""
+        return orjson.dumps(self, default=_serialize, option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if pretty else 0))
+
+    def __getstate__(self) -> Dict:
+        # A cached hash is only valid in the process which computed it (str hashes are salted per process).
+        state = dict(self.__dict__)
+        state.pop("_hash", None)
+        return state
+
+@lru_cache(maxsize=None)
+def _field_names(cls) -> Tuple[str, ...]:
+    return tuple(node_field.name for node_field in fields(cls))
+
+@lru_cache(maxsize=None)
+def _layout(cls) -> Tuple[str, Tuple[str, ...]]:
+    return cls.__name__, _field_names(cls)
+
+def _plain(value: Any) -> Any:
+    """ The to_dict form of a field value. Sequences are converted item by item, whatever their first item is. """
+    if isinstance(value, IRNode):
+        return value.to_dict()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)) and any(isinstance(item, (IRNode, Enum)) for item in value):
+        return [_plain(item) for item in value]
+    return value
+
+# orjson serializes enums, strings and sequences natively; IR nodes are handed to _serialize, which maps each
+# class to a generated function building its {"type": ..., field: value...} dict (nested nodes are left to orjson).
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS
+_SERIALIZERS: Dict[type, Any] = {}
+
+def _serializer(cls):
+    type_name, field_names = _layout(cls)
+    entries = ", ".join(f"{name!r}: node.{name}" for name in field_names)
+    return eval(f"lambda node: {{'type': {type_name!r}, {entries}}}", {})  # noqa: S307 (dataclass field names only)
+
+def _serialize(obj: Any) -> Any:
+    serializer = _SERIALIZERS.get(obj.__class__)
+    if serializer is None:
+        if not isinstance(obj, IRNode):
+            raise TypeError(f"Cannot serialize {type(obj).__name__}")
+        serializer = _SERIALIZERS[obj.__class__] = _serializer(obj.__class__)
+    return serializer(obj)
+
+def _cached_hash(self) -> int:
+    cached = self.__dict__.get("_hash")
+    if cached is None:
+        cached = hash(tuple(getattr(self, name) for name in _field_names(self.__class__)))
+        object.__setattr__(self, "_hash", cached)
+    return cached
+
+def _identity_first_eq(self, other) -> bool:
+    if self is other:
+        return True
+    if other.__class__ is not self.__class__:
+        return NotImplemented
+    # Interned nodes are equal only if they are the same object; the cached hashes settle most other cases.
+    if hash(self) != hash(other):
+        return False
+    return all(getattr(self, name) == getattr(other, name) for name in _field_names(self.__class__))
+
+def hash_consed(cls):
+    """ Gives an IR node class a cached hash and an identity-first equality, for use with NodeFactory. """
+    cls.__hash__ = _cached_hash
+    cls.__eq__ = _identity_first_eq
+    return cls
+
 @dataclass(frozen=True)
 class Expression(IRNode):
     """Base class for all expressions"""
@@ -79,6 +149,7 @@ class Statement(IRNode):
 # Expressions #
 ####################
 
+@hash_consed
 @dataclass(frozen=True)
 class Literal(Expression):
     """A literal value"""
@@ -93,6 +164,15 @@ class Variable(Expression):
 class Target(Variable):
     """Target definition for scraping"""
     references: str
+
+@hash_consed
+@dataclass(frozen=True)
+class ElementSelector(Expression):
+    """The part of an element a Conditional inspects: its tag, its text, or an attribute (any attribute if name is None)"""
+    element_type: ElementType
+    name: Optional[str] = None
+
+@hash_consed
 @dataclass(frozen=True)
 class Conditional(Expression):
     """A comparison expression (e.g., tag equals "div")"""
@@ -100,11 +180,18 @@ class Conditional(Expression):
     rhs: Expression
     operator: ComparisonOperator
 
+@hash_consed
 @dataclass(frozen=True)
 class LogicalExpression(Expression):
     """A logical combination of expressions"""
     operator: LogicalOperator
-    expressions: List[Expression]
+    expressions: Tuple[Expression, ...]
+
+@hash_consed
+@dataclass(frozen=True)
+class PredicateRef(Expression):
+    """A reference to a named Predicate of the Program, evaluated at most once per element"""
+    name: str
 
 ####################
 # Statements #
@@ -116,16 +203,67 @@ class ExtractStatement(Statement):
     source: str  # Target name
     condition: Expression
     destination: str  # Variable name
+    from_alias: Optional[str] = None  # The destination (or target) extracted from, with 'extract from'
 
 
 
+@dataclass(frozen=True)
+class Predicate(IRNode):
+    """A condition shared by several statements of a source, hoisted into a named slot"""
+    name: str
+    source: str  # Target name
+    condition: Expression
+
+
 @dataclass(frozen=True)
 class Program(IRNode):
     """The complete program"""
     targets: List[Target] = field(default_factory=list)
     statements: List[Statement] = field(default_factory=list)
+    predicates: List[Predicate] = field(default_factory=list)  # In dependency order: a Predicate only refers to earlier ones
+
+class NodeFactory:
+    """ Builds interned (hash-consed) expression nodes.
+
+    Structurally identical nodes built through the factory are the same object, so identical subtrees are
+    shared, hashed once, and compared by identity. Nodes are held weakly: a node is forgotten once nothing
+    else refers to it. Build children through the factory before their parents, so that they are interned too.
+    """
+    def __init__(self):
+        self._nodes: "weakref.WeakValueDictionary[Tuple, Expression]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, node: Expression) -> Expression:
+        """ Returns the canonical instance of node (node itself, the first time it is seen). """
+        key = (node.__class__, *(getattr(node, name) for name in _field_names(node.__class__)))
+        with self._lock:
+            canonical = self._nodes.get(key)
+            if canonical is None:
+                self._nodes[key] = canonical = node
+        return canonical
+
+    def literal(self, value: Any) -> Literal:
+        return self.intern(Literal(value))
+
+    def selector(self, element_type: ElementType, name: Optional[str] = None) -> ElementSelector:
+        return self.intern(ElementSelector(element_type, name))
+
+    def conditional(self, lhs: Expression, rhs: Expression, operator: ComparisonOperator) -> Conditional:
+        return self.intern(Conditional(lhs=lhs, rhs=rhs, operator=operator))
+
+    def logical(self, operator: LogicalOperator, expressions) -> LogicalExpression:
+        return self.intern(LogicalExpression(operator=operator, expressions=tuple(expressions)))
+
+    def predicate_ref(self, name: str) -> PredicateRef:
+        return self.intern(PredicateRef(name))
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+NODES = NodeFactory()
+""" The process-wide node factory the compiler builds expressions with. """
 
 def ir_to_json(file: str, ir_node: IRNode):
     """Print an IR node as formatted JSON"""
-    with open(file, 'w') as f:
-        f.write(ir_node.to_json())
+    with open(file, 'wb') as f:
+        f.write(ir_node.to_json_bytes(pretty=True))
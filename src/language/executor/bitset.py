@@ -0,0 +1,270 @@
+""" Vectorized evaluation: every condition is computed for all the elements of a document at once.
+
+An ElementTable stores the elements of a document column by column: the tags, the texts, and the values of
+each attribute name, each dictionary encoded (a vocabulary of the distinct values, and the code of every
+element's value). A comparison is then decided once per distinct value rather than once per element, and
+turned into a mask of the elements (a bitset) in bulk; `and`, `or` and `not` are bitwise operations on
+whole masks. The per-element interpretation of the Interpreter is replaced by a handful of bulk operations
+per statement.
+
+Masks are Python ints (bit `i` for element `i`), or NumPy boolean arrays when NumPy is installed (see
+BitsetExecutor). With ints, a column with at most 256 distinct values is turned into a mask by a single
+bytes.translate; larger vocabularies go through the elements of each matching value.
+"""
+import re
+import weakref
+
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from language.compiler.bytecode import ProgramBytecode
+from language.compiler.types import (
+    ComparisonOperator,
+    Conditional,
+    ElementType,
+    Expression,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    PredicateRef,
+    Program,
+)
+from language.executor.document import Document, Node
+from language.executor.executor import Executor, Results
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_ONES = re.compile("1")
+
+
+@dataclass
+class Column:
+    """ A dictionary encoded column: `vocabulary[codes[i]]` is the value of element `i`. """
+    vocabulary: List[Optional[str]]
+    codes: array
+    _postings: Optional[List[List[int]]] = field(default=None, repr=False)
+    _bytes: Optional[bytes] = field(default=None, repr=False)
+    _numpy: Any = field(default=None, repr=False)
+
+    def postings(self) -> List[List[int]]:
+        """ The elements having each code. """
+        if self._postings is None:
+            self._postings = [[] for _ in self.vocabulary]
+            for index, code in enumerate(self.codes):
+                self._postings[code].append(index)
+        return self._postings
+
+    def as_bytes(self) -> bytes:
+        """ The codes as one byte each (only for vocabularies of at most 256 values). """
+        if self._bytes is None:
+            self._bytes = array("B", self.codes).tobytes()
+        return self._bytes
+
+    def as_numpy(self):
+        if self._numpy is None:
+            self._numpy = numpy.frombuffer(self.codes, dtype=numpy.uint32)
+        return self._numpy
+
+    def matching(self, condition: Conditional) -> Set[int]:
+        """ The codes of the values which satisfy a comparison (a missing attribute, code 0, never does). """
+        values = condition.rhs.value
+        first = 1 if self.vocabulary and self.vocabulary[0] is None else 0
+        if condition.operator == ComparisonOperator.CONTAINS:
+            return {code for code in range(first, len(self.vocabulary)) if any(needle in self.vocabulary[code] for needle in values)}
+        if not values:
+            return set(range(first, len(self.vocabulary)))
+        accepted = frozenset(values)
+        return {code for code in range(first, len(self.vocabulary)) if self.vocabulary[code] in accepted}
+
+
+class _Encoder:
+    def __init__(self, missing: bool = False):
+        self.vocabulary: List[Optional[str]] = [None] if missing else []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.vocabulary)
+            self.vocabulary.append(value)
+        return code
+
+
+@dataclass
+class ElementTable:
+    size: int
+    tags: Column
+    texts: Column
+    attributes: Dict[str, Column]
+    """ A column per attribute name, in which code 0 stands for the elements without the attribute. """
+
+    @classmethod
+    def build(cls, document: Document) -> "ElementTable":
+        elements = document.elements
+        tags, texts = _Encoder(), _Encoder()
+        tag_codes = array("I", [tags.code(node.tag) for node in elements])
+        text_codes = array("I", [texts.code(node.text) for node in elements])
+        encoders: Dict[str, _Encoder] = {}
+        attribute_codes: Dict[str, array] = {}
+        for node in elements:
+            for name, value in node.attributes.items():
+                encoder = encoders.get(name)
+                if encoder is None:
+                    encoder = encoders[name] = _Encoder(missing=True)
+                    attribute_codes[name] = array("I", bytes(4 * len(elements)))
+                attribute_codes[name][node.index] = encoder.code(value)
+        return cls(
+            size=len(elements),
+            tags=Column(tags.vocabulary, tag_codes),
+            texts=Column(texts.vocabulary, text_codes),
+            attributes={name: Column(encoders[name].vocabulary, codes) for name, codes in attribute_codes.items()},
+        )
+
+
+_TABLES: "weakref.WeakKeyDictionary[Document, ElementTable]" = weakref.WeakKeyDictionary()
+
+
+def table_of(document: Document) -> ElementTable:
+    """ The table of a document, built on first use and kept as long as the document is. """
+    table = _TABLES.get(document)
+    if table is None:
+        table = _TABLES[document] = ElementTable.build(document)
+    return table
+
+
+class IntMasks:
+    """ Masks as Python ints. """
+    def __init__(self, size: int):
+        self.size = size
+        self.none = 0
+        self.everything = (1 << size) - 1
+
+    def of_column(self, column: Column, matching: Set[int]):
+        if not matching or not self.size:
+            return 0
+        if len(column.vocabulary) <= 256:
+            table = bytes(49 if code in matching else 48 for code in range(256))  # b"1" / b"0"
+            return int(column.as_bytes().translate(table)[::-1], 2)
+        postings = column.postings()
+        return self.of_indices([index for code in matching for index in postings[code]])
+
+    def of_indices(self, indices: Iterable[int]):
+        flags = bytearray(b"0" * self.size)
+        for index in indices:
+            flags[index] = 49
+        return int(flags[::-1], 2) if self.size else 0
+
+    def is_empty(self, mask) -> bool:
+        return not mask
+
+    def indices(self, mask) -> List[int]:
+        if not mask:
+            return []
+        return [found.start() for found in _ONES.finditer(format(mask, "b")[::-1])]
+
+
+class NumpyMasks:
+    """ Masks as NumPy boolean arrays. """
+    def __init__(self, size: int):
+        self.size = size
+        self.none = numpy.zeros(size, dtype=bool)
+        self.everything = numpy.ones(size, dtype=bool)
+
+    def of_column(self, column: Column, matching: Set[int]):
+        lookup = numpy.zeros(len(column.vocabulary), dtype=bool)
+        if matching:
+            lookup[list(matching)] = True
+        return lookup[column.as_numpy()]
+
+    def of_indices(self, indices: Iterable[int]):
+        mask = numpy.zeros(self.size, dtype=bool)
+        mask[numpy.fromiter(indices, dtype=numpy.intp)] = True
+        return mask
+
+    def is_empty(self, mask) -> bool:
+        return not mask.any()
+
+    def indices(self, mask) -> List[int]:
+        return numpy.flatnonzero(mask).tolist()
+
+
+class _Vectorizer:
+    """ Computes the masks of conditions over one document, each subexpression once. """
+    def __init__(self, table: ElementTable, masks, predicates: Dict[str, Expression]):
+        self.table = table
+        self.masks = masks
+        self.predicates = predicates
+        self._cache: Dict[Expression, Any] = {}
+
+    def mask(self, condition: Expression):
+        found = self._cache.get(condition)
+        if found is None:
+            found = self._cache[condition] = self._compute(condition)
+        return found
+
+    def _compute(self, condition: Expression):
+        masks = self.masks
+        if isinstance(condition, Conditional):
+            return self._comparison(condition)
+        if isinstance(condition, LogicalExpression):
+            operands = condition.expressions
+            if condition.operator == LogicalOperator.NOT:
+                return masks.everything ^ self.mask(operands[0])
+            mask = self.mask(operands[0])
+            for operand in operands[1:]:
+                if condition.operator == LogicalOperator.AND:
+                    if masks.is_empty(mask):
+                        break
+                    mask = mask & self.mask(operand)
+                else:
+                    mask = mask | self.mask(operand)
+            return mask
+        if isinstance(condition, Literal):
+            return masks.everything if condition.value else masks.none
+        if isinstance(condition, PredicateRef):
+            return self.mask(self.predicates[condition.name])
+        raise TypeError(f"Cannot evaluate the IR node: {condition}")
+
+    def _comparison(self, condition: Conditional):
+        selector, masks, table = condition.lhs, self.masks, self.table
+        if selector.element_type == ElementType.TAG:
+            return masks.of_column(table.tags, table.tags.matching(condition))
+        if selector.element_type == ElementType.TEXT:
+            return masks.of_column(table.texts, table.texts.matching(condition))
+        if selector.name is not None:
+            column = table.attributes.get(selector.name)
+            return masks.none if column is None else masks.of_column(column, column.matching(condition))
+        mask = masks.none
+        for column in table.attributes.values():
+            mask = mask | masks.of_column(column, column.matching(condition))
+        return mask
+
+
+class BitsetExecutor(Executor):
+    """ Evaluates statements over the element tables of the documents (see the module docstring).
+
+    Args:
+        use_numpy (bool, optional): Whether masks are NumPy arrays; by default, whenever NumPy is installed.
+    """
+    def __init__(self, program: Program, bytecode: Optional[ProgramBytecode] = None, use_numpy: Optional[bool] = None):
+        super().__init__(program, bytecode)
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.masks = NumpyMasks if (numpy is not None if use_numpy is None else use_numpy) else IntMasks
+        self.predicates = {predicate.name: predicate.condition for predicate in program.predicates}
+
+    def evaluate(self, indices: List[int], document: Document, elements: List[Node], results: Results) -> None:
+        table = table_of(document)
+        masks = self.masks(table.size)
+        vectorizer = _Vectorizer(table, masks, self.predicates)
+        candidates = None if elements is document.elements else masks.of_indices(node.index for node in elements)
+        for index in indices:
+            statement = self.graph.statements[index]
+            mask = vectorizer.mask(statement.condition)
+            if candidates is not None:
+                mask = mask & candidates
+            results[statement.destination] = [document.elements[each] for each in masks.indices(mask)]
@@ -0,0 +1,155 @@
+""" HTML documents as flat tables of elements, parsed with the standard library's html.parser.
+
+Every element is a Node: its tag and attribute names are lowercase (as html.parser reports them), a
+valueless attribute has the value "", and its text is the text of all its descendants, with runs of
+whitespace collapsed to single spaces. The elements of a Document are listed in document order (the
+order of their start tags), so an element's index is its position in the page.
+
+Parsing is forgiving, as HTML parsing has to be: void elements (`<br>`, `<img>`...) never have content,
+an end tag closes every element opened since the matching start tag, stray end tags are ignored, and the
+elements still open at the end of the document are closed there.
+"""
+import os
+
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Union
+
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "meta", "param", "source", "track", "wbr",
+})
+""" Elements which never have content, nor an end tag. """
+_SIBLING_CLOSED = frozenset({"dd", "dt", "li", "option", "p", "td", "th", "tr"})
+""" Elements whose end tag may be omitted: a start tag of the same element closes the open one. """
+
+
+@dataclass(eq=False, slots=True)
+class Node:
+    """ An element of a Document (see bytecode.Element). """
+    index: int
+    tag: str
+    attributes: Dict[str, str]
+    text: str = ""
+    parent: Optional[int] = None
+    """ The index of the enclosing element; None for top-level elements. """
+
+
+@dataclass(eq=False)
+class Document:
+    elements: List[Node] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class ElementTokenizer(HTMLParser):
+    """ Tokenizes an HTML document into elements, calling `on_open` and `on_close` as each element starts and ends.
+
+    An element's text is only collected when `needs_text` says so when it opens (the text of the others is
+    left empty), and the text seen so far is only kept while some open element needs it: memory is bounded
+    by the nesting depth, plus the text of the outermost open element which needs its text.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.count = 0
+        self._open: List[Node] = []
+        self._text_starts: List[Optional[int]] = []
+        self._text_readers = 0
+        self._chunks: List[str] = []
+
+    def on_open(self, node: Node) -> None:
+        ...
+
+    def on_close(self, node: Node) -> None:
+        ...
+
+    def needs_text(self, node: Node) -> bool:
+        return True
+
+    def _new_node(self, tag: str, attrs) -> Node:
+        attributes: Dict[str, str] = {}
+        for name, value in attrs:
+            attributes.setdefault(name, "" if value is None else value)
+        node = Node(index=self.count, tag=tag, attributes=attributes, parent=self._open[-1].index if self._open else None)
+        self.count += 1
+        self.on_open(node)
+        return node
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SIBLING_CLOSED and self._open and self._open[-1].tag == tag:
+            self._close(len(self._open) - 1)
+        node = self._new_node(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self.on_close(node)
+            return
+        self._open.append(node)
+        if self.needs_text(node):
+            self._text_starts.append(len(self._chunks))
+            self._text_readers += 1
+        else:
+            self._text_starts.append(None)
+
+    def handle_startendtag(self, tag, attrs):
+        self.on_close(self._new_node(tag, attrs))
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self._open) - 1, -1, -1):
+            if self._open[depth].tag == tag:
+                self._close(depth)
+                return
+
+    def handle_data(self, data):
+        if self._text_readers:
+            self._chunks.append(data)
+
+    def _close(self, depth: int) -> None:
+        """ Closes the open elements from the innermost one down to the one at `depth`. """
+        while len(self._open) > depth:
+            node = self._open.pop()
+            start = self._text_starts.pop()
+            if start is not None:
+                node.text = normalize_text("".join(self._chunks[start:]))
+                self._text_readers -= 1
+                if not self._text_readers:
+                    self._chunks.clear()
+            self.on_close(node)
+
+    def close(self):
+        super().close()
+        self._close(0)
+
+
+class TreeBuilder(ElementTokenizer):
+    """ Collects every element of a document. """
+    def __init__(self):
+        super().__init__()
+        self.document = Document()
+
+    def on_open(self, node: Node) -> None:
+        self.document.elements.append(node)
+
+
+def parse_document(html: str) -> Document:
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.document
+
+
+DocumentSource = Union[Document, bytes, str, os.PathLike]
+""" A parsed Document, the bytes of a page, or the path of a local HTML file. """
+
+
+def read_html(source: Union[bytes, str, os.PathLike]) -> str:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source).decode("utf-8", errors="replace")
+    with open(source, encoding="utf-8", errors="replace") as file:
+        return file.read()
+
+
+def load_document(source: DocumentSource) -> Document:
+    return source if isinstance(source, Document) else parse_document(read_html(source))
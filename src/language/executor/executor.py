@@ -0,0 +1,106 @@
+""" Runs a Program against HTML documents, in-process.
+
+Each target of the Program is given a document (see document.load_document), and every ExtractStatement
+selects the elements of its input which satisfy its condition: the elements of its target's document, or
+for `extract from a where ...`, the elements selected into `a`. The statements run in the stages of the
+Program's schedule (see dag.py), and the statements reading the same input are evaluated together in a
+single pass over it, sharing the per-element results of hoisted predicates (see cse.py). Conditions are
+evaluated by the bytecode Interpreter.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import language.compiler.compiler_exceptions as cmpe
+import language.executor.executor_exceptions as exe
+
+from language.compiler.bytecode import Interpreter, ProgramBytecode
+from language.compiler.dag import DependencyGraph
+from language.compiler.types import Program
+from language.executor.document import Document, DocumentSource, Node, load_document
+
+Results = Dict[str, List[Node]]
+""" The elements selected into each destination, in document order. """
+
+
+class Executor:
+    def __init__(self, program: Program, bytecode: Optional[ProgramBytecode] = None):
+        """
+        Args:
+            bytecode (ProgramBytecode, optional): The bytecode of the Program (CompiledScript.BYTECODE);
+                compiled from the Program when not given.
+        """
+        self.program = program
+        self.graph = DependencyGraph.build(program)
+        self.schedule = self.graph.schedule()
+        self.interpreter = Interpreter(bytecode if bytecode is not None else ProgramBytecode.compile(program))
+
+    def input_of(self, index: int) -> Tuple[bool, str]:
+        """ What a statement (by index) reads: (True, a destination) or (False, a target name). """
+        producer = self.graph.dependencies[index]
+        if producer is not None:
+            return True, self.graph.statements[producer].destination
+        statement = self.graph.statements[index]
+        return False, statement.from_alias or statement.source
+
+    def run(self, documents: Mapping[str, DocumentSource], outputs: Optional[Iterable[str]] = None) -> Results:
+        """ Evaluates every statement, and returns the elements selected into each destination.
+
+        Args:
+            documents: The document of each target the statements read (other targets need none).
+            outputs (Iterable[str], optional): The destinations to return; by default, all of them. The others
+                are dropped as soon as no later statement reads them.
+
+        Raises:
+            MissingDocumentError: A statement reads a target no document was given for.
+            UndefinedOutputException: An output is not the destination of any statement.
+        """
+        wanted = None if outputs is None else set(outputs)
+        for output in wanted or ():
+            if output not in self.graph.producers:
+                raise cmpe.UndefinedOutputException(output)
+        parsed: Dict[str, Document] = {}
+        results: Results = {}
+        origins: Dict[str, Document] = {}
+        """ The document the elements of each destination belong to. """
+        for stage in self.schedule.stages:
+            groups: Dict[Tuple[bool, str], List[int]] = {}
+            for index in stage.statements:
+                groups.setdefault(self.input_of(index), []).append(index)
+            for (chained, name), indices in groups.items():
+                if chained:
+                    document, elements = origins[name], results[name]
+                else:
+                    document = self._document(name, documents, parsed)
+                    elements = document.elements
+                self.evaluate(indices, document, elements, results)
+                for index in indices:
+                    origins[self.graph.statements[index].destination] = document
+            if wanted is not None:
+                for destination in stage.released:
+                    if destination not in wanted:
+                        del results[destination]
+        return results
+
+    def evaluate(self, indices: List[int], document: Document, elements: List[Node], results: Results) -> None:
+        """ Evaluates statements (by index) against the same elements of a document, in one pass over them. """
+        evaluate = self.interpreter.evaluate
+        selected: List[List[Node]] = [[] for _ in indices]
+        for element in elements:
+            cache: Dict[int, bool] = {}
+            for index, found in zip(indices, selected, strict=True):
+                if evaluate(index, element, cache):
+                    found.append(element)
+        for index, found in zip(indices, selected, strict=True):
+            results[self.graph.statements[index].destination] = found
+
+    def _document(self, target: str, documents: Mapping[str, DocumentSource], parsed: Dict[str, Document]) -> Document:
+        document = parsed.get(target)
+        if document is None:
+            if target not in documents:
+                raise exe.MissingDocumentError(target)
+            document = parsed[target] = load_document(documents[target])
+        return document
+
+
+def execute(program: Program, documents: Mapping[str, DocumentSource], outputs: Optional[Iterable[str]] = None) -> Results:
+    """ Runs a Program against the document of each of its targets (see Executor.run). """
+    return Executor(program).run(documents, outputs)
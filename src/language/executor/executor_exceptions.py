@@ -0,0 +1,11 @@
+class BaseExecutorError(Exception):
+    def __init__(self) -> None:
+        ...
+
+class MissingDocumentError(BaseExecutorError):
+    def __init__(self, target: str) -> None:
+        self.target = target
+        super().__init__()
+
+    def __str__(self) -> str:
+        return f"Statements extract from the target '{self.target}', but no document was given for it"
@@ -0,0 +1,179 @@
+""" Inverted indexes of a document, and an executor answering conditions from them.
+
+Scanning every element for `tag "div" and attribute "class": "item"` is wasteful when most elements fail
+the first test. A DocumentIndex is built once per parsed document, with postings (the indices of the elements,
+in document order) for every tag, attribute name, (attribute name, value) pair and class token.
+
+IndexedExecutor evaluates a condition into the set of the elements which satisfy it:
+
+- tag and attribute comparisons are answered from the postings; a `contains` comparison scans the
+  vocabulary (the distinct tags, or values of the attribute) instead of the elements, and a needle without
+  whitespace in a class attribute only has to be searched in the class tokens;
+- `and` narrows the candidates operand by operand (the optimizer orders them by cost, cheapest first),
+  `or` only tests the candidates no operand has accepted yet, and `not` takes the complement;
+- text comparisons are the residual tests: they are evaluated on the remaining candidates only.
+"""
+import weakref
+
+from dataclasses import dataclass, field
+from typing import AbstractSet, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from language.compiler.types import (
+    ComparisonOperator,
+    Conditional,
+    ElementType,
+    Expression,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    PredicateRef,
+)
+from language.executor.document import Document, Node
+from language.executor.executor import Executor, Results
+
+Postings = List[int]
+_EMPTY: FrozenSet[int] = frozenset()
+
+
+@dataclass
+class DocumentIndex:
+    size: int
+    tags: Dict[str, Postings] = field(default_factory=dict)
+    attributes: Dict[str, Postings] = field(default_factory=dict)
+    """ The elements having each attribute. """
+    values: Dict[Tuple[str, str], Postings] = field(default_factory=dict)
+    """ The elements having each (attribute, value) pair. """
+    classes: Dict[str, Postings] = field(default_factory=dict)
+    """ The elements whose class attribute has each (whitespace separated) token. """
+    any_values: Dict[str, Postings] = field(default_factory=dict)
+    """ The elements having each value, in any attribute. """
+    with_attributes: Postings = field(default_factory=list)
+    """ The elements having at least one attribute. """
+
+    @classmethod
+    def build(cls, document: Document) -> "DocumentIndex":
+        tags: Dict[str, List[int]] = {}
+        attributes: Dict[str, List[int]] = {}
+        values: Dict[Tuple[str, str], List[int]] = {}
+        classes: Dict[str, List[int]] = {}
+        any_values: Dict[str, List[int]] = {}
+        with_attributes: List[int] = []
+        for node in document.elements:
+            tags.setdefault(node.tag, []).append(node.index)
+            if not node.attributes:
+                continue
+            with_attributes.append(node.index)
+            for name, value in node.attributes.items():
+                attributes.setdefault(name, []).append(node.index)
+                values.setdefault((name, value), []).append(node.index)
+                any_values.setdefault(value, []).append(node.index)
+            for token in set(node.attributes.get("class", "").split()):
+                classes.setdefault(token, []).append(node.index)
+        return cls(size=len(document.elements), tags=tags, attributes=attributes, values=values, classes=classes,
+                   any_values=any_values, with_attributes=with_attributes)
+
+    @staticmethod
+    def union(postings: Dict, keys) -> FrozenSet[int]:
+        return frozenset().union(*[postings[key] for key in keys if key in postings])
+
+    def tag(self, condition: Conditional) -> FrozenSet[int]:
+        needles = condition.rhs.value
+        if condition.operator == ComparisonOperator.CONTAINS:
+            return self.union(self.tags, [tag for tag in self.tags if any(needle in tag for needle in needles)])
+        return frozenset(range(self.size)) if not needles else self.union(self.tags, needles)
+
+    def attribute(self, condition: Conditional) -> FrozenSet[int]:
+        name, needles = condition.lhs.name, condition.rhs.value
+        if condition.operator == ComparisonOperator.EQUALS:
+            if name is None:
+                return frozenset(self.with_attributes) if not needles else self.union(self.any_values, needles)
+            return frozenset(self.attributes.get(name, ())) if not needles else self.union(self.values, [(name, value) for value in needles])
+        if name is None:
+            return self.union(self.any_values, [value for value in self.any_values if any(needle in value for needle in needles)])
+        if name == "class" and not any(needle.split() != [needle] for needle in needles):
+            # A needle without whitespace can only be found within a single class token.
+            return self.union(self.classes, [token for token in self.classes if any(needle in token for needle in needles)])
+        return self.union(self.values, [key for key in self.values if key[0] == name and any(needle in key[1] for needle in needles)])
+
+
+_INDEXES: "weakref.WeakKeyDictionary[Document, DocumentIndex]" = weakref.WeakKeyDictionary()
+
+
+def index_of(document: Document) -> DocumentIndex:
+    """ The index of a document, built on first use and kept as long as the document is. """
+    index = _INDEXES.get(document)
+    if index is None:
+        index = _INDEXES[document] = DocumentIndex.build(document)
+    return index
+
+
+def _text_test(condition: Conditional) -> Callable[[Node], bool]:
+    needles = condition.rhs.value
+    if condition.operator == ComparisonOperator.CONTAINS:
+        return lambda node: any(needle in node.text for needle in needles)
+    accepted = frozenset(needles)
+    return lambda node: not accepted or node.text in accepted
+
+
+class _Selector:
+    """ Evaluates conditions into the sets of the elements of a document which satisfy them. """
+    def __init__(self, document: Document, predicates: Dict[str, Expression]):
+        self.elements = document.elements
+        self.index = index_of(document)
+        self.predicates = predicates
+        self.everything: FrozenSet[int] = frozenset(range(self.index.size))
+        self._predicate_sets: Dict[str, AbstractSet[int]] = {}
+
+    def select(self, condition: Expression, candidates: Optional[AbstractSet[int]]) -> AbstractSet[int]:
+        """ The candidates (all the elements, if None) satisfying the condition. """
+        if isinstance(condition, LogicalExpression):
+            return self._junction(condition, candidates)
+        if isinstance(condition, Conditional):
+            element_type = condition.lhs.element_type
+            if element_type == ElementType.TEXT:
+                test, elements = _text_test(condition), self.elements
+                return {index for index in (self.everything if candidates is None else candidates) if test(elements[index])}
+            found = self.index.tag(condition) if element_type == ElementType.TAG else self.index.attribute(condition)
+            return found if candidates is None else found & candidates
+        if isinstance(condition, Literal):
+            return (self.everything if candidates is None else candidates) if condition.value else _EMPTY
+        if isinstance(condition, PredicateRef):
+            # A predicate is shared by several statements: its selection over the whole document is kept.
+            found = self._predicate_sets.get(condition.name)
+            if found is None:
+                if candidates is not None:
+                    return self.select(self.predicates[condition.name], candidates)
+                found = self._predicate_sets[condition.name] = self.select(self.predicates[condition.name], None)
+            return found if candidates is None else found & candidates
+        raise TypeError(f"Cannot evaluate the IR node: {condition}")
+
+    def _junction(self, condition: LogicalExpression, candidates: Optional[AbstractSet[int]]) -> AbstractSet[int]:
+        if condition.operator == LogicalOperator.NOT:
+            universe = self.everything if candidates is None else candidates
+            return universe - self.select(condition.expressions[0], candidates)
+        if condition.operator == LogicalOperator.AND:
+            for operand in condition.expressions:
+                candidates = self.select(operand, candidates)
+                if not candidates:
+                    break
+            return self.everything if candidates is None else candidates
+        accepted: Set[int] = set()
+        remaining = candidates
+        for operand in condition.expressions:
+            accepted |= self.select(operand, remaining)
+            remaining = (self.everything if remaining is None else remaining) - accepted
+            if not remaining:
+                break
+        return accepted
+
+
+class IndexedExecutor(Executor):
+    """ Evaluates statements from the inverted indexes of the documents (see the module docstring). """
+    def evaluate(self, indices: List[int], document: Document, elements: List[Node], results: Results) -> None:
+        predicates = {predicate.name: predicate.condition for predicate in self.program.predicates}
+        selector = _Selector(document, predicates)
+        candidates = None if elements is document.elements else {node.index for node in elements}
+        for index in indices:
+            statement = self.graph.statements[index]
+            found = selector.select(statement.condition, candidates)
+            results[statement.destination] = [document.elements[each] for each in sorted(found)]
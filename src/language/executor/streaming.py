@@ -0,0 +1,207 @@
+""" Streaming evaluation: statements are evaluated while a document is tokenized, without building it.
+
+Most conditions are decided by an element's start tag alone (its tag and attributes); only the ones
+testing its text have to wait for its end tag. When an element opens, every statement reading its
+document is evaluated with the text unknown (see _start_tag_test): a statement which is already false
+is dropped, and the element's text is only collected if some statement is true or undecided. When the
+element closes, the undecided statements are evaluated by the bytecode Interpreter, and the element is
+emitted into the destination of each statement it satisfies.
+
+`extract from a where ...` keeps the elements of `a` which satisfy its condition, so a chained statement
+is evaluated on each element as soon as it is emitted into `a`: no statement needs the whole document.
+Memory stays bounded by the nesting depth (and the text of the outermost element whose text is needed),
+however large the document.
+"""
+import codecs
+import os
+
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import language.compiler.compiler_exceptions as cmpe
+import language.executor.executor_exceptions as exe
+
+from language.compiler.bytecode import ProgramBytecode
+from language.compiler.types import (
+    ComparisonOperator,
+    Conditional,
+    ElementType,
+    Expression,
+    Literal,
+    LogicalExpression,
+    LogicalOperator,
+    PredicateRef,
+    Program,
+)
+from language.executor.document import ElementTokenizer, Node
+from language.executor.executor import Executor, Results
+
+CHUNK_SIZE = 64 * 1024
+
+StreamSource = Union[bytes, str, os.PathLike, Iterable[Union[bytes, str]]]
+""" The bytes of a page, the path of a local HTML file, or the chunks of a page (bytes or text). """
+
+StartTagTest = Callable[[Node], Optional[bool]]
+""" Whether an element satisfies a condition, from its tag and attributes; None when it depends on the text. """
+
+
+def _start_tag_test(condition: Expression, predicates: Dict[str, Expression]) -> StartTagTest:  # noqa: C901
+    if isinstance(condition, Literal):
+        return lambda node: condition.value
+    if isinstance(condition, PredicateRef):
+        return _start_tag_test(predicates[condition.name], predicates)
+    if isinstance(condition, Conditional):
+        selector, values = condition.lhs, condition.rhs.value
+        contains = condition.operator == ComparisonOperator.CONTAINS
+        if selector.element_type == ElementType.TEXT:
+            return (lambda node: True) if not values and not contains else (lambda node: None)
+        if selector.element_type == ElementType.TAG:
+            if contains:
+                return lambda node: any(needle in node.tag for needle in values)
+            accepted = frozenset(values)
+            return lambda node: not accepted or node.tag in accepted
+        name, accepted = selector.name, frozenset(values)
+
+        def attribute_test(node: Node) -> bool:
+            found = node.attributes.values() if name is None else \
+                ([node.attributes[name]] if name in node.attributes else [])
+            if contains:
+                return any(needle in value for value in found for needle in values)
+            return any(not accepted or value in accepted for value in found)
+        return attribute_test
+    if isinstance(condition, LogicalExpression):
+        operands = [_start_tag_test(operand, predicates) for operand in condition.expressions]
+        if condition.operator == LogicalOperator.NOT:
+            operand = operands[0]
+
+            def negation(node: Node) -> Optional[bool]:
+                value = operand(node)
+                return None if value is None else not value
+            return negation
+        # Three-valued logic: a deciding operand (False for and, True for or) decides, whatever the unknown ones.
+        deciding = condition.operator == LogicalOperator.OR
+
+        def junction(node: Node) -> Optional[bool]:
+            result: Optional[bool] = not deciding
+            for operand in operands:
+                value = operand(node)
+                if value is deciding:
+                    return deciding
+                if value is None:
+                    result = None
+            return result
+        return junction
+    raise TypeError(f"Cannot evaluate the IR node: {condition}")
+
+
+class _StreamingTokenizer(ElementTokenizer):
+    def __init__(self, executor: "StreamingExecutor", roots: List[int], wanted: Optional[set]):
+        super().__init__()
+        self.executor = executor
+        self.roots = roots
+        self.tests = [executor.tests[index] for index in roots]
+        self.wanted = wanted
+        self.emitted: List[Tuple[str, Node]] = []
+        self._decisions: Dict[int, List[Optional[bool]]] = {}
+
+    def on_open(self, node: Node) -> None:
+        self._decisions[node.index] = [test(node) for test in self.tests]
+
+    def needs_text(self, node: Node) -> bool:
+        return any(decision is not False for decision in self._decisions[node.index])
+
+    def on_close(self, node: Node) -> None:
+        cache: Dict[int, bool] = {}
+        evaluate = self.executor.interpreter.evaluate
+        for index, decision in zip(self.roots, self._decisions.pop(node.index), strict=True):
+            if decision is None:
+                decision = evaluate(index, node, cache)
+            if decision:
+                self._emit(index, node, cache)
+
+    def _emit(self, index: int, node: Node, cache: Dict[int, bool]) -> None:
+        graph = self.executor.graph
+        destination = graph.statements[index].destination
+        if self.wanted is None or destination in self.wanted:
+            self.emitted.append((destination, node))
+        for consumer in graph.consumers[index]:
+            if self.executor.interpreter.evaluate(consumer, node, cache):
+                self._emit(consumer, node, cache)
+
+    def drain(self) -> List[Tuple[str, Node]]:
+        emitted, self.emitted = self.emitted, []
+        return emitted
+
+
+class StreamingExecutor(Executor):
+    """ Evaluates the statements of a Program while documents are tokenized (see the module docstring). """
+    def __init__(self, program: Program, bytecode: Optional[ProgramBytecode] = None):
+        super().__init__(program, bytecode)
+        predicates = {predicate.name: predicate.condition for predicate in program.predicates}
+        self.tests = [_start_tag_test(statement.condition, predicates) for statement in self.graph.statements]
+        self.readers: Dict[str, List[int]] = {}
+        """ The statements reading each target's document, by index. """
+        for index in range(len(self.graph.statements)):
+            chained, name = self.input_of(index)
+            if not chained:
+                self.readers.setdefault(name, []).append(index)
+
+    def stream(self, target: str, chunks: Iterable[Union[bytes, str]],
+               outputs: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Node]]:
+        """ Yields (destination, element) for the elements of a target's document, as they close.
+
+        Args:
+            chunks: The document, in pieces (bytes are decoded as UTF-8).
+            outputs (Iterable[str], optional): The destinations to yield elements of; by default, all of them.
+        """
+        tokenizer = _StreamingTokenizer(self, self.readers.get(target, []), None if outputs is None else set(outputs))
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in chunks:
+            tokenizer.feed(decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray)) else chunk)
+            yield from tokenizer.drain()
+        tokenizer.feed(decoder.decode(b"", final=True))
+        tokenizer.close()
+        yield from tokenizer.drain()
+
+    def run(self, documents: Mapping[str, StreamSource], outputs: Optional[Iterable[str]] = None) -> Results:
+        """ Streams the document of every target read by a statement, and collects the selected elements.
+
+        The elements of each destination are returned in document order, as Executor.run returns them.
+
+        Raises:
+            MissingDocumentError: A statement reads a target no document was given for.
+            UndefinedOutputException: An output is not the destination of any statement.
+        """
+        wanted = list(self.graph.producers) if outputs is None else list(outputs)
+        for output in wanted:
+            if output not in self.graph.producers:
+                raise cmpe.UndefinedOutputException(output)
+        results: Results = {destination: [] for destination in wanted}
+        for target in self.readers:
+            if target not in documents:
+                raise exe.MissingDocumentError(target)
+            for destination, node in self.stream(target, iter_chunks(documents[target]), wanted):
+                results[destination].append(node)
+        for selected in results.values():
+            selected.sort(key=lambda node: node.index)
+        return results
+
+
+def iter_chunks(source: StreamSource, chunk_size: int = CHUNK_SIZE) -> Iterator[Union[bytes, str]]:
+    if isinstance(source, (bytes, bytearray)):
+        yield source
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+    else:
+        yield from source
@@ -1,6 +1,8 @@
 from abc import abstractmethod
 from dataclasses import dataclass, field  # noqa: N999
-from typing import Dict
+from typing import ClassVar, Dict, Tuple
+
+from lark import Tree
 
 import language.exceptions.internal_exception as act_except
 
@@ -33,6 +35,9 @@ class Action(ParsedNode):
     action_type: ActionType
     metadata: Dict[str, str] = field(default_factory=dict)
 
+    keywords: ClassVar[Tuple[str, ...]] = ()
+    """ The leading keyword(s) of the statements this plugin builds; the plugin registry dispatches on them. """
+
     @classmethod
     def unfit_content(cls):
         raise act_except.IncorrectContentForPluginError(plugin=cls.__class__.__name__)
@@ -46,6 +51,11 @@ class Action(ParsedNode):
         """
         return self.pretty_print()
 
+    @staticmethod
+    def statement_keyword(statement: Tree) -> str:
+        """ The leading keyword of a parsed statement. The SIFT grammar names each statement rule '<keyword>_statement'. """
+        return statement.data.removesuffix("_statement")
+
     @abstractmethod
     def _classify(self, raw_content) -> bool:
         """
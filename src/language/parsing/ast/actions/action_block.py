@@ -1,11 +1,13 @@
 from dataclasses import dataclass
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Mapping, Union
+
+from lark import Token, Tree
 
 import language.exceptions.internal_exception as act_except
 
-from language.parsing.ast.actions.action import Action, ActionType
+from language.parsing.ast.actions.action import Action
 from language.parsing.grammars import ActionBlockGrammar
-from language.parsing.utils import ParsedNode
+from language.parsing.utils import GenericTransformer, ParsedNode
 from shared.registry import RegistryType, get_registry
 
 
@@ -15,21 +17,27 @@ class ActionBlock(ParsedNode):
     actions: List[Action]  # List of actions performed in this block
 
     @classmethod
-    def generate(cls, target_action_map: Dict[str, str]):
+    def generate(cls, target_action_map: Dict[str, Union[str, List[Action]]]):
+        """ Builds the ActionBlock for a single target.
+
+        The statements of the block are either the raw block text ('{ ... }'), which is parsed here,
+        or the Actions that were already built along with the rest of the script.
+
+        Args:
+            target_action_map (Dict[str, Union[str, List[Action]]]): { 'target': <raw block or built actions> }
+
+        Returns:
+            ActionBlock: The block with one Action per statement.
+        """
         # ! Interface Implementation
         #   In order to do the above, need to create exceptions for bad cases.
         assert len(target_action_map.keys()) == 1, "More keys given than expected for the factory " \
                                                    f"method of the ActionBlock dataclass: {target_action_map}"
         target, raw_action = next(iter(target_action_map.items()))
-        action_block_as_list = ActionBlockGrammar(raw_action).analyze()
-        action_list: List[Action] = []
-        generators: Dict[ActionType, Callable] = get_registry(rtype=RegistryType.ACTION)
-        for action in action_block_as_list:
-            for _, generator in generators.items():
-                try:
-                    action_list.append(generator(action))
-                except act_except.IncorrectContentForPluginError:
-                    continue
+        if isinstance(raw_action, str):
+            action_list = ActionBlockGrammar(raw_action, transformer=ActionBlockTransformer).analyze()
+        else:
+            action_list = raw_action
         return cls(target=target, actions=action_list)
 
     def classify_actions(self):
@@ -56,3 +64,29 @@ class ActionBlock(ParsedNode):
             lines.append(f"{indent_str}  {i}. {action.pretty_print(indent=indent + 4)}")
         return "\n".join(lines)
 
+
+class ActionBlockTransformer(GenericTransformer):
+    """ Builds ActionBlocks directly from the parse tree of the SIFT grammars.
+
+    The statements of a block are not transformed here: each statement's parse tree is handed,
+    untransformed, to the action plugin which owns its leading keyword, and that plugin builds
+    its Action in a single pass over the statement.
+    """
+    def _transform_tree(self, tree: Tree):
+        if tree.data == "statement_block":
+            return self.statement_block(tree.children)
+        return super()._transform_tree(tree)
+
+    def statement_block(self, statements: List[Tree]) -> List[Action]:
+        action_list: List[Action] = []
+        dispatch: Mapping[str, Callable] = get_registry(rtype=RegistryType.KEYWORD)
+        for statement in statements:
+            generator = dispatch.get(Action.statement_keyword(statement))
+            if generator is None:
+                raise act_except.NoDefinitionFoundError(unclaimed_statement=str(statement))
+            action_list.append(generator(statement, self.content))
+        return action_list
+
+    def action_block(self, children: List[Union[Token, List[Action]]]) -> ActionBlock:
+        target, actions = children
+        return ActionBlock(target=target.value, actions=actions)
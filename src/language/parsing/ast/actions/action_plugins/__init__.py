@@ -3,8 +3,9 @@ import importlib
 import pathlib
 import sys
 
+from language.exceptions.internal_exception import MultipleActionDefinitionsError
 from language.parsing.ast.actions.action import Action, ActionType
-from shared.registry import RegistryType, register
+from shared.registry import RegistryType, freeze, lookup, register
 
 __all__ = []  # We'll populate it dynamically
 
@@ -34,7 +35,17 @@ def import_modules_from_directory(directory: pathlib.Path, parent_module: str):
                 attr = getattr(imported_module, attr_name)
                 if isinstance(attr, type) and issubclass(attr, Action) and attr is not Action:
                     register(RegistryType.ACTION, item=attr.generate, key=ActionType(attr_name))
+                    for keyword in attr.keywords:
+                        owner = lookup(RegistryType.KEYWORD, key=keyword)
+                        if owner is not None and owner != attr.generate:
+                            raise MultipleActionDefinitionsError(definitions=[owner, attr.generate])
+                        register(RegistryType.KEYWORD, item=attr.generate, key=keyword)
                     print(f'Registered {attr_name} as a language plugin')
+        except MultipleActionDefinitionsError:
+            # Two plugins claiming a keyword is a packaging error, not a plugin that failed to load.
+            raise
         except Exception as e:
             print(f"⚠️ Failed to import {module_path}: {e}")
 import_modules_from_directory(package_dir, __name__)
+# Every plugin is known now: statements are dispatched through a fixed keyword table from here on.
+freeze(RegistryType.KEYWORD)
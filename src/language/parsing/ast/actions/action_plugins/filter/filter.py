@@ -10,8 +10,8 @@ The `Filter` itself is organized around logical operators (`and`, `or`, `not`)
 and atomic filtering structures (tag, attribute, text), along with nested
 operands. The methods in this file handle:
 
-1. Parsing the raw filter expressions into a structured `Filter` object
-   hierarchy (via `_parse`, `_build_filter`, etc.).
+1. Building a structured `Filter` object hierarchy directly from the parse
+   tree of a statement (via `FilterTransformer`).
 2. Providing utilities to traverse or serialize the `Filter` tree
    (`traverse`, `pretty_print`, `draw_tree`, etc.).
 3. Storing metadata that may arise from the DSL's grammar (via `assign_metadata`).
@@ -34,27 +34,19 @@ Example usage:
 
 """
 
+import os
 import re
 
-from dataclasses import dataclass  # noqa: N999
-from enum import Enum, auto
-from typing import Dict, Iterator, List, Optional, Union
-
-from language.parsing.ast.actions.action import Action, ActionType
-from language.parsing.ast.enums import HTMLPropertyType, match_logical_op_type
-from language.parsing.grammars import FilterGrammar
+from dataclasses import FrozenInstanceError, dataclass  # noqa: N999
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
+from lark import Token, Tree
 
-def match_filter_type(stmt: dict) -> HTMLPropertyType:  # noqa: C901
-    assert len(stmt.keys()) == 1, f"Too many keys in the filter statement: {stmt}"
-    stmt_key = list(stmt.keys())[0]
-    match stmt_key:
-        case "attribute":
-            return HTMLPropertyType.ATTRIBUTE
-        case "text":
-            return HTMLPropertyType.TEXT
-        case "tag":
-            return HTMLPropertyType.TAG
+from language.parsing.ast.actions.action import Action, ActionType
+from language.parsing.ast.enums import HTMLPropertyType, LogicalOperatorType
+from language.parsing.grammars import StatementGrammar
+from language.parsing.utils import GenericTransformer
+from shared.utils.lru import LRUCache
 
 
 @dataclass
@@ -83,6 +75,9 @@ class Filter(Action):
     filter_type: Optional[HTMLPropertyType] = None
     value: Optional[Union[str, List[str], Dict[str, str]]] = None
     operands: Optional[List["Filter"]] = None
+
+    keywords = ("extract",)
+
     def __init__(self, operator=None, filter_type=None, value=None, operands=None):
         """
         Initializes a new instance of `Filter`.
@@ -105,6 +100,29 @@ class Filter(Action):
         self.value = value
         self.operands = operands
 
+    def __setattr__(self, name: str, value: Any):
+        if self.__dict__.get("_frozen"):
+            raise FrozenInstanceError(f"cannot assign to field '{name}' of a shared Filter")
+        super().__setattr__(name, value)
+
+    def freeze(self) -> "Filter":
+        """
+        Makes the tree rooted at this node immutable, so that it can be shared by several statements
+        (see `FILTER_MEMO`): operands become tuples, values tuples and `FrozenDict`s, and assigning
+        to a node raises `FrozenInstanceError`.
+
+        Returns:
+            Filter: This node.
+        """
+        for node in self.traverse(self):
+            if node.__dict__.get("_frozen"):
+                continue
+            node.value = _freeze_value(node.value)
+            node.operands = None if node.operands is None else tuple(node.operands)
+            node.metadata = FrozenDict(node.metadata)
+            object.__setattr__(node, "_frozen", True)
+        return self
+
     @classmethod
     def traverse(cls, root: "Filter") -> Iterator["Filter"]:
         """
@@ -123,366 +141,48 @@ class Filter(Action):
                 yield from cls.traverse(child)
 
     @staticmethod
-    def _classify(raw_content: str) -> Dict:
+    def _classify(raw_content: Tree) -> Tree:
         """
-        Determines if the given `raw_content` string represents a Filter.
+        Determines if the given parsed statement represents a Filter.
 
-        Internally, this attempts to parse `raw_content` via `_parse`;
-        if parsing succeeds, it is recognized as a Filter.
+        The statement is a Filter if it is an 'extract_statement'; otherwise the
+        content is refused, so that another action plugin can claim it.
 
         Args:
-            raw_content (str):
-                The raw DSL statement to classify.
+            raw_content (Tree):
+                The (untransformed) parse tree of the statement to classify.
 
         Returns:
-            bool: True if `raw_content` can be parsed as a Filter, False otherwise.
+            Tree: The statement, if it represents a Filter.
         """
-        if (metadata := Filter.get_metadata(raw_content=raw_content)) is None:
+        if not isinstance(raw_content, Tree) or raw_content.data != "extract_statement":
             Filter.unfit_content()
-        return metadata
+        return raw_content
 
     @classmethod
-    def _parse(cls, metadata: Dict) -> Dict:
+    def generate(cls, raw_content: Union[str, Tree], source: str = None) -> "Filter":
         """
-        Parses the `raw_content` string using `FilterGrammar` to produce a dictionary
-        representation of the filter.
+        Constructs a Filter object from a DSL statement.
 
-        This dictionary is then used by `_build_filter` to create the Filter object.
+        A raw statement string is parsed by `StatementGrammar`; a statement which was parsed
+        along with the rest of its script is classified first. Either way, `FilterTransformer`
+        builds the Filter tree (and its metadata) in a single pass over the parse tree.
 
         Args:
-            raw_content (str):
-                The DSL statement to be parsed.
-
-        Returns:
-            dict: A dictionary representation of the parsed filter structure.
-
-        Raises:
-            Exception: If the `FilterGrammar` fails to parse `raw_content`.
-        """
-
-        handler: FilterGrammar = FilterGrammar(metadata["raw_filter"])
-        content_as_dict: dict = handler.analyze()
-
-        return content_as_dict
-
-    @classmethod
-    def generate(cls, raw_content: str) -> "Filter":
-        """
-        Constructs a Filter object from a raw DSL statement.
-
-        This method first calls `_parse` to get a dictionary, then
-        `_build_filter` to recursively build a Filter tree.
-
-        Args:
-            raw_content (str):
-                The raw DSL statement (e.g., "extract from ... where ... -> ...").
+            raw_content (Union[str, Tree]):
+                The raw DSL statement (e.g., "extract from ... where ... -> ..."),
+                or its parse tree.
+            source (str, optional):
+                The content the parse tree was parsed from, used to recover the `raw_filter`
+                text. Unused for raw statement strings. Defaults to None.
 
         Returns:
             Filter: A fully constructed Filter object.
-
-        Raises:
-            ValueError: If the filter structure is unrecognized.
-        """
-        metadata = Filter._classify(raw_content=raw_content)
-        parsed_data = cls._parse(metadata=metadata)
-        filter_obj = cls._build_filter(parsed_data)
-        filter_obj.metadata = metadata
-        return filter_obj
-
-    @classmethod
-    def _build_filter(cls, data: dict) -> "Filter":
-        """
-        Recursively builds a Filter object from a parsed dictionary.
-
-        The dictionary can represent:
-            - A `group` node (enclosed in parentheses),
-            - An operator node (`and_operator`, `or_operator`, `not_operator`),
-            - An atomic node (`tag`, `attribute`, or `text`).
-
-        Args:
-            data (dict):
-                Dictionary representing part of the filter tree.
-
-        Returns:
-            Filter: The top-level Filter node built from the given data.
-
-        Raises:
-            ValueError: If the structure is unrecognized.
-        """
-        if "group" in data:
-            return cls._build_group(data)
-        if cls._is_operator_node(data):
-            return cls._build_operator(data)
-        if cls._is_atomic_node(data):
-            return cls._build_atomic(data)
-        raise ValueError(f"Unrecognized filter structure: {data}")
-    @classmethod
-    def _build_group(cls, data: dict) -> "Filter":
-        """
-        Processes a 'group' node, which corresponds to an expression in parentheses.
-
-        Args:
-            data (dict):
-                Dictionary with a "group" key whose value should be a single-element list.
-
-        Returns:
-            Filter: The Filter node corresponding to what's inside the parentheses.
-
-        Raises:
-            ValueError: If the group structure is malformed.
-        """
-        inner = data["group"]
-        if isinstance(inner, list) and len(inner) == 1:
-            return cls._build_filter(inner[0])
-        else:
-            raise ValueError(f"Unexpected structure in group: {data}")
-
-    @staticmethod
-    def _is_operator_node(data: dict) -> bool:
-        """
-        Checks if a given dictionary represents a logical operator node (and/or/not).
-
-        Args:
-            data (dict):
-                The dictionary to check.
-
-        Returns:
-            bool: True if the node is an operator node; False otherwise.
-        """
-        return any(key in ("and_operator", "or_operator", "not_operator") for key in data)
-
-    @classmethod
-    def _build_operator(cls, data: dict) -> "Filter":
-        """
-        Processes an operator node, extracting the operator from the key
-        (e.g., 'and_operator' -> 'and') and building each operand as a child Filter.
-
-        Args:
-            data (dict):
-                Dictionary containing an operator key and a list of operand dictionaries.
-
-        Returns:
-            Filter: A Filter node representing the operator and its operands.
-
-        Raises:
-            ValueError: If the operator node key is missing or unrecognized.
-        """
-        for key, value in data.items():
-            if key in ("and_operator", "or_operator", "not_operator"):
-                operator = key.split("_")[0]  # e.g., 'and' from 'and_operator'
-                operands = [cls._build_filter(child) for child in value]
-                return Filter(operator=match_logical_op_type(operator), operands=operands)
-        raise ValueError(f"Operator node not found in data: {data}")
-    @staticmethod
-    def _is_atomic_node(data: dict) -> bool:
-        """
-        Checks if a given dictionary represents an atomic filter node
-        (tag, attribute, or text).
-
-        Args:
-            data (dict):
-                The dictionary to check.
-
-        Returns:
-            bool: True if the node is an atomic filter node; False otherwise.
-        """
-        return any(key in ("tag", "attribute", "text") for key in data)
-    @staticmethod
-    def _build_atomic(data: dict) -> "Filter":
         """
-        Processes an atomic filter node, such as 'tag', 'attribute', or 'text'.
-        Determines the filter type and processes the value accordingly.
-
-        Args:
-            data (dict):
-                Dictionary with a single key of 'tag', 'attribute', or 'text'
-                and a corresponding value.
-
-        Returns:
-            Filter: A Filter node for this atomic filter.
-
-        Raises:
-            ValueError: If the node structure is unrecognized.
-        """
-        for key, value in data.items():
-            if key in ("tag", "attribute", "text"):
-                filter_type_info = {key: value}
-                identified_filter_type = match_filter_type(filter_type_info)
-                processed_value = Filter._process_atomic_value(identified_filter_type, value)
-                if identified_filter_type == HTMLPropertyType.UNKNOWN:
-                    raise TypeError(f'Unknown filter type for data: {key}: {value}')
-                return Filter(filter_type=identified_filter_type, value=processed_value)
-        raise ValueError(f"Unrecognized atomic filter structure: {data}")
-    @staticmethod
-    def _process_atomic_value(identified_filter_type, value) -> Union[str, List]:
-        """
-        Processes the value portion of an atomic filter node.
-
-        - If `value` is a list, each string is unquoted.
-        - Dictionaries are examined for "contains" expressions or key-value pairs.
-        - If `value` is a string, the quotes are stripped.
-
-        Args:
-            identified_filter_type (FilterTypes):
-                The determined filter type (e.g. `FilterTypes.TAG`, etc.).
-            value (Union[str, list, dict]):
-                The raw value from the parse tree.
-
-        Returns:
-            Union[str, List]:
-                The processed value. Could be a string or a list of strings.
-
-        Raises:
-            ValueError: If the structure of the atomic value is unexpected.
-        """
-        result = None
-        if isinstance(value, list):
-            if identified_filter_type == HTMLPropertyType.ATTRIBUTE:
-                result = Filter._process_attribute_filter_type(value)
-            if identified_filter_type == HTMLPropertyType.TEXT:
-                result = Filter._process_text_filter_type(value)
-            if identified_filter_type == HTMLPropertyType.TAG:
-                return Filter._process_tag_filter_type(value)
-            if result is None:
-                raise ValueError(f"The filter value could not be morphed by any processor. Value: {value}")
-            return result
-
-    @staticmethod
-    def _process_tag_filter_type(value) -> List[str]:
-        if isinstance(value[0], dict):
-            if (options := value[0].get('options', None)) is None and (wildcard := value[0].get('wildcard_value', None)) is None:
-                raise KeyError(f'Given a dict in the "tag" filter, expected it to have key "options" or "wildcard_value", but got: {value}')
-            if options:
-                return options
-            if wildcard:
-                return []
-        else:
-            return value
-    @staticmethod
-    def _process_text_filter_type(value) -> Dict[str, Union[list, str, dict]]:
-        result = []
-        if isinstance(value, list):
-            for text_item in value:
-                if isinstance(text_item, str):
-                    result.append(text_item)
-                elif isinstance(text_item, dict):
-                    contains_map = {"contains": []}
-                    if (contains_text_item_list := text_item.get("contains_text")) is not None:
-                        contains_map["contains"] = contains_text_item_list[0]
-                        if isinstance(contains_map["contains"], dict):
-                            if (contains_options := contains_map["contains"].get("options", None)) is not None:
-                                result.extend(contains_options)
-                        result.append(contains_map)
-                    elif (text_options := text_item.get("options")) is not None:
-                        result.extend(text_options)
-                    else:
-                        raise TypeError(f"Expected the text filter dict to have the key, contains_text, but here it is instead: {text_item}")
-        else:
-            raise TypeError(f'Expected the text filter to be of type list, instead found it to be of type: {value}')
-        return result
-
-    @staticmethod
-    def _process_attribute_filter_type(value) -> Dict[str, Union[list, str, dict]]:
-        result = {}
-        class AttributeValueOptions(Enum):
-            DNE = auto()
-
-        for pair_dict in value:
-            relevant_pair = pair_dict['pair']
-            attr_filter_val: Union[str, dict] = relevant_pair[1]
-            if not isinstance(relevant_pair, list):
-                raise TypeError(f'Expected the value of the attribute "pair" key to be a list, but instead got: {relevant_pair}')
-            attr_filter_key: str = relevant_pair[0]
-            if isinstance(attr_filter_val, dict):
-                options =  attr_filter_val.get('options', AttributeValueOptions.DNE)
-                contains_options = attr_filter_val.get('contains_attribute', AttributeValueOptions.DNE)
-                wildcard = attr_filter_val.get('wildcard_value', AttributeValueOptions.DNE)
-                if options is AttributeValueOptions.DNE and contains_options is AttributeValueOptions.DNE and wildcard is AttributeValueOptions.DNE:
-                    raise ValueError(f'Unexpected value for the value for the attribute filter: {value}. Expected the key to be "contains_attribute" or "options", instead, got: {attr_filter_val}')
-                if options is not AttributeValueOptions.DNE:
-                    result[attr_filter_key] = options
-                if contains_options is not AttributeValueOptions.DNE:
-                    result[attr_filter_key] = {}
-                    if isinstance(contains_options[0], dict):
-                        result[attr_filter_key]["contains"] = contains_options[0]["options"]
-                    else:
-                        result[attr_filter_key]["contains"] = contains_options
-                if wildcard is not AttributeValueOptions.DNE:
-                    result[attr_filter_key] = []
-            elif isinstance(attr_filter_val, str):
-                result[attr_filter_key] = attr_filter_val
-            else:
-                raise TypeError(f'Expected the value for key {attr_filter_key} in attribute statement {value} to be a string or a dict, instead got {attr_filter_val}')
-        return result
-
-    @staticmethod
-    def get_metadata(raw_content: str) -> Union[Dict, None]:
-        """
-        Analyzes a DSL statement and extracts three main pieces of metadata:
-
-            1. `from_alias`: The source entity after 'extract from' (optional).
-            2. `raw_filter`: The filter portion after 'where' and before '->'.
-            3. `assignment`: The alias or target after '->'.
-
-        This method uses two regex patterns:
-            - One to match statements of the form: `extract from {alias} where {condition} -> {assignment}`
-            - One to match statements of the form: `extract where {condition} -> {assignment}`
-
-        Args:
-            raw_content (str):
-                The full DSL statement.
-
-        Returns:
-            None: Updates the `metadata` dictionary in-place.
-        """
-        metadata = {}
-        extract_from_where = re.compile(
-            r'''^\s*
-                extract
-                \s+
-                from\s+
-                (\S+)
-                \s+
-                where
-                \s+(.*?)
-                \s*->\s*
-                (.+?)
-                \s*$''',
-            re.VERBOSE | re.DOTALL
-        )
-        extract_where = re.compile(
-            r'''^\s*
-                extract
-                \s+
-                where
-                \s+(.*?)
-                \s*->\s*
-                (.+?)
-                \s*$''',
-            re.VERBOSE | re.DOTALL
-        )
-        extract_from_statement: Union[re.Match, None] = extract_from_where.search(raw_content)
-        extract_where_statement: Union[re.Match, None] = extract_where.search(raw_content)
-
-        metadata["from_alias"] = ""
-        metadata["raw_filter"] = ""
-        metadata["assignment"] = ""
-
-        if extract_from_statement:
-            alias: str = extract_from_statement.group(1)
-            filt: str = extract_from_statement.group(2)
-            assign: str = extract_from_statement.group(3)
-            metadata["from_alias"] = alias
-            metadata["raw_filter"] = filt
-            metadata["assignment"] = assign
-        if extract_where_statement:
-            filt: str = extract_where_statement.group(1)
-            assign: str = extract_where_statement.group(2)
-            metadata["raw_filter"] = filt
-            metadata["assignment"] = assign
-        if not metadata:
-            return None
-        return metadata
+        if isinstance(raw_content, str):
+            return StatementGrammar(raw_content, transformer=FilterTransformer).analyze()
+        statement = Filter._classify(raw_content=raw_content)
+        return FilterTransformer(source).transform(statement)
 
     def validate(self):
         """
@@ -567,3 +267,190 @@ class Filter(Action):
             str: A multi-line string representing the tree.
         """
         return "\n".join(self._draw_tree())
+
+
+class FrozenDict(dict):
+    """ A dict which cannot be modified once built (it stays a dict, so it pickles and compares as one). """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict does not support item assignment")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _immutable
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze_value(value: Any) -> Any:
+    """ A copy of a Filter value in which every list is a tuple, and every dict a FrozenDict. """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_value(item) for item in value)
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze_value(item)) for key, item in value.items())
+    return value
+
+
+_STRING_LITERAL = re.compile(r'"(?:\\.|[^"\\])*"')
+_PADDED_PUNCTUATION = re.compile(r" ?([()\[\],:]) ?")
+
+
+def normalize_filter(raw_filter: str) -> str:
+    """
+    Returns the canonical spelling of a filter's source text, used as its memo key.
+
+    Whitespace outside string literals is collapsed to a single space and dropped around
+    punctuation, so `(tag  "a" )` and `(tag "a")` share an entry. String literals are kept verbatim.
+    """
+    parts = []
+    last = 0
+    for literal in _STRING_LITERAL.finditer(raw_filter):
+        parts.append(_PADDED_PUNCTUATION.sub(r"\1", re.sub(r"\s+", " ", raw_filter[last:literal.start()])))
+        parts.append(literal.group())
+        last = literal.end()
+    parts.append(_PADDED_PUNCTUATION.sub(r"\1", re.sub(r"\s+", " ", raw_filter[last:])))
+    return "".join(parts).strip()
+
+
+@dataclass
+class MemoizedFilter:
+    """
+    A Filter tree shared by every statement whose filter normalizes to the same text.
+
+    The tree carries no statement metadata and is frozen (see `Filter.freeze`), so no statement
+    can modify it for the others; `lowered` holds the IR condition once the compiler has lowered
+    the tree, so it is lowered only once as well.
+    """
+    filter: Filter
+    lowered: Any = None
+
+
+FILTER_MEMO: LRUCache[MemoizedFilter] = LRUCache(budget=int(os.environ.get("SIFT_FILTER_MEMO_ENTRIES", 4096)))
+""" Process-wide memo of built filters, keyed on `normalize_filter(raw_filter)`. """
+
+
+class FilterTransformer(GenericTransformer):
+    """
+    Builds the `Filter` tree of a statement directly from its Lark parse tree.
+
+    Each callback is named after the grammar rule (or alias) it handles and receives the
+    already-built values of the node's children, so every parse node is visited exactly
+    once and turned straight into its final form:
+
+        - `options` / `contains_*` / `pair` produce the values stored on atomic Filters,
+        - `tag` / `attribute` / `text` produce atomic Filters,
+        - `and_operator` / `or_operator` / `not_operator` produce operator Filters,
+        - `extract_statement` attaches the statement metadata to the root Filter.
+
+    Filters are memoized on their normalized source text (see `FILTER_MEMO`): a `raw_filter`
+    seen before is not transformed again, and only its statement's root node is rebuilt to
+    carry that statement's metadata.
+
+    The values keep the quoting of the script (e.g. `'"div"'`), as the compiler expects.
+    """
+    WILDCARD = "any"
+    """ The attribute name used for a wildcard ('any') attribute key. """
+    _raw_filter: str = ""
+    """ The source text of the filter of the statement being transformed. """
+
+    @staticmethod
+    def _text(child: Token) -> str:
+        return child.value
+
+    def options(self, children: List[Token]) -> List[str]:
+        return [self._text(child) for child in children]
+
+    def wildcard_value(self, children: List) -> None:
+        # The wildcard carries no value; its position (key or value of a pair) decides what it means.
+        return None
+
+    def contains_text(self, children: List) -> Dict[str, Union[str, List[str]]]:
+        (value,) = children
+        return {"contains": value if isinstance(value, list) else self._text(value)}
+
+    def contains_attribute(self, children: List) -> Dict[str, List[str]]:
+        (value,) = children
+        return {"contains": value if isinstance(value, list) else [self._text(value)]}
+
+    def pair(self, children: List) -> Tuple[str, Union[str, List, Dict]]:
+        key, value = children
+        key = self.WILDCARD if key is None else self._text(key)
+        if value is None:
+            # 'any' value: the attribute only has to be present.
+            return key, []
+        if isinstance(value, (list, dict)):
+            return key, value
+        return key, self._text(value)
+
+    def tag(self, children: List) -> Filter:
+        (value,) = children
+        return Filter(filter_type=HTMLPropertyType.TAG, value=value if isinstance(value, list) else [self._text(value)])
+
+    def text(self, children: List) -> Filter:
+        (value,) = children
+        if isinstance(value, dict):
+            value = [value]
+        elif not isinstance(value, list):
+            value = [self._text(value)]
+        return Filter(filter_type=HTMLPropertyType.TEXT, value=value)
+
+    def attribute(self, children: List[Tuple[str, Union[str, List, Dict]]]) -> Filter:
+        return Filter(filter_type=HTMLPropertyType.ATTRIBUTE, value=dict(children))
+
+    def and_operator(self, children: List[Filter]) -> Filter:
+        return Filter(operator=LogicalOperatorType.AND, operands=children)
+
+    def or_operator(self, children: List[Filter]) -> Filter:
+        return Filter(operator=LogicalOperatorType.OR, operands=children)
+
+    def not_operator(self, children: List[Filter]) -> Filter:
+        return Filter(operator=LogicalOperatorType.NOT, operands=children)
+
+    def group(self, children: List[Filter]) -> Filter:
+        # Parentheses only affect the shape of the tree.
+        return children[0]
+
+    def _transform_tree(self, tree: Tree):
+        if self.content is None:
+            return super()._transform_tree(tree)
+        if tree.data == "extract_statement":
+            # Parsers do not propagate positions to the nodes, but tokens always carry theirs: the filter is
+            # the text between the 'where' and '->' tokens of its statement. lark_cython tokens are not
+            # lark Tokens, so match them on their type alone.
+            where, arrow = (next(child for child in tree.children if getattr(child, "type", None) == kind)
+                            for kind in ("WHERE", "ARROW"))
+            self._raw_filter = self.content[where.end_pos:arrow.start_pos].strip()
+            return super()._transform_tree(tree)
+        if tree.data != "raw_filter":
+            return super()._transform_tree(tree)
+        raw = self._raw_filter
+        key = normalize_filter(raw)
+        memoized = FILTER_MEMO.get(key)
+        if memoized is None:
+            _, filter_obj = super()._transform_tree(tree)
+            memoized = MemoizedFilter(filter=filter_obj.freeze())
+            FILTER_MEMO.put(key, memoized)
+        return raw, memoized.filter
+
+    def raw_filter(self, children: List[Filter]) -> Tuple[str, Filter]:
+        return "", children[0]
+
+    def from_clause(self, children: List[Token]) -> str:
+        return self._text(children[0])
+
+    def extract_statement(self, children: List) -> Filter:
+        """
+        Attaches the statement metadata to the root of the Filter tree:
+
+            1. `from_alias`: The source entity after 'extract from' (optional).
+            2. `raw_filter`: The source text of the filter, after 'where' and before '->'.
+            3. `assignment`: The alias or target after '->'.
+        """
+        *from_alias, _, (raw_filter, shared), _, assignment = children
+        # The tree below the root is shared with other statements (and frozen); the root is this statement's own.
+        filter_obj = Filter(operator=shared.operator, filter_type=shared.filter_type, value=shared.value, operands=shared.operands)
+        filter_obj.metadata = {
+            "from_alias": from_alias[0] if from_alias else "",
+            "raw_filter": raw_filter,
+            "assignment": self._text(assignment),
+        }
+        return filter_obj
+
@@ -1,23 +1,32 @@
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from lark import Token
+from lark.exceptions import LarkError
 
 from language.exceptions.external_exception import (
     MultipleTargetListDefinitionsError,
+    SyntaxError,
 )
 from language.exceptions.internal_exception import (
     NoRawContentProvidedError,
     TransformerParseError,
 )
-from language.parsing.ast.actions.action_block import ActionBlock
+from language.parsing.ast.actions.action_block import (
+    ActionBlock,
+    ActionBlockTransformer,
+)
 from language.parsing.grammars import HighLevelGrammar
+from language.parsing.layout import header_end, iter_block_spans
 from language.parsing.utils import ParsedNode
 
 
 @dataclass
 class HighLevelTree(ParsedNode):
     """ Creates an intermediate representation of the Sift file for the ScriptTree class to parse.
-    Used by the Parser class. Offers methods for parsing file content into a dict-like half-parsed AST,
-    which can then be used to define a more robust, precise AST by the ScriptTree class.
+    Used by the Parser class. Parses the file content, building the targets and the ActionBlocks directly
+    from the parse tree (see ScriptTransformer), and validates the result before the ScriptTree class
+    assembles the AST from it.
     Args:
         ParsedNode (abstract): The parent class for all AST nodes.
 
@@ -27,22 +36,21 @@ class HighLevelTree(ParsedNode):
         MultipleTargetListDefinitionsError: Raised if HighLevelGrammar detected multiple 'targets' lists
         TypeError: Raised if there were unexpected types present in the AST.
         ValueError: Raised if there were unexpected values or non-existent expected values in the AST.
-        KeyError: Raised if there were expected to be particular keys in the AST dict, but they weren't found.
     """
-    parsed_content: Dict
+    parsed_content: List
     # ! Expected to be: { "target": "url", }
     targets: Dict[str, str] = field(default_factory=list)
-    # ! Expected to be: [ { "target_name", "statement_list"}, ... ]
-    actions: List[Dict[str, str]] = field(default_factory=list)
+    # ! Expected to be: [ ActionBlock, ... ]
+    actions: List[ActionBlock] = field(default_factory=list)
 
-    def __init__(self, parsed_content: Dict):
-        """ Takes the resulting AST generated from the HighLevelGrammar class to define the instance.
+    def __init__(self, parsed_content: List):
+        """ Takes the elements of the script built by ScriptTransformer to define the instance.
 
-        The factory method 'generate' uses HighLevelGrammar to create the AST, and the HighLevelTree
-        class validates that generated AST.
+        The factory method 'generate' uses HighLevelGrammar to create the elements, and the HighLevelTree
+        class validates them.
 
         Args:
-            parsed_content (dict): The AST created by HighLevelGrammar.
+            parsed_content (list): The target mappings and ActionBlocks of the script, in source order.
         """
         self.AST = parsed_content
         self.validate()
@@ -52,7 +60,7 @@ class HighLevelTree(ParsedNode):
         """ Given the raw sift file contents, generates an instance of HighLevelTree.
 
         Provides HighLevelGrammar with the file contents before calling analyze() to get the
-        AST. Returns an instance of HighLevelTree, constructed using the AST.
+        elements of the script. Returns an instance of HighLevelTree, constructed using them.
 
         Args:
             file_contents (str): The entire raw contents of the Sift file
@@ -60,7 +68,7 @@ class HighLevelTree(ParsedNode):
         Returns:
             HighLevelTree: The corresponding generated instance.
         """
-        parsed_content = HighLevelGrammar(file_contents).analyze()
+        parsed_content = HighLevelGrammar(file_contents, transformer=ScriptTransformer).analyze()
         return cls(parsed_content=parsed_content)
 
     def validate(self) -> None:
@@ -69,162 +77,69 @@ class HighLevelTree(ParsedNode):
         Returns:
             None.
         """
-        script_values_list = []
-        mapped_members_to_validate = {
-            "targets_mapping": None,
-            "actions_list": []
-        }
+        target_lists: List[Dict[str, str]] = []
+        action_blocks: List[ActionBlock] = []
         # check to make sure SiftFile actually parsed something from the file.
         if not self.AST:
             raise NoRawContentProvidedError()
-        # check to make sure the 'script' key exists, denoting the list of elements that the HighLevelGrammar parsed.
-        if (script_values_list := self.AST.get("script", None)) is None:
-            raise TransformerParseError("validate()", f"The dict-representation of the file here: \
-                                        {self.AST} does not contain the 'script' key as expected.")
-        for script_element in script_values_list:
-            # Now we are going to walk through the key value pairs and populate our memeber variables (targets, actions)
+        if not isinstance(self.AST, list):
+            raise TransformerParseError("validate()", f"The representation of the file here: \
+                                        {self.AST} is not the list of script elements expected.")
+        for script_element in self.AST:
+            # Sort the elements of the script into targets and actions
             if isinstance(script_element, dict):
-                # ! Target List
-                if (target_list := script_element.get("target_list", None)) is not None:
-                    if len(target_list) > 1: # There should only be one element in the target list; that element is the entire targets: [] list.
-                        original_definition = target_list[0]
-                        alternate_definitions = target_list[1:]
-                        # Raise exception if there are multiple definitions.
-                        raise MultipleTargetListDefinitionsError(original_definition=original_definition,
-                                                                 offending_alternate_definitions=alternate_definitions)
-                    # Otherwise, map this 'feature' of the script to the content map.
-                    mapped_members_to_validate["targets_mapping"] = self.parse_targets_definitions(target_list[0])
-                # ! Action Definitions Container
-                if (action_list := script_element.get("action_list", None)) is not None:
-                    if not isinstance(action_list, list):
-                        raise TypeError(f"'action_list' in the HighLevelGrammar parsed dict is \
-                                        expected to be a list, but instead was {action_list}")
-                    mapped_members_to_validate["actions_list"] = self.parse_action_list(action_list)
+                target_lists.append(script_element)
+            elif isinstance(script_element, ActionBlock):
+                action_blocks.append(script_element)
+            else:
+                raise TypeError(f"Unexpected element in the script: {script_element}")
 
+        targets = self.validate_targets(target_lists, parsed_content=self.AST)
         # Final validation for the map.
-        if not mapped_members_to_validate["actions_list"]:
+        if not action_blocks:
             raise ValueError(f"Validation failed for the 'actions' field for HighLevelTree. Parsed Content: {self.AST}")
-        if not mapped_members_to_validate["targets_mapping"]:
-            raise ValueError(f"Validation failed for the 'targets' field for HighLevelTree. Parsed Content: {self.AST}")
 
         # Otherwise, everything is a-okay, and we can assign the mapped content to our own members
-        self.targets = mapped_members_to_validate["targets_mapping"]
-        self.actions = mapped_members_to_validate["actions_list"]
-
-    def parse_targets_definitions(self, target_definitions_string: str) -> Dict[str, str]:
-        """ Parses the target list definition from the AST.
-
-        Given the raw representation of the targets list provided by self.AST,
-        transforms the string into a dict representation, so that it can be assigned to
-        self.targets.
-
-        Args:
-            target_definitions_string (str): self.AST's interpretation of the 'targets'
-                                            list definition in the Sift file.
-
-        Returns:
-            dict[str, str]: The targets list such that { 'targ_name': 'url', ... }
-        """
-        no_brackets = target_definitions_string.replace('[', "").replace(']', "")
-        no_newlines = no_brackets.replace("\n", "")
-        no_spaces = no_newlines.replace(" ", "")
-        split_by_comma: list[str] = no_spaces.split(',')
-        targets_dict =  {}
-        for pair in split_by_comma:
-            split_pair = pair.split(":", 1)
-            key = split_pair[0]
-            val = split_pair[1].replace('"', "")
-            targets_dict[key] = val
-        return targets_dict
-
-    def parse_action_list(self, action_list: List[Dict[str, List[Dict[str, List]]]]) -> List[Dict[str, List]]:
-        """ Parses the action_list value from self.AST into a more concise form.
-        Given the self.AST's interpretation of the list of actions, expected to be:
-        [
-
-            {
-
-            'action': [ {'target': ['Amazon: ']}, {'statement_list': [ ... ]}]
-
-            }
+        self.targets = targets
+        self.actions = action_blocks
 
-        ]
-
-        parse_action_list transforms this interpretation to the form:
-
-        [
-
-            {
-
-                'target': [ <statement_list> ]
+    @classmethod
+    def generate_targets(cls, header: str) -> Dict[str, str]:
+        """ Parses and validates the header of a script (everything before its first action block). """
+        target_lists = HighLevelGrammar(header, transformer=ScriptTransformer).analyze()
+        return cls.validate_targets(target_lists, parsed_content=target_lists)
+
+    @staticmethod
+    def validate_targets(target_lists: List[Dict[str, str]], parsed_content) -> Dict[str, str]:
+        """ Validates the 'targets' lists of a script, returning its single, non-empty targets mapping. """
+        # There should only be one targets list in a script.
+        if len(target_lists) > 1:
+            raise MultipleTargetListDefinitionsError(original_definition=str(target_lists[0]),
+                                                     offending_alternate_definitions=[str(t) for t in target_lists[1:]])
+        if not target_lists or not target_lists[0]:
+            raise ValueError(f"Validation failed for the 'targets' field for HighLevelTree. Parsed Content: {parsed_content}")
+        return target_lists[0]
 
-            }
+    def __str__(self):
+        """ __str__ method required to be implemented by base class """
+        pass
 
-        ]
 
-        Args:
-            action_list (List[Dict[str, List[Dict[str, List]]]]): The raw action list interpretation by self.AST.
+class ScriptTransformer(ActionBlockTransformer):
+    """ Builds the elements of a whole script directly from the parse tree of the SIFT grammar.
 
-        Raises:
-            TypeError: Raised if the types of structures in action_list are unexpeccted.
-            ValueError: Raised if the action_list is missing key-pair values expected to be present in the action_list.
+    The 'script' node becomes the list of its target mappings ({ 'targ_name': 'url', ... }) and
+    ActionBlocks, in source order, which HighLevelTree then validates.
+    """
+    def target_definition(self, children: List[Token]) -> Tuple[str, str]:
+        name, url = children
+        return name.value, url.value.replace('"', "")
 
-        Returns:
-            List[Dict[str, List]]: The more concise, interpretable representation to be assigned to self.actions.
-        """
-        parsed_action_list = []
-        for action_dict in action_list:
-            if not isinstance(action_dict, dict):
-                raise TypeError(f"The 'action_list' list containing the dict action entries here: {action_list} \
-                was expected to strictly contain elements of type 'dict', but contained otherwise (here: {action_dict})")
-            if (action_contents := action_dict.get("action", None)) is None:
-                raise ValueError(f"Key confusion; expected the key 'action' in the current dict: \
-                                 {action_dict} in the context: {action_list}")
-            parsed_action_list.append(self.parse_action(action_contents))
-        return parsed_action_list
-
-    def parse_action(self, action: List[Dict[str, List]]) -> Dict[str, List]:
-        """ Parses a single 'action' from the AST into a more simple form.
-        *Helper method for parse_action_list*
-
-        Given an 'action' generated by self.AST of the form:
-        [
-            {
-                'target': ['Amazon: ']
-            },
-            {
-                'statement_list': [ ... ]
-            }
-        ]
-
-        parse_action transforms this into the form:
-        {
-            'targ_name': [ <statement list> ]
-        }
-        Raises:
-            TypeError: Raised if any of the entries in 'action' are not dicts as expected.
-            KeyError: Raised if any of the entries in action do not have the expected key-value pairs.
-        Returns:
-            Dict[str, List[str]]: The transformed, simpler action.
-        """
-        if any(not isinstance(attribute, dict) for attribute in action):
-            raise TypeError(f"The 'action' list containing the target and the statement list here: {action} \
-                            was expected to strictly contain elements of type 'dict', but contained otherwise ")
-        if (target_raw := action[0].get("target", None)) is None:
-            raise KeyError(f"Expected the 'target' field to be present in the 'action' dict here: {action}")
-        if (stmt_list := action[1].get("statement_list", None)) is None:
-            raise KeyError(f"Expected the 'statement_list' field to be present in the 'action' dict here: {action}")
-        # The target value first appears as a list, so move that.
-        target_raw = target_raw[0]
-        # The statement list first appears as a list, so move that (its just a container with one long string)
-        stmt_list = stmt_list[0]
-        cleaned_target = target_raw.replace(" ", "").replace(":", "")
-        action_entry_dict = {cleaned_target: stmt_list}
-        return action_entry_dict
+    def target_list(self, children: List[Tuple[str, str]]) -> Dict[str, str]:
+        return dict(children)
 
-    def __str__(self):
-        """ __str__ method required to be implemented by base class """
-        pass
+    def script(self, children: List[Union[Dict[str, str], ActionBlock]]) -> List[Union[Dict[str, str], ActionBlock]]:
+        return children
 
 
 @dataclass
@@ -237,24 +152,28 @@ class ScriptTree(ParsedNode):
     """ Simple representation of the targets defined at the start of the script. """
     action_blocks: List[ActionBlock]
     """ The first child of the script tree, containing all the action blocks. """
+    source: Optional[str] = field(default=None, compare=False, repr=False)
+    """ The script content the tree was parsed from, which lets Parser.reparse find the blocks that changed. """
 
 
     @classmethod
-    def generate(cls, abstract_tree: HighLevelTree):
-        """
-        # TODO (docstring)
-        """
-        targets = abstract_tree.targets
-        action_blocks = abstract_tree.actions
-        instance_action_block_list = []
+    def generate(cls, abstract_tree: HighLevelTree, source: Optional[str] = None):
+        """ Builds the ScriptTree from the already-parsed HighLevelTree.
 
-        for action_block in action_blocks:
-            parsed_block = ActionBlock.generate(action_block)
-            instance_action_block_list.append(parsed_block)
+        The HighLevelTree already holds the ActionBlocks, which were built along with the rest of
+        the script, so no part of the script is parsed or walked again here.
 
+        Args:
+            abstract_tree (HighLevelTree): The validated HighLevelTree of the script.
+            source (str, optional): The script content the HighLevelTree was generated from.
+
+        Returns:
+            ScriptTree: The AST of the script.
+        """
         return cls(
-            targets=targets,
-            action_blocks=instance_action_block_list
+            targets=abstract_tree.targets,
+            action_blocks=abstract_tree.actions,
+            source=source
         )
 
     def validate(self) -> bool:
@@ -286,3 +205,54 @@ class ScriptTree(ParsedNode):
             lines.append(f"    {i}. {block.pretty_print(indent=6)}")
 
         return "\n".join(lines)
+
+
+@dataclass
+class ScriptStream:
+    """ A script whose ActionBlocks are parsed one at a time, as they are consumed.
+
+    Only the header (the targets list) is parsed up front. Each action block is then located, parsed and
+    handed over before the next one is looked at, so the first blocks reach downstream consumers early and
+    only one block's parse tree is alive at a time, however large the script is.
+    """
+    targets: Dict[str, str]
+    action_blocks: Iterator[ActionBlock]
+
+    @classmethod
+    def generate(cls, content: str) -> "ScriptStream":
+        """ Parses the header of a script and prepares the stream of its ActionBlocks.
+
+        Scripts which cannot be split into blocks (see split_script) are parsed as a whole instead.
+        A block which does not parse makes the rest of the script be parsed as a whole as well, so that
+        syntax errors are reported against the whole script.
+
+        Args:
+            content (str): The entire content of the Sift script.
+
+        Returns:
+            ScriptStream: The targets of the script, and the lazily-generated ActionBlocks.
+        """
+        start = header_end(content)
+        if start is None:
+            tree = ScriptTree.generate(HighLevelTree.generate(content), source=content)
+            return cls(targets=tree.targets, action_blocks=iter(tree.action_blocks))
+        targets = HighLevelTree.generate_targets(content[:start])
+        return cls(targets=targets, action_blocks=cls._generate_blocks(content, start))
+
+    @staticmethod
+    def _generate_blocks(content: str, start: int) -> Iterator[ActionBlock]:
+        generated = 0
+        for span in iter_block_spans(content, start):
+            if span is None:
+                break
+            try:
+                block = ActionBlock.generate({span.target: span.body})
+            except (SyntaxError, LarkError):
+                break
+            generated += 1
+            yield block
+        else:
+            return
+        # Leave the rest of the script to a full parse (and its error reporting).
+        tree = ScriptTree.generate(HighLevelTree.generate(content), source=content)
+        yield from tree.action_blocks[generated:]
@@ -0,0 +1,20 @@
+""" The build step for the ahead-of-time parser tables.
+
+Serializes the parser of every grammar in SHIPPED_GRAMMARS into the artifact read by ParserTables,
+so that new processes deserialize the tables instead of analyzing the grammars and building them.
+
+Run from the src/ directory (or via 'make build-tables') whenever a grammar changes:
+
+    python -m language.parsing.build_tables
+"""
+from language.parsing.grammars import SHIPPED_GRAMMARS
+from language.parsing.utils import ParserTables
+
+
+def main():
+    path = ParserTables().dump(SHIPPED_GRAMMARS)
+    print(f"Wrote parser tables for {', '.join(g.name for g in SHIPPED_GRAMMARS)} to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-from language.parsing.utils import GrammarContainer, SyntaxProcessor
+from typing import Type
+
+from language.parsing.utils import GenericTransformer, GrammarContainer, SyntaxProcessor
 
 #######################
 ## Grammars ###########
 #######################
 
-FILTER = GrammarContainer(start="filter_expr")
+FILTER = GrammarContainer(start="filter_expr", name="FILTER")
 FILTER.production_map = {
     # Top-level
     "?filter_expr": "or_expr",
@@ -64,29 +66,41 @@ FILTER.production_map = {
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 
-ACTION_BLOCK = GrammarContainer(start="block")
-ACTION_BLOCK.production_map = {
-    "block": "_START (action)+ _END",
-    "_START": r"/\s*\{\s*/",
-    "_END": r"/\s*\}\s*/",
-    "?action": r"/\s*[^;]+;/"
+SIFT = GrammarContainer(start="script", name="SIFT")
+SIFT.production_map = {
+    # A single grammar for the whole script: targets, action blocks, statements and their filters
+    # are all produced by one LALR parse.
+    "script": "target_list+ action_block*",
+
+    "target_list": "\"targets\" \"=\" \"[\" target_definition (\",\" target_definition)* \"]\"",
+    "target_definition": "IDENTIFIER \":\" ESCAPED_STRING",
+
+    "action_block": "IDENTIFIER \":\" statement_block",
+    "statement_block": "\"{\" (statement \";\")* \"}\"",
+    # Statement rules are named "<keyword>_statement": plugins are dispatched on that keyword (see Action.keywords)
+    "?statement": "extract_statement",
+
+    # 'where' and '->' are named terminals, so that their tokens (and positions) stay in the tree: the source
+    # text of the filter lies between them (see FilterTransformer._transform_tree).
+    "extract_statement": "\"extract\" from_clause? WHERE raw_filter ARROW IDENTIFIER",
+    "from_clause": "\"from\" IDENTIFIER",
+    # Marks the filter whose source text is recovered, and memoized on (see FilterTransformer)
+    "raw_filter": "filter_expr",
+    "WHERE": "\"where\"",
+    "ARROW": "\"->\"",
+
+    "IDENTIFIER": r"/[a-zA-Z_]\w*/",
+
+    # The filter expressions are the FILTER grammar, verbatim
+    **FILTER.production_map
 }
 
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-
+# Entry points into the same grammar, used when only part of a script has to be (re)parsed.
+SIFT_BLOCK = GrammarContainer(start="statement_block", production_map=SIFT.production_map, name="SIFT_BLOCK")
+SIFT_STATEMENT = GrammarContainer(start="extract_statement", production_map=SIFT.production_map, name="SIFT_STATEMENT")
 
-HIGH_LEVEL = GrammarContainer(start="script")
-HIGH_LEVEL.production_map = {
-    "script": "target_list (action_list)?",
-    "target_list": "_TARGETS~1 TL_REGEX_DEFINITION~1",
-    "_TARGETS": r"/targets\s*=\s*/",
-    "TL_REGEX_DEFINITION": r"/\[[^\]]+\]/",
-    "action_list": "action+",
-    "action": "target statement_list",
-    "target": "SOME_TARGET",
-    "SOME_TARGET": r"/[a-zA-Z_^:]+:[\s^\r\n|\r|\n]+/x",
-    "statement_list": r"/\{[^\}]*\}/"
-}
+# The grammars whose parser tables are serialized into the package by language.parsing.build_tables.
+SHIPPED_GRAMMARS = [FILTER, SIFT, SIFT_BLOCK, SIFT_STATEMENT]
 
 
 ###############################
@@ -94,34 +108,36 @@ HIGH_LEVEL.production_map = {
 ###############################
 
 class FilterGrammar(SyntaxProcessor):
-    def __init__(self, content):
-        super().__init__(FILTER, content)
-    def analyze(self):
-        dict_filter_representation = super().analyze()
-        return dict_filter_representation
+    """ Parses a bare filter expression, such as 'tag "a" and not text contains "ad"'. """
+    def __init__(self, content, transformer: Type[GenericTransformer] = None):
+        super().__init__(FILTER, content, transformer=transformer)
+
+
+class StatementGrammar(SyntaxProcessor):
+    """ Parses a single (';'-less) statement, such as 'extract where tag "a" -> links'. """
+    def __init__(self, content, transformer: Type[GenericTransformer] = None):
+        super().__init__(SIFT_STATEMENT, content, transformer=transformer)
+
 
 class ActionBlockGrammar(SyntaxProcessor):
-    def __init__(self, content):
-        super().__init__(ACTION_BLOCK, content)
-        pass
-    def analyze(self):
-        generic_dict_representation = super().analyze()
-        action_statement_list = []
-        for action_stmt in generic_dict_representation['block']:
-            action_statement_list.append(action_stmt)
-        return action_statement_list
+    """ Parses the body of a single action block, '{ <statement>; ... }'. """
+    def __init__(self, content, transformer: Type[GenericTransformer] = None):
+        super().__init__(SIFT_BLOCK, content, transformer=transformer)
+
 
 class HighLevelGrammar(SyntaxProcessor):
     """ Defines an interactor class for HighLevelTree to use.
     Inherits from SyntaxProcessor, who handles the parsing of a given Sift grammar.
     """
-    def __init__(self, content):
+    def __init__(self, content, transformer: Type[GenericTransformer] = None):
         """ Initializes the parent SyntaxProcessor for use by HighLevelTree.
         HighLevelTree provides the content-to-parse (sift file content) which
-        is then turned into a high-level, mostly raw, intermediate representation
-        of the provided Sift script.
+        is then parsed, in a single pass, into the targets, the action blocks, and every
+        statement (with its filter) of the provided Sift script.
 
         Args:
             content (str): The content of the Sift script file.
+            transformer (Type[GenericTransformer], optional): The transformer which builds the
+                result from the parse tree. Defaults to GenericTransformer (a dict representation).
         """
-        super().__init__(HIGH_LEVEL, content)
+        super().__init__(SIFT, content, transformer=transformer)
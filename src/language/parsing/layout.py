@@ -0,0 +1,114 @@
+""" Locates the action blocks of a Sift script without parsing it.
+
+A script is a header (its 'targets' list) followed by action blocks, 'Name: { ... }'. Statements never
+contain braces outside of string literals, so the blocks can be found with a single scan which only has
+to be aware of string literals and '//' comments. The resulting ScriptLayout is what lets a script be
+reparsed (or parsed in parallel) one block at a time.
+"""
+import re
+
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+_TRIVIA = re.compile(r"(?:\s+|//[^\r\n]*)*")
+_BLOCK_HEAD = re.compile(r"([a-zA-Z_]\w*)(?:\s+|//[^\r\n]*)*:(?:\s+|//[^\r\n]*)*\{")
+# String literals and comments are matched whole, so that nothing inside of them is mistaken for structure.
+# A lone '"' is an unterminated string literal.
+_HEADER_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|//[^\r\n]*|"|(?<!\w)[a-zA-Z_]\w*')
+_BODY_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|//[^\r\n]*|"|[{}]')
+
+
+@dataclass(frozen=True)
+class BlockSpan:
+    """ The source span of one action block. """
+    target: str
+    start: int
+    """ Offset of the block's target identifier. """
+    body_start: int
+    """ Offset of the block's opening brace. """
+    end: int
+    """ Offset just past the block's closing brace. """
+    text: str
+    """ The whole block, 'Name: { ... }'. """
+
+    @property
+    def body(self) -> str:
+        """ The statement block alone, '{ ... }', as parsed by ActionBlockGrammar. """
+        return self.text[self.body_start - self.start:]
+
+
+@dataclass(frozen=True)
+class ScriptLayout:
+    header: str
+    """ Everything before the first action block (the targets list, comments...). """
+    blocks: List[BlockSpan] = field(default_factory=list)
+
+
+def _block_end(content: str, pos: int) -> Optional[int]:
+    """ Given the offset just past an opening brace, returns the offset just past its closing brace. """
+    for token in _BODY_TOKENS.finditer(content, pos):
+        if token.group() == "}":
+            return token.end()
+        if token.group() in ('{', '"'):
+            # Blocks do not nest, and strings must be terminated; leave such a script to the parser (and its error reporting).
+            return None
+    return None
+
+
+def _block_at(content: str, pos: int) -> Optional[BlockSpan]:
+    head = _BLOCK_HEAD.match(content, pos)
+    if head is None:
+        return None
+    end = _block_end(content, head.end())
+    if end is None:
+        return None
+    return BlockSpan(target=head.group(1), start=pos, body_start=head.end() - 1, end=end, text=content[pos:end])
+
+
+def header_end(content: str) -> Optional[int]:
+    """ Returns the offset of the first action block ('Name: {' outside of a string literal or a comment),
+    or None if the script does not seem to have one. Everything before it is the script's header. """
+    for token in _HEADER_TOKENS.finditer(content):
+        if token.group() == '"':
+            return None
+        if token.group()[0] not in '"/' and _block_at(content, token.start()) is not None:
+            return token.start()
+    return None
+
+
+def iter_block_spans(content: str, pos: int) -> Iterator[Optional[BlockSpan]]:
+    """ Lazily locates the action blocks of a script, starting at the offset of its first block.
+
+    Only whitespace and comments may separate the blocks. If the rest of the script is not a block,
+    None is yielded and the iteration stops: that part of the script is left to the parser.
+    """
+    while True:
+        pos = _TRIVIA.match(content, pos).end()
+        if pos == len(content):
+            return
+        block = _block_at(content, pos)
+        yield block
+        if block is None:
+            return
+        pos = block.end
+
+
+def split_script(content: str) -> Optional[ScriptLayout]:
+    """ Splits a script into its header and the spans of its action blocks.
+
+    Only the shape of the script is checked: its header and the statements of each block are left to the parser.
+
+    Args:
+        content (str): The entire content of the Sift script.
+
+    Returns:
+        Optional[ScriptLayout]: The layout, or None if the script does not have the expected shape
+            (in which case it should simply be parsed as a whole).
+    """
+    start = header_end(content)
+    if start is None:
+        return None
+    blocks = list(iter_block_spans(content, start))
+    if None in blocks:
+        return None
+    return ScriptLayout(header=content[:start], blocks=blocks)
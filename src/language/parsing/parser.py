@@ -1,4 +1,27 @@
-from language.parsing.ast.trees import HighLevelTree, ScriptTree
+import os
+
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from lark.exceptions import LarkError
+
+from language.exceptions.external_exception import SyntaxError
+from language.parsing.ast.actions.action_block import ActionBlock
+from language.parsing.ast.trees import HighLevelTree, ScriptStream, ScriptTree
+from language.parsing.layout import split_script
+
+PARALLEL_MIN_BLOCKS = int(os.environ.get("SIFT_PARALLEL_MIN_BLOCKS", 64))
+""" Scripts with fewer action blocks than this are not worth shipping to a process pool. """
+
+
+def _generate_block(target_and_body: Tuple[str, str]) -> Optional[ActionBlock]:
+    """ Parses one action block in a worker process; None if it does not parse (the caller reports the error). """
+    target, body = target_and_body
+    try:
+        return ActionBlock.generate({target: body})
+    except (SyntaxError, LarkError):
+        return None
 
 
 class Parser:
@@ -29,4 +52,101 @@ class Parser:
         Returns:
             ScriptTree: The AST representation of the Sift script.
         """
-        return ScriptTree.generate(self.high_level_tree)
+        return ScriptTree.generate(self.high_level_tree, source=self.raw_content)
+
+    @staticmethod
+    def stream(script_content: str) -> ScriptStream:
+        """ Parses the header of the script, and then its ActionBlocks one at a time, as they are consumed.
+
+        Args:
+            script_content (str): The content of the Sift file to be parsed.
+
+        Returns:
+            ScriptStream: The targets of the script, and an iterator over its ActionBlocks in source order.
+        """
+        return ScriptStream.generate(script_content)
+
+    @classmethod
+    def parse_parallel(cls, script_content: str, executor: Optional[Executor] = None,
+                       max_workers: Optional[int] = None, min_blocks: int = PARALLEL_MIN_BLOCKS) -> ScriptTree:
+        """ Generates the AST with the action blocks of the script parsed across a process pool.
+
+        Action blocks are independent of each other, so each is parsed on its own (by ActionBlock.generate,
+        and the plugins of its statements) in a worker process; the blocks are reassembled in source order,
+        into the same ScriptTree the serial path produces. Scripts with fewer than min_blocks blocks (or fewer
+        blocks than workers), scripts which cannot be split into blocks, and scripts with a block that does not
+        parse are parsed serially.
+
+        Args:
+            script_content (str): The content of the Sift file to be parsed.
+            executor (Executor, optional): The pool to use; a ProcessPoolExecutor is created (and shut down) if None.
+            max_workers (int, optional): The size of the pool, created when no executor is given.
+                Defaults to the CPU count.
+            min_blocks (int, optional): The block count below which the script is parsed serially.
+
+        Returns:
+            ScriptTree: The AST representation of the Sift script.
+        """
+        workers = max_workers or os.cpu_count() or 1
+        layout = split_script(script_content)
+        # With fewer blocks than workers, shipping the blocks to the pool costs more than parsing them.
+        if layout is None or len(layout.blocks) < max(min_blocks, workers):
+            return cls(script_content).parse_content_to_tree()
+        targets = HighLevelTree.generate_targets(layout.header)
+        work = [(span.target, span.body) for span in layout.blocks]
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                action_blocks = cls._map_blocks(pool, work, workers)
+        else:
+            action_blocks = cls._map_blocks(executor, work, workers)
+        if None in action_blocks:
+            return cls(script_content).parse_content_to_tree()
+        return ScriptTree(targets=targets, action_blocks=action_blocks, source=script_content)
+
+    @staticmethod
+    def _map_blocks(executor: Executor, work: List[Tuple[str, str]], workers: int) -> List[Optional[ActionBlock]]:
+        # A few chunks per worker keeps the pool busy without paying for one round trip per block.
+        chunksize = max(1, len(work) // (workers * 4))
+        return list(executor.map(_generate_block, work, chunksize=chunksize))
+
+    @classmethod
+    def reparse(cls, previous_tree: ScriptTree, new_content: str) -> ScriptTree:
+        """ Generates the AST of an edited script, reusing whatever the edit did not touch.
+
+        Both versions of the script are split into their action blocks (see split_script). Blocks whose
+        text is unchanged keep their ActionBlock (and its Action objects) from the previous tree; only
+        the blocks which changed are parsed, one at a time. The whole script is parsed instead when the
+        header (the targets list) changed, when either version cannot be split, or when a changed block
+        does not parse, so that syntax errors are reported against the whole script.
+
+        Args:
+            previous_tree (ScriptTree): The AST of the previous version of the script.
+            new_content (str): The entire content of the edited script.
+
+        Returns:
+            ScriptTree: The AST of the edited script.
+        """
+        old_layout = split_script(previous_tree.source) if previous_tree.source is not None else None
+        new_layout = split_script(new_content)
+        if old_layout is None or new_layout is None or old_layout.header != new_layout.header:
+            return cls(new_content).parse_content_to_tree()
+
+        # Identical blocks may appear more than once; they are reused in source order.
+        unchanged: Dict[str, Deque[ActionBlock]] = defaultdict(deque)
+        try:
+            for span, block in zip(old_layout.blocks, previous_tree.action_blocks, strict=True):
+                unchanged[span.text].append(block)
+        except ValueError:
+            # The previous tree does not match the blocks of its own source.
+            return cls(new_content).parse_content_to_tree()
+
+        action_blocks: List[ActionBlock] = []
+        for span in new_layout.blocks:
+            if unchanged[span.text]:
+                action_blocks.append(unchanged[span.text].popleft())
+                continue
+            try:
+                action_blocks.append(ActionBlock.generate({span.target: span.body}))
+            except (SyntaxError, LarkError):
+                return cls(new_content).parse_content_to_tree()
+        return ScriptTree(targets=previous_tree.targets, action_blocks=action_blocks, source=new_content)
@@ -1,9 +1,18 @@
+import hashlib
+import io
 import logging
+import os
+import pickle
+import tempfile
+import threading
 
 from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass, field
-from typing import Dict, Generic, List, TypeVar, Union
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, Type, TypeVar, Union
 
+import lark
 import lark_cython
 
 from lark import Lark, Token, Transformer, exceptions, logger
@@ -96,6 +105,10 @@ class GrammarContainer:
     start: str = None
     production_map: Dict[str, str] = field(default_factory=dict)
     parser: str = field(default="lalr")
+    propagate_positions: bool = field(default=False)
+    """ Whether Lark should record source positions (the 'meta' of each node) for the transformer to use. """
+    name: str = field(default=None)
+    """ The name the grammar's serialized parser tables are shipped under (see ParserTables). """
 
     _comment_identifier = "COMMENTS: /\\/\\/[^\r\n|\r|\n]+/x"
     _imports = [
@@ -121,6 +134,32 @@ class GrammarContainer:
         # Finally, join them separated by newlines.
         return "\n".join(grammar_list)
 
+    def key(self, start: str = None) -> Tuple[str, str, bool, str]:
+        """ Builds the identity of the parser that this GrammarContainer describes.
+
+        Two containers with the same start rule, parser settings and grammar text produce
+        interchangeable Lark instances, so they share the same key in the GrammarRegistry.
+
+        Args:
+            start (str, optional): Overrides the container's own start rule. Defaults to None.
+
+        Returns:
+            Tuple[str, str, bool, str]: The (start, parser, propagate_positions, grammar text) tuple.
+        """
+        if start is None or start == self.start:
+            return self._key
+        return (start, self.parser, self.propagate_positions, self.grammar_text)
+
+    @cached_property
+    def grammar_text(self) -> str:
+        """ The result of to_string(), built once: a container is not modified after it is defined. """
+        return self.to_string()
+
+    @cached_property
+    def _key(self) -> Tuple[str, str, bool, str]:
+        # The same tuple (and grammar string, whose hash Python caches) is handed out on every lookup.
+        return (self.start, self.parser, self.propagate_positions, self.grammar_text)
+
     def get(self, rule: str):
         if (found := self.production_map.get(rule, None)) is not None:
             return found
@@ -136,7 +175,7 @@ class SyntaxProcessor:
     When a Grammar class implements the SyntaxProcessor, this base class handles the interface
     between GrammarContainer, GrammarHandler, and the actual Grammar implementation class.
     """
-    def __init__(self, grammar: GrammarContainer, content: str):
+    def __init__(self, grammar: GrammarContainer, content: str, transformer: Type["GenericTransformer"] = None):
         """ Given a GrammarContainer and the raw content to be parsed, provides an instance of SyntaxProcessor.
 
         A Grammar class creates an instance of GrammarContainer when defining the parse grammar for their functionality.
@@ -148,18 +187,21 @@ class SyntaxProcessor:
         Args:
             grammar (GrammarContainer): A populated GrammarContainer instance.
             content (str): The raw string script content to be parsed by SyntaxProcessor.
+            transformer (Type[GenericTransformer], optional): The transformer class used on the parse tree.
+                Defaults to GenericTransformer.
         """
         self.grammar = grammar
         self.start = self.grammar.start
         self.content = content
-        self.handler = GrammarHandler(grammar, self.start, content)
+        self.handler = GrammarHandler(grammar, self.start, content, transformer)
         pass
     def analyze(self) -> Dict:
         """ The API for parsing raw script content into an intermediate object.
 
         Uses the GrammarHandler class to parse and transform string content from a Sift script
         into a dictionary structure, which can then be used to generate a real class instance
-        for the action associated with the grammar.
+        for the action associated with the grammar. The Lark parser itself comes from the
+        process-wide GrammarRegistry, so only the parse and the transform run here.
 
         If the handler cannot parse the content, a GrammarHandlerError exception is raised.
 
@@ -177,28 +219,234 @@ class GenericGrammar(Lark):
 
     *Inherits from Lark*
     """
-    def __init__(self, grammar: str, start: str, content: str):
+    def __init__(self, grammar: str, start: str, propagate_positions: bool = False, parser: str = "lalr"):
         """ Initializes the parent Lark instance with some universal settings.
 
         The purpose of GenericGrammar is to help us avoid re-defining a Lark object over and over,
         specifying the same settings each time.
 
         Using GenericGrammar, we can avoid this by only requiring the varying information to be passed to us;
-        that is, the grammar we will use, the starting rule, and the content we will parse.
+        that is, the grammar we will use and the starting rule.
 
-        GenericGrammar will specify the parser and the cache-setting automatically on construction, and will store the grammar
-        and the content to be parsed.
+        GenericGrammar will specify the parser and the cache-setting automatically on construction, and will store the grammar.
+        The instance is not tied to any particular content, so a single GenericGrammar can be shared (see GrammarRegistry)
+        by every parse of the same grammar.
 
         Args:
             grammar (str): The *string* representation of the grammar to be passed to Lark.
             start (str): The starting rule as a string to be passed to Lark.
-            content (str): The Sift script content that Lark will ultimately parse.
+            propagate_positions (bool, optional): Whether Lark records the source positions of each node. Defaults to False.
+            parser (str, optional): The Lark parsing algorithm (the GrammarContainer's 'parser'). Defaults to 'lalr'.
         """
-        super().__init__(grammar, start=start, parser='lalr', cache=True, _plugins=lark_cython.plugins)
+        # lark_cython, and Lark's own cache, only support LALR parsing.
+        lalr = parser == "lalr"
+        super().__init__(grammar, start=start, parser=parser, cache=lalr, propagate_positions=propagate_positions,
+                         _plugins=lark_cython.plugins if lalr else {})
         self.grammar = grammar
-        self.content = content
         pass
 
+
+PARSER_TABLES_FORMAT = 1
+""" Bumped whenever the layout of the parser tables artifact changes. """
+PARSER_TABLES_PATH = Path(__file__).resolve().parent / "parser_tables.pickle"
+
+registry_logger = logging.getLogger(__name__)
+
+def grammar_hash(key: Tuple[str, str, bool, str]) -> str:
+    """ Hashes a GrammarContainer key (see GrammarContainer.key) along with the versions that affect the tables.
+
+    Args:
+        key (Tuple[str, str, bool, str]): The key of the grammar.
+
+    Returns:
+        str: The hex digest identifying the parser tables of the grammar.
+    """
+    material = "\x00".join([str(PARSER_TABLES_FORMAT), lark.__version__, *(str(part) for part in key)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ParserTables:
+    """ The ahead-of-time serialized parser tables shipped inside the package.
+
+    Lark's own 'cache=True' lives in a temp dir, so a freshly deployed worker still pays for the grammar
+    analysis and the LALR table construction. The build step (language.parsing.build_tables) serializes the
+    parser of every named GrammarContainer into a single artifact, which is read once per process.
+
+    Each entry records the grammar_hash of the grammar it was built from. When the grammar (or the lark version)
+    changed since the artifact was built, the hash does not match and the caller falls back to building the tables.
+    """
+    def __init__(self, path: Union[str, Path] = PARSER_TABLES_PATH):
+        self.path = Path(path)
+        self._tables: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict]:
+        with self._lock:
+            if self._tables is None:
+                self._tables = {}
+                try:
+                    with open(self.path, "rb") as f:
+                        artifact = pickle.load(f)
+                except FileNotFoundError:
+                    registry_logger.info(f"No parser tables found at {self.path}; grammars will be built on demand.")
+                    return self._tables
+                if artifact.get("format") != PARSER_TABLES_FORMAT:
+                    registry_logger.warning(f"Ignoring the parser tables at {self.path}: unexpected format {artifact.get('format')}.")
+                    return self._tables
+                self._tables = artifact["tables"]
+            return self._tables
+
+    def load(self, name: str, key: Tuple[str, str, bool, str]) -> Optional[GenericGrammar]:
+        """ Loads the parser shipped under 'name', if it was built from the grammar described by 'key'.
+
+        Args:
+            name (str): The name of the GrammarContainer.
+            key (Tuple[str, str, bool, str]): The key of the GrammarContainer (see GrammarContainer.key).
+
+        Returns:
+            Optional[GenericGrammar]: The deserialized parser, or None if there is no valid entry for it.
+        """
+        if (entry := self._read().get(name, None)) is None:
+            return None
+        if entry["hash"] != grammar_hash(key):
+            registry_logger.warning(f"The shipped parser tables for '{name}' are stale; rebuilding them. "
+                                    "(Run 'python -m language.parsing.build_tables' to refresh the artifact.)")
+            return None
+        parser = GenericGrammar.load(io.BytesIO(entry["payload"]))
+        parser.grammar = key[3]
+        return parser
+
+    def dump(self, grammars: Iterable[GrammarContainer]) -> Path:
+        """ The build step: builds and serializes the parser of every given grammar into the artifact.
+
+        The artifact is written to a temporary file first and then moved into place, so a concurrently
+        starting process never reads a half-written file.
+
+        Args:
+            grammars (Iterable[GrammarContainer]): The named grammars to ship.
+
+        Returns:
+            Path: The path of the written artifact.
+        """
+        tables = {}
+        for grammar in grammars:
+            if not grammar.name:
+                raise ValueError(f"Only named grammars can be shipped as parser tables, got: {grammar}")
+            key = grammar.key()
+            buffer = io.BytesIO()
+            GrammarRegistry._build(key).save(buffer)
+            tables[grammar.name] = {"hash": grammar_hash(key), "payload": buffer.getvalue()}
+        artifact = {"format": PARSER_TABLES_FORMAT, "lark_version": lark.__version__, "tables": tables}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._tables = tables
+        return self.path
+
+
+@dataclass
+class GrammarRegistryStats:
+    """ A snapshot of the GrammarRegistry counters. """
+    hits: int = 0
+    """ Number of lookups served by an already-built parser. """
+    misses: int = 0
+    """ Number of lookups which had to build a new parser. """
+    table_loads: int = 0
+    """ Number of misses served from the shipped parser tables instead of building the parser. """
+    size: int = 0
+    """ Number of parsers currently held by the registry. """
+
+
+class GrammarRegistry:
+    """ A process-wide, thread-safe registry of ready-to-use GenericGrammar (Lark) instances.
+
+    Building a Lark instance means analyzing the grammar and constructing the LALR tables, which is far
+    more expensive than parsing a single statement. Since a parser is not bound to the content it parses,
+    the registry builds each one the first time its GrammarContainer is requested and hands the same
+    instance out to every later GrammarHandler.
+
+    Named grammars are first looked up in the shipped ParserTables, so that a new process only deserializes them.
+
+    *Note:* The module-level GRAMMAR_REGISTRY instance is the one used by GrammarHandler.
+    """
+    def __init__(self, tables: ParserTables = None):
+        self._parsers: Dict[Tuple[str, str, bool, str], GenericGrammar] = {}
+        self._lock = threading.Lock()
+        self._tables = tables or ParserTables()
+        self._hits = 0
+        self._misses = 0
+        self._table_loads = 0
+
+    def get(self, grammar: GrammarContainer, start: str = None) -> GenericGrammar:
+        """ Returns the parser for the given GrammarContainer, building it on the first request.
+
+        Args:
+            grammar (GrammarContainer): The grammar to get a parser for.
+            start (str, optional): Overrides the container's start rule. Defaults to None.
+
+        Returns:
+            GenericGrammar: The shared parser instance.
+        """
+        key = grammar.key(start)
+        with self._lock:
+            if (parser := self._parsers.get(key, None)) is not None:
+                self._hits += 1
+                return parser
+            self._misses += 1
+            # Built under the lock so that concurrent first requests do not construct the tables twice.
+            parser = self._load_or_build(grammar, key)
+            self._parsers[key] = parser
+            return parser
+
+    def warm(self, *grammars: GrammarContainer) -> None:
+        """ Eagerly builds the parsers for the given grammars (e.g. on worker start-up).
+
+        Args:
+            *grammars (GrammarContainer): The grammars to build parsers for.
+        """
+        for grammar in grammars:
+            key = grammar.key()
+            with self._lock:
+                if key not in self._parsers:
+                    self._parsers[key] = self._load_or_build(grammar, key)
+
+    def _load_or_build(self, grammar: GrammarContainer, key: Tuple[str, str, bool, str]) -> GenericGrammar:
+        # The shipped tables are only valid for the container's own start rule.
+        if grammar.name and key[0] == grammar.start:
+            if (parser := self._tables.load(grammar.name, key)) is not None:
+                self._table_loads += 1
+                return parser
+        return self._build(key)
+
+    @staticmethod
+    def _build(key: Tuple[str, str, bool, str]) -> GenericGrammar:
+        start, parser, propagate_positions, grammar_text = key
+        return GenericGrammar(grammar_text, start, propagate_positions=propagate_positions, parser=parser)
+
+    def stats(self) -> GrammarRegistryStats:
+        """ Returns a snapshot of the hit and miss counters.
+
+        Returns:
+            GrammarRegistryStats: The current counters and the number of cached parsers.
+        """
+        with self._lock:
+            return GrammarRegistryStats(hits=self._hits, misses=self._misses, table_loads=self._table_loads,
+                                        size=len(self._parsers))
+
+    def clear(self) -> None:
+        """ Drops every cached parser and resets the counters. """
+        with self._lock:
+            self._parsers.clear()
+            self._hits = 0
+            self._misses = 0
+            self._table_loads = 0
+
+
+GRAMMAR_REGISTRY = GrammarRegistry()
+
 class GenericTransformer(Transformer):
     """ A base class for interfacing with the Lark 'Transformer' class.
 
@@ -208,6 +456,15 @@ class GenericTransformer(Transformer):
         Transformer (Lark.Transformer): Inherits from Lark's 'Transfomer' class,
             which aids in generating a dict-like object from a Lark 'Tree' instance.
     """
+    def __init__(self, content: str = None):
+        """ Creates the transformer, keeping the parsed content around for rule callbacks which need the source text.
+
+        Args:
+            content (str, optional): The raw content the tree was parsed from. Defaults to None.
+        """
+        super().__init__()
+        self.content = content
+
     def __default__(self, data: Union[Token, str], children: List[Union[Token, Dict[str, List[str]]]], meta: Meta):
         """ Overrides the Lark.Transformer 'default' method for transforming a Lark.Tree node.
 
@@ -243,24 +500,27 @@ class GrammarHandler:
 
     *Note:* This is strictly intended to be implemented by SyntaxProcessor.
     """
-    def __init__(self, grammar: GrammarContainer, start: str, content: str):
+    def __init__(self, grammar: GrammarContainer, start: str, content: str, transformer: Type[GenericTransformer] = None):
         """ Creates a GrammarHandler using a GrammarContainer instance, the start rule, and the content to be parsed.
 
         Given a GrammarContainer instance which contains the definition for the grammar,
-        we use the GrammarContainer's 'to_string' instance method to put the grammar into lark-readable form.
-        GrammarHandler then owns an instance of the GenericGrammar class, which can be used as a Lark instance.
+        we ask the GRAMMAR_REGISTRY for the GenericGrammar built from the GrammarContainer's 'to_string' form.
+        The parser is shared with every other GrammarHandler using the same grammar, so it is only built once per process.
 
         To start, the 'parsed_content' member variable holds None until GrammarHandler's 'parse' method is called.
         Args:
             grammar (GrammarContainer): The GrammarContainer provided by SyntaxProcessor.
             start (str): The starting rule (which must be defined in the GrammarContainer.)
             content (str): The raw content which will be parsed with the grammar.
+            transformer (Type[GenericTransformer], optional): The transformer class applied by 'transform'.
+                Defaults to GenericTransformer.
         """
         # Define the grammar and content to be parsed
         self.content = content
+        self.transformer = transformer or GenericTransformer
         self.gram_container = grammar
-        self.grammar = grammar.to_string()
-        self.lark_grammar = GenericGrammar(self.grammar, start, content)
+        self.lark_grammar = GRAMMAR_REGISTRY.get(grammar, start)
+        self.grammar = self.lark_grammar.grammar
         self.parsed_content = None
 
     def parse(self) -> None:
@@ -281,7 +541,7 @@ class GrammarHandler:
         if not self.parsed_content:
             self.parse()
 
-        transformer = GenericTransformer()
+        transformer = self.transformer(self.content)
         tree_in_dict_form = transformer.transform(self.parsed_content)
         return tree_in_dict_form
 
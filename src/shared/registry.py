@@ -1,19 +1,23 @@
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Dict, Generic, Hashable, List, TypeVar, Union
+from types import MappingProxyType
+from typing import Dict, Generic, Hashable, List, Mapping, TypeVar, Union
 
 
 class RegistryType(Enum):
     OP = auto()
     ACTION = auto()
+    KEYWORD = auto()
+    """ Leading statement keyword -> the generator of the Action plugin which owns it. """
 registries: Dict[RegistryType, "Registry"] = {}
 RegisteredItem = TypeVar("RegisteredItem")
-RCollection = Union[List[RegisteredItem], Dict[Hashable, RegisteredItem]]
+RCollection = Union[List[RegisteredItem], Dict[Hashable, RegisteredItem], Mapping[Hashable, RegisteredItem]]
 
 @dataclass
 class Registry(Generic[RegisteredItem]):
     rtype: RegistryType
     registry: RCollection
+    frozen: bool = False
 
 def get_registry(rtype: RegistryType) -> Union[RCollection, None]:
     if rtype not in registries:
@@ -22,6 +26,8 @@ def get_registry(rtype: RegistryType) -> Union[RCollection, None]:
 
 def register(rtype: RegistryType, item: RegisteredItem, key: Hashable = "") -> None:
     is_mapping = True if key else False
+    if rtype in registries and registries[rtype].frozen:
+        raise ValueError(f"Cannot register {item} in {rtype}: the registry was frozen once plugin discovery finished.")
     if rtype not in registries:
         if is_mapping:
             registries[rtype] = Registry(rtype=rtype, registry={})
@@ -33,22 +39,31 @@ def register(rtype: RegistryType, item: RegisteredItem, key: Hashable = "") -> N
     registries[rtype].registry.append(item)
     return
 
+def freeze(rtype: RegistryType) -> None:
+    """ Turns a mapping registry into a read-only dispatch table; any later registration raises. """
+    if rtype not in registries:
+        registries[rtype] = Registry(rtype=rtype, registry={})
+    relevant_registry = registries[rtype]
+    if isinstance(relevant_registry.registry, Dict):
+        relevant_registry.registry = MappingProxyType(dict(relevant_registry.registry))
+    relevant_registry.frozen = True
+
 def lookup(rtype: RegistryType, item: RegisteredItem = None, key: Hashable = "") -> Union[RegisteredItem, None]:
     if rtype not in registries:
         return None
     relevant_registry = registries[rtype]
 
-    if isinstance(relevant_registry.registry, Dict):
+    if isinstance(relevant_registry.registry, Mapping):
         if not key:
             raise KeyError(f'Expected a key to look up an element in {rtype}, but recieved none.')
-        return _find_in_registry_list(registry=relevant_registry, key=key)
+        return relevant_registry.registry.get(key)
     if isinstance(relevant_registry.registry, List):
         if not item:
             raise ValueError(f'Expected an item to find in registry {rtype}, but one was not passed.')
-        return _find_in_registry_list(registry=relevant_registry, item=item)
+        return _find_in_registry_list(registry=relevant_registry, to_find=item)
 
 def _find_in_registry_list(registry: Registry, key: Hashable = "", to_find: RegisteredItem = None) -> Union[RegisteredItem, None]:
-    if isinstance(registry.registry, Dict):
+    if isinstance(registry.registry, Mapping):
         if key in registry.registry:
             return registry.registry[key]
         return None
@@ -0,0 +1,87 @@
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+Value = TypeVar("Value")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    cost: int
+    budget: int
+
+
+class LRUCache(Generic[Value]):
+    """ Thread-safe least-recently-used cache bounded by a total cost budget.
+
+    Every entry is charged ``cost(value)`` (1 by default, i.e. the budget is an entry count);
+    inserting past the budget evicts the least recently used entries until the cache fits again.
+    Values larger than the whole budget are never stored.
+    """
+    def __init__(self, budget: int, cost: Optional[Callable[[Value], int]] = None):
+        if budget < 0:
+            raise ValueError(f"Expected a non-negative cache budget, instead got: {budget}")
+        self.budget = budget
+        self._cost = cost or (lambda _: 1)
+        self._entries: "OrderedDict[Hashable, tuple[Value, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Value]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Value) -> bool:
+        """ Store ``value`` under ``key``; returns False when the value alone exceeds the budget. """
+        cost = self._cost(value)
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._entries.pop(key)[1]
+            if cost > self.budget:
+                return False
+            self._entries[key] = (value, cost)
+            self._total += cost
+            while self._total > self.budget:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self._total -= evicted_cost
+                self.evictions += 1
+            return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                cost=self._total,
+                budget=self.budget
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+            self.hits = self.misses = self.evictions = 0
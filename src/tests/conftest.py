@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+# The script processor reads its debug log directory when it is imported.
+os.environ.setdefault("DEBUG_LOGS", tempfile.gettempdir())
+
+SCRIPT = """targets = [ Shop: "https://shop.example", News: "https://news.example" ]
+
+Shop: {
+    extract where tag "div" and attribute "class": "item" -> items;
+    extract from items where text contains ["7", "9"] -> lucky;
+    extract where tag "span" and text contains "price 1" -> prices;
+    extract where tag "a" and not attribute "href": contains "/p/1" -> links;
+    extract where (tag "div" and attribute "class": "item") or text contains "sponsored" -> listed;
+}
+
+News: {
+    extract where tag ["h1", "h2"] or attribute "id": any -> headings;
+}
+"""
+
+PAGE = "".join(
+    f'<li><div class="item{" ad" if index % 5 == 0 else ""}" id="i{index}"><a href="/p/{index}">Item {index}</a>'
+    f'<span>price {index}</span>{"<em>sponsored</em>" if index % 5 == 0 else ""}</div></li>'
+    for index in range(30)
+)
+SHOP = f"<html><body><ul>{PAGE}</ul></body></html>".encode()
+NEWS = b'<html><body><h1>Title</h1><p id="lead">Lead</p><h2>Sub</h2><p>Body</p></body></html>'
+
+
+@pytest.fixture
+def script_path(tmp_path):
+    path = tmp_path / "script.sift"
+    path.write_text(SCRIPT)
+    return str(path)
+
+
+@pytest.fixture
+def documents():
+    return {"Shop": SHOP, "News": NEWS}
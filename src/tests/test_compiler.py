@@ -0,0 +1,230 @@
+import json
+
+import pytest
+
+from language.compiler import compiler as compiler_module
+from language.compiler.binary import (
+    ProgramReader,
+    dump_program,
+    load_program,
+    write_program,
+)
+from language.compiler.bytecode import ProgramBytecode
+from language.compiler.cache import COMPILE_CACHE, CompileCache
+from language.compiler.compiler import Compiler
+from language.compiler.compiler_exceptions import (
+    DuplicateDestinationException,
+    UndefinedAliasException,
+)
+from language.compiler.cse import inline_predicates
+from language.compiler.dag import DependencyGraph
+from language.compiler.flat import FlatCondition, FlatFilter, FlatOp, LiteralTable
+from language.compiler.optimizer import FALSE, cost, optimize_condition
+from language.compiler.store import ArtifactStore
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    ElementType,
+    ExtractStatement,
+    LogicalOperator,
+    NodeFactory,
+    Program,
+)
+from language.executor.executor import Executor
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch):
+    COMPILE_CACHE.clear()
+    monkeypatch.setattr(compiler_module, "ARTIFACT_STORE", None)
+    yield
+    COMPILE_CACHE.clear()
+
+
+def lowered(script_path: str) -> Program:
+    """ The Program of a script as lowered from its AST, before any optimization pass. """
+    compiler = Compiler(script_path)
+    compiler.STATES["AST"] = compiler.parse_to_ast()
+    return compiler.lower_to_ir()
+
+
+def selected(results) -> dict:
+    return {destination: [node.index for node in nodes] for destination, nodes in results.items()}
+
+
+def test_compile_cache_serves_identical_content(script_path):
+    first = Compiler(script_path).compile()
+    assert Compiler(script_path).compile() is first
+    assert COMPILE_CACHE.stats().hits == 1
+    assert Compiler(script_path).compile(lookup=False) is not first
+
+
+def test_compile_cache_evicts_least_recently_used_past_its_budget(script_path):
+    compiled = Compiler(script_path).compile()
+    assert 0 < compiled.nbytes < 64 * 1024
+    cache = CompileCache(max_bytes=2 * compiled.nbytes)
+    cache.put("first", compiled)
+    cache.put("second", compiled)
+    assert cache.get("first") is compiled
+    cache.put("third", compiled)
+    assert cache.get("second") is None
+    assert cache.get("first") is compiled and cache.get("third") is compiled
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions, stats.cost) == (2, 1, 2 * compiled.nbytes)
+
+    small = CompileCache(max_bytes=compiled.nbytes - 1)
+    small.put("first", compiled)
+    assert small.get("first") is None
+
+
+def test_optimization_passes_keep_the_results(script_path, documents):
+    compiled = Compiler(script_path).compile()
+    assert compiled.IR.predicates, "items and listed share a subexpression"
+    expected = selected(Executor(lowered(script_path)).run(documents))
+    assert expected["items"] and expected["lucky"] and expected["headings"]
+    assert selected(Executor(compiled.IR, compiled.BYTECODE).run(documents)) == expected
+
+    fused = Compiler(script_path).compile(outputs=["lucky"])
+    assert "items" not in [statement.destination for statement in fused.IR.statements]
+    assert selected(Executor(fused.IR).run(documents, outputs=["lucky"])) == {"lucky": expected["lucky"]}
+
+
+def test_flat_encodings_round_trip(script_path):
+    compiled = Compiler(script_path).compile()
+    assert compiled.IR.predicates, "items and listed share a subexpression"
+    literals = LiteralTable()
+    conditions = FlatCondition(literals)
+    roots = [conditions.append(each.condition) for each in compiled.IR.statements + compiled.IR.predicates]
+    assert [conditions.to_condition(root) for root in roots] == [each.condition for each in compiled.IR.statements + compiled.IR.predicates]
+    assert FlatOp.REF in conditions.ops
+    # A subtree encoded before is referred to, not encoded again.
+    negated = NODES.logical(LogicalOperator.NOT, [compiled.IR.predicates[0].condition])
+    root = conditions.append(negated)
+    assert list(conditions.ops[root:]) == [FlatOp.NOT, FlatOp.SHARED]
+    assert conditions.to_condition(root) is negated
+    for action in compiled.AST.action_blocks[0].actions:
+        flat = FlatFilter.from_filter(action, literals)
+        rebuilt = flat.to_filter()
+        assert (rebuilt.operator, rebuilt.filter_type, rebuilt.value) == (action.operator, action.filter_type, action.value)
+        assert [operand.value for operand in rebuilt.operands or ()] == [operand.value for operand in action.operands or ()]
+
+
+def test_node_factory_interns_equal_nodes():
+    factory = NodeFactory()
+    first = factory.conditional(factory.selector(ElementType.TAG), factory.literal(("div",)), ComparisonOperator.EQUALS)
+    second = factory.conditional(factory.selector(ElementType.TAG), factory.literal(("div",)), ComparisonOperator.EQUALS)
+    assert first is second and len(factory) == 3
+    both = factory.logical(LogicalOperator.AND, [first, factory.predicate_ref("p0")])
+    assert factory.logical(LogicalOperator.AND, (second, factory.predicate_ref("p0"))) is both
+    assert both.expressions[0] is first
+    assert factory.literal(("span",)) is not first.rhs
+
+
+def comparison(element_type: ElementType, *values: str, name: str = None,
+               operator: ComparisonOperator = ComparisonOperator.EQUALS):
+    return NODES.conditional(NODES.selector(element_type, name), NODES.literal(values), operator)
+
+
+def test_optimizer_rewrites_conditions():
+    div, item = comparison(ElementType.TAG, "div"), comparison(ElementType.ATTRIBUTE, "item", name="class")
+    sponsored = comparison(ElementType.TEXT, "sponsored", operator=ComparisonOperator.CONTAINS)
+    # Nested chains flatten into one node, whose operands are ordered by cost.
+    nested = NODES.logical(LogicalOperator.AND, [NODES.logical(LogicalOperator.AND, [sponsored, item]), div])
+    assert optimize_condition(nested) is NODES.logical(LogicalOperator.AND, [div, item, sponsored])
+    assert cost(div) < cost(item) < cost(sponsored)
+    # De Morgan pushes 'not' down to the comparisons.
+    negated = NODES.logical(LogicalOperator.NOT, [NODES.logical(LogicalOperator.AND, [div, sponsored])])
+    assert optimize_condition(negated) is NODES.logical(LogicalOperator.OR, [
+        NODES.logical(LogicalOperator.NOT, [div]), NODES.logical(LogicalOperator.NOT, [sponsored])])
+    # Comparisons of one selector merge.
+    either = NODES.logical(LogicalOperator.OR, [div, comparison(ElementType.TAG, "p")])
+    assert optimize_condition(either) is comparison(ElementType.TAG, "div", "p")
+    both = NODES.logical(LogicalOperator.AND, [comparison(ElementType.TAG, "div", "p"), comparison(ElementType.TAG, "p", "a")])
+    assert optimize_condition(both) is comparison(ElementType.TAG, "p")
+    assert optimize_condition(NODES.logical(LogicalOperator.AND, [div, NODES.logical(LogicalOperator.NOT, [div])])) is FALSE
+
+
+def test_shared_subexpressions_become_predicates(script_path):
+    compiled = Compiler(script_path).compile()
+    program = compiled.IR
+    assert [predicate.source for predicate in program.predicates] == ["Shop"]
+    shared = NODES.predicate_ref(program.predicates[0].name)
+    conditions = {statement.destination: statement.condition for statement in program.statements}
+    assert conditions["items"] is shared
+    assert shared in conditions["listed"].expressions
+    assert inline_predicates(program)[0].condition is program.predicates[0].condition
+
+
+def test_schedule_runs_dependencies_first(script_path):
+    compiled = Compiler(script_path).compile()
+    destinations = [statement.destination for statement in compiled.IR.statements]
+    assert destinations == ["items", "lucky", "prices", "links", "listed", "headings"]
+    stage_of = {destinations[index]: number for number, stage in enumerate(compiled.SCHEDULE.stages) for index in stage.statements}
+    assert stage_of["lucky"] > stage_of["items"]
+    assert stage_of["headings"] == stage_of["items"] == 0
+
+
+def test_dependency_graph_rejects_bad_aliases(script_path):
+    program = lowered(script_path)
+    duplicate = Program(targets=program.targets, statements=program.statements + [program.statements[0]])
+    with pytest.raises(DuplicateDestinationException):
+        DependencyGraph.build(duplicate)
+    statement = program.statements[1]
+    dangling = ExtractStatement(source=statement.source, condition=statement.condition, destination="orphan", from_alias="nowhere")
+    with pytest.raises(UndefinedAliasException):
+        DependencyGraph.build(Program(targets=program.targets, statements=program.statements + [dangling]))
+
+
+def test_unrequested_single_consumer_chains_are_fused(script_path):
+    fused = Compiler(script_path).compile(outputs=["lucky", "headings"])
+    statements = {statement.destination: statement for statement in fused.IR.statements}
+    assert "items" not in statements and statements["lucky"].from_alias is None
+    assert Compiler(script_path).compile() is not fused
+    assert [statement.destination for statement in Compiler(script_path).compile(outputs=["items"]).IR.statements][0] == "items"
+
+
+def test_bytecode_covers_every_statement_and_round_trips(script_path):
+    compiled = Compiler(script_path).compile()
+    bytecode = compiled.BYTECODE
+    assert [code.destination for code in bytecode.statements] == [each.destination for each in compiled.IR.statements]
+    assert [code.name for code in bytecode.predicates] == [each.name for each in compiled.IR.predicates]
+    assert "CALL" in bytecode.disassemble()
+    assert ProgramBytecode.from_bytes(bytecode.to_bytes()) == bytecode
+
+
+def test_program_round_trips_through_the_binary_encoding(script_path, tmp_path):
+    program = Compiler(script_path).compile().IR
+    assert load_program(dump_program(program)) == program
+    with ProgramReader(dump_program(program)) as reader:
+        assert len(reader.statements) == len(program.statements)
+        assert reader.statements[1] == program.statements[1]
+        assert reader.statements[-1].condition is program.statements[-1].condition
+    path = str(tmp_path / "program.sir")
+    write_program(path, program)
+    with ProgramReader.open(path) as reader:
+        assert reader.to_program() == program
+
+
+def test_fast_json_matches_the_dict_path(script_path):
+    program = Compiler(script_path).compile().IR
+    assert json.loads(program.to_json_bytes()) == json.loads(json.dumps(program.to_dict()))
+    assert json.loads(program.to_json_bytes()) == json.loads(program.to_json(indent=4))
+    assert program.to_json() == program.to_json_bytes(pretty=True).decode()
+
+
+def test_artifact_store_serves_a_new_process(script_path, tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    monkeypatch.setattr(compiler_module, "ARTIFACT_STORE", store)
+    first = Compiler(script_path).compile()
+    assert store.size() > 0
+
+    # A restarted worker: the compile cache is empty, and the caller already checked it.
+    COMPILE_CACHE.clear()
+    loaded = Compiler(script_path).compile(lookup=False)
+    assert loaded.AST is None
+    assert (loaded.IR, loaded.BYTECODE) == (first.IR, first.BYTECODE)
+    assert loaded.SCHEDULE == first.SCHEDULE
+    assert Compiler(script_path).compile(lookup=False, store=False).AST is not None
+
+    store.clear()
+    assert store.get(COMPILE_CACHE.key(open(script_path).read())) is None
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from language.compiler import compiler as compiler_module
+from language.compiler.bytecode import (
+    AHO_CORASICK_MIN_NEEDLES,
+    Interpreter,
+    ProgramBytecode,
+)
+from language.compiler.cache import COMPILE_CACHE
+from language.compiler.compiler import Compiler
+from language.compiler.matcher import AhoCorasick
+from language.compiler.types import (
+    NODES,
+    ComparisonOperator,
+    ElementType,
+    ExtractStatement,
+    Program,
+)
+from language.executor.bitset import BitsetExecutor
+from language.executor.document import parse_document
+from language.executor.executor import Executor
+from language.executor.executor_exceptions import MissingDocumentError
+from language.executor.index import IndexedExecutor
+from language.executor.streaming import StreamingExecutor
+
+
+@pytest.fixture
+def program(script_path, monkeypatch):
+    monkeypatch.setattr(compiler_module, "ARTIFACT_STORE", None)
+    COMPILE_CACHE.clear()
+    return Compiler(script_path).compile().IR
+
+
+def selected(results) -> dict:
+    return {destination: [node.index for node in nodes] for destination, nodes in results.items()}
+
+
+def test_documents_are_flat_tables_of_elements():
+    document = parse_document('<div class="a b">Hello <b>big</b>&amp; <br> world<p>one<p>two</div><img src=x.jpg>')
+    assert [node.tag for node in document.elements] == ["div", "b", "br", "p", "p", "img"]
+    div, bold = document.elements[:2]
+    assert div.attributes == {"class": "a b"} and div.parent is None and bold.parent == 0
+    assert div.text == "Hello big& worldonetwo"
+    assert document.elements[4].parent == 0
+
+
+def test_executor_selects_the_matching_elements(program, documents):
+    results = Executor(program).run(documents)
+    items = results["items"]
+    # Every fifth card is class "item ad", which does not equal "item".
+    assert len(items) == 24 and all(node.tag == "div" for node in items)
+    assert [node.text for node in results["lucky"]] == [node.text for node in items if "7" in node.text or "9" in node.text]
+    assert [node.tag for node in results["headings"]] == ["h1", "p", "h2"]
+    assert selected(Executor(program).run(documents, outputs=["lucky"])) == {"lucky": selected(results)["lucky"]}
+
+
+def test_missing_documents_are_reported(program, documents):
+    with pytest.raises(MissingDocumentError):
+        Executor(program).run({"Shop": documents["Shop"]})
+
+
+def test_executors_agree(program, documents):
+    expected = selected(Executor(program).run(documents))
+    for executor in [StreamingExecutor(program), IndexedExecutor(program), BitsetExecutor(program, use_numpy=False)]:
+        assert selected(executor.run(documents)) == expected, type(executor).__name__
+
+
+def test_executors_agree_on_requested_outputs(program, documents):
+    expected = selected(Executor(program).run(documents, outputs=["lucky", "prices"]))
+    assert set(expected) == {"lucky", "prices"}
+    for executor in [StreamingExecutor(program), IndexedExecutor(program), BitsetExecutor(program, use_numpy=False)]:
+        assert selected(executor.run(documents, outputs=["lucky", "prices"])) == expected, type(executor).__name__
+
+
+def test_streaming_accepts_documents_in_chunks(program, documents):
+    executor = StreamingExecutor(program)
+    whole = list(executor.stream("Shop", [documents["Shop"]]))
+    shop = documents["Shop"]
+    chunked = list(executor.stream("Shop", [shop[start:start + 7] for start in range(0, len(shop), 7)]))
+    assert [(destination, node.index) for destination, node in chunked] == [(destination, node.index) for destination, node in whole]
+
+
+def test_automaton_finds_every_needle():
+    generator = random.Random(7)
+    for _ in range(300):
+        needles = ["".join(generator.choice("abc") for _ in range(generator.randint(0, 4))) for _ in range(generator.randint(1, 6))]
+        text = "".join(generator.choice("abcd") for _ in range(generator.randint(0, 20)))
+        assert AhoCorasick(needles).search(text) == {index for index, needle in enumerate(needles) if needle in text}
+
+
+def test_interpreter_modes_agree(program, documents):
+    bytecode = ProgramBytecode.compile(program)
+    searches, automaton = Interpreter(bytecode, multi_pattern=False), Interpreter(bytecode, multi_pattern=True)
+    assert automaton.matcher is not None and set(automaton.matcher.needles) == set(bytecode.needles())
+    for element in parse_document(documents["Shop"].decode()).elements:
+        by_search, by_automaton = {}, {}
+        for index in range(len(bytecode.statements)):
+            assert searches.evaluate(index, element, by_search) == automaton.evaluate(index, element, by_automaton)
+
+
+def test_compiler_attaches_the_automaton_from_the_threshold(program):
+    assert ProgramBytecode.compile(program).matcher is None
+    text = NODES.selector(ElementType.TEXT)
+    needles = tuple(f"needle {index}" for index in range(AHO_CORASICK_MIN_NEEDLES))
+    many = Program(statements=[ExtractStatement(source="Page", destination="many", condition=NODES.conditional(
+        text, NODES.literal(needles), ComparisonOperator.CONTAINS))])
+    bytecode = ProgramBytecode.compile(many)
+    assert bytecode.matcher is not None and bytecode.matcher.needles == needles
+    assert Interpreter(bytecode).matcher is bytecode.matcher
+    assert ProgramBytecode.from_bytes(bytecode.to_bytes()).matcher is not None
@@ -0,0 +1,130 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from conftest import SCRIPT
+
+import api.language_api.script_processor as script_processor
+
+from api.language_api.script_processor import ScriptProcessor
+from language.parsing.ast.actions.action_plugins.filter.filter import (
+    Filter,
+    FrozenDict,
+    normalize_filter,
+)
+from language.parsing.ast.enums import HTMLPropertyType, LogicalOperatorType
+from language.parsing.grammars import SIFT, SIFT_BLOCK, SIFT_STATEMENT
+from language.parsing.parser import Parser
+from language.parsing.utils import GrammarContainer, GrammarRegistry
+from shared.registry import RegistryType, get_registry, register
+
+
+def test_registry_shares_one_parser_per_grammar():
+    registry = GrammarRegistry()
+    first = registry.get(SIFT)
+    assert registry.get(SIFT) is first
+    assert registry.get(SIFT_STATEMENT) is not first
+    stats = registry.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+
+
+def test_grammar_key_is_built_once():
+    assert SIFT.key() is SIFT.key()
+    assert SIFT.key()[3] is SIFT.grammar_text
+    assert SIFT.key("statement_block")[0] == "statement_block"
+
+
+def test_registry_builds_with_the_container_parser():
+    grammar = GrammarContainer(start="greeting", production_map={"greeting": '"hello" NAME', "NAME": "/[a-z]+/"},
+                               parser="earley")
+    parser = GrammarRegistry().get(grammar)
+    assert parser.options.parser == "earley"
+    assert parser.parse("hello world").data == "greeting"
+
+
+def test_script_parses_into_blocks_and_filters():
+    tree = Parser(SCRIPT).parse_content_to_tree()
+    assert tree.targets == {"Shop": "https://shop.example", "News": "https://news.example"}
+    assert [block.target for block in tree.action_blocks] == ["Shop", "News"]
+    items = tree.action_blocks[0].actions[0]
+    assert isinstance(items, Filter)
+    assert items.metadata["assignment"] == "items"
+    assert items.metadata["raw_filter"] == 'tag "div" and attribute "class": "item"'
+    assert [operand.filter_type for operand in items.operands] == [HTMLPropertyType.TAG, HTMLPropertyType.ATTRIBUTE]
+    lucky = tree.action_blocks[0].actions[1]
+    assert lucky.metadata["from_alias"] == "items"
+    listed = tree.action_blocks[0].actions[4]
+    assert listed.metadata["raw_filter"] == '(tag "div" and attribute "class": "item") or text contains "sponsored"'
+
+
+def test_shipped_tables_load_for_every_named_grammar():
+    registry = GrammarRegistry()
+    registry.warm(SIFT, SIFT_BLOCK, SIFT_STATEMENT)
+    assert registry.stats().table_loads == 3
+    assert registry.get(SIFT).parse(SCRIPT).data == "script"
+
+
+def test_statement_builds_the_filter_tree_directly():
+    statement = 'extract from items where tag "a" and not attribute "href": contains "/p/1" -> links'
+    links = Filter.generate(statement)
+    assert links.metadata == {"from_alias": "items", "raw_filter": statement[25:-9], "assignment": "links"}
+    tag, negation = links.operands
+    assert links.operator is LogicalOperatorType.AND
+    assert (tag.filter_type, list(tag.value)) == (HTMLPropertyType.TAG, ['"a"'])
+    assert negation.operator is LogicalOperatorType.NOT
+    assert negation.operands[0].filter_type is HTMLPropertyType.ATTRIBUTE
+
+
+def test_identical_filters_share_a_frozen_tree():
+    normalized = normalize_filter('( tag  "div"  and attribute "class" : "item" )')
+    assert normalized == normalize_filter('(tag "div" and attribute "class": "item")')
+    script = SCRIPT.replace('-> prices;', '-> prices;\n    extract where tag "div" and attribute "class": "item" -> again;')
+    actions = Parser(script).parse_content_to_tree().action_blocks[0].actions
+    items, again = (next(action for action in actions if action.metadata["assignment"] == name) for name in ("items", "again"))
+    assert items is not again and items.operands is again.operands
+    with pytest.raises(FrozenInstanceError):
+        items.operands[0].value = ['"p"']
+    with pytest.raises(TypeError):
+        items.operands[1].value['"class"'] = '"other"'
+    assert isinstance(items.operands[1].value, FrozenDict)
+    # The root node is the statement's own.
+    items.metadata["note"] = "mine"
+    assert "note" not in again.metadata
+
+
+def test_reparse_matches_a_full_parse_and_reuses_unchanged_blocks():
+    previous = Parser(SCRIPT).parse_content_to_tree()
+    edited = SCRIPT.replace('tag ["h1", "h2"]', 'tag ["h1", "h3"]')
+    reparsed = Parser.reparse(previous, edited)
+    assert reparsed == Parser(edited).parse_content_to_tree()
+    assert reparsed.action_blocks[0] is previous.action_blocks[0]
+    assert reparsed.action_blocks[1] is not previous.action_blocks[1]
+
+
+def test_statements_are_dispatched_by_keyword():
+    keywords = get_registry(RegistryType.KEYWORD)
+    assert keywords["extract"] == Filter.generate
+    with pytest.raises(ValueError):
+        register(RegistryType.KEYWORD, item=Filter.generate, key="select")
+
+
+def test_stream_yields_the_blocks_of_a_full_parse():
+    tree = Parser(SCRIPT).parse_content_to_tree()
+    stream = Parser.stream(SCRIPT)
+    assert stream.targets == tree.targets
+    assert list(stream.action_blocks) == tree.action_blocks
+
+
+def test_parallel_parse_matches_the_serial_parse():
+    script = SCRIPT + "".join(f'\nShop: {{\n    extract where text contains "{index}" -> block{index};\n}}\n' for index in range(8))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        parallel = Parser.parse_parallel(script, executor=executor, max_workers=2, min_blocks=1)
+    assert parallel == Parser(script).parse_content_to_tree()
+
+
+def test_script_processor_parses_through_one_shared_pool(script_path, monkeypatch):
+    monkeypatch.setattr(script_processor, "PARALLEL_PARSING", True)
+    tree = ScriptProcessor(script_path).parse()
+    assert tree == Parser(SCRIPT).parse_content_to_tree()
+    assert script_processor.get_parse_pool() is script_processor.get_parse_pool()